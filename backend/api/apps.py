@@ -6,11 +6,47 @@ class ApiConfig(AppConfig):
     name = 'api'
 
     def ready(self):
-        from django.db.models.signals import post_save
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
         from django.dispatch import receiver
+        from .dashboard import invalidate_dashboard
+        from .facets import GENERATION_FIELDS, bump_catalog_generation
+        from .models.course import Course, Enrollment
         from .models.user import User, Profile
+        from .progress import register_sqlite_functions
+
+        connection_created.connect(register_sqlite_functions)
+        # Registers the background jobs with api.jobs.
+        from . import tasks  # noqa: F401
 
         @receiver(post_save, sender=User)
         def create_user_profile(sender, instance, created, **kwargs):
             if created and not hasattr(instance, 'profile'):
                 Profile.objects.create(user=instance)
+
+        @receiver(post_save, sender=Course)
+        @receiver(post_delete, sender=Course)
+        def invalidate_catalog_facets(sender, update_fields=None, **kwargs):
+            # Counter-only saves (enrollments) leave the facets alone.
+            if update_fields is None or GENERATION_FIELDS & set(update_fields):
+                bump_catalog_generation()
+
+        @receiver(post_save, sender=Enrollment)
+        @receiver(post_delete, sender=Enrollment)
+        def invalidate_student_dashboard(sender, instance, **kwargs):
+            invalidate_dashboard(instance.student_id)
+
+        @receiver(post_save, sender=Profile)
+        @receiver(post_delete, sender=Profile)
+        def invalidate_profile_dashboard(sender, instance, **kwargs):
+            invalidate_dashboard(instance.user_id)
+
+        @receiver(post_save, sender=User)
+        def invalidate_user_dashboard(sender, instance, created, **kwargs):
+            if not created:
+                invalidate_dashboard(instance.pk)
+
+        if getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            from . import instrumentation
+            instrumentation.install()
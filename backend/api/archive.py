@@ -0,0 +1,130 @@
+"""
+Enrollment archival.
+
+Enrollments completed or dropped more than ARCHIVE_AFTER_DAYS ago are
+moved to ArchivedEnrollment by ``manage.py archive_enrollments``, so the
+Enrollment table and its indexes hold the rows that requests still touch
+(the dashboard, progress updates, the enrollment uniqueness check).
+``archive()`` works in batches of ARCHIVE_BATCH_SIZE, each one short
+transaction: the batch's rows are locked, copied with one
+``INSERT ... SELECT`` and deleted, and the students' dashboards are
+invalidated.
+
+Reads that include history go through ``History``, which pages through
+both tables as one list, newest first. The profile and course counters
+keep counting archived completed enrollments (see api/tasks.py and
+api/reconcile.py), so enrolling refuses a course whose completion was
+archived; a course whose dropped enrollment was archived may be taken again.
+"""
+import logging
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DateTimeField, IntegerField, Prefetch, Q, Value
+from django.utils import timezone
+
+from api.dashboard import invalidate_dashboard
+from api.models.course import ArchivedEnrollment, Enrollment, Lesson
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    'id', 'student_id', 'course_id', 'status', 'progress_percentage', 'completed_lessons',
+    'last_accessed', 'enrolled_at', 'completed_at',
+]
+
+Report = namedtuple('Report', 'archived batches seconds')
+
+
+def archivable(days=None):
+    """Enrollments completed, or dropped and untouched, more than ``days`` ago."""
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return Enrollment.objects.filter(
+        Q(status='completed', completed_at__lt=cutoff) | Q(status='dropped', last_accessed__lt=cutoff)
+    )
+
+
+def move(ids):
+    """Copies the enrollments ``ids`` to the archive and deletes them, in the current transaction."""
+    quote = connection.ops.quote_name
+    rows = Enrollment.objects.filter(pk__in=ids).order_by().annotate(
+        archived=Value(timezone.now(), output_field=DateTimeField())
+    ).values_list(*COLUMNS, 'archived')
+    select, params = rows.query.sql_with_params()
+    columns = ', '.join(quote(ArchivedEnrollment._meta.get_field(name).column) for name in [*COLUMNS, 'archived_at'])
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {quote(ArchivedEnrollment._meta.db_table)} ({columns}) {select}", params)
+    Enrollment.objects.filter(pk__in=ids).delete()
+
+
+def archive(days=None, batch_size=None, pause=None, dry_run=False):
+    """Moves the archivable enrollments to the archive in batches; returns a Report."""
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    pause = settings.ARCHIVE_PAUSE_SECONDS if pause is None else pause
+    started = time.perf_counter()
+    candidates = archivable(days).order_by('pk')
+    if dry_run:
+        return Report(candidates.count(), 0, time.perf_counter() - started)
+
+    archived = batches = last_id = 0
+    while True:
+        with transaction.atomic():
+            # Locking the batch keeps a row changed meanwhile (a dropped
+            # enrollment resumed) from being copied and then left behind.
+            rows = list(
+                candidates.filter(pk__gt=last_id).select_for_update().values_list('pk', 'student_id')[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [pk for pk, _ in rows]
+            move(ids)
+            for student_id in {student_id for _, student_id in rows}:
+                transaction.on_commit(lambda student_id=student_id: invalidate_dashboard(student_id))
+        archived += len(ids)
+        batches += 1
+        last_id = ids[-1]
+        logger.info("Archived %s enrollments through id %s", archived, last_id)
+        if pause and len(ids) == batch_size:
+            time.sleep(pause)
+    return Report(archived, batches, time.perf_counter() - started)
+
+
+class History:
+    """
+    The enrollments and archived enrollments matching ``filters``, newest
+    first, as one sliceable list for the paginator: a page costs two counts,
+    one UNION of (enrolled_at, id) keys and one fetch per table.
+    """
+    ordered = True
+
+    def __init__(self, **filters):
+        self.querysets = [model.objects.filter(**filters) for model in (Enrollment, ArchivedEnrollment)]
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        hot, cold = (
+            queryset.order_by().annotate(source=Value(n, output_field=IntegerField())).values_list(
+                'enrolled_at', 'id', 'source'
+            )
+            for n, queryset in enumerate(self.querysets)
+        )
+        keys = list(hot.union(cold, all=True).order_by('-enrolled_at', '-id')[index])
+        lessons = Prefetch('course__lessons', queryset=Lesson.objects.only('id', 'course_id'))
+        rows = [
+            queryset.select_related('student__profile', 'course__instructor').prefetch_related(lessons).in_bulk(
+                [pk for _, pk, source in keys if source == n]
+            )
+            for n, queryset in enumerate(self.querysets)
+        ]
+        return [rows[source][pk] for _, pk, source in keys]
@@ -0,0 +1,65 @@
+"""
+The student dashboard: the user with their profile and every enrollment
+with its course summary, progress and the lesson to resume, built in
+DASHBOARD_QUERY_BUDGET queries whatever the number of enrollments:
+
+    1. the profile
+    2. the enrollments, joined with their courses and instructors
+    3. the outline of those courses' lessons (lesson counts and next lessons)
+
+plus the request's own authentication lookup. The payload is cached per
+user; enrollment, progress, profile and account writes drop the entry
+(see ApiConfig.ready), edits to the courses themselves show up within
+CACHE_TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from api.models.course import Enrollment, Lesson
+from api.progress import completed_positions
+from api.serializers.course_serializers import DashboardSerializer
+
+DASHBOARD_CACHE_KEY = "student_dashboard"
+DASHBOARD_QUERY_BUDGET = 3
+
+
+def next_lesson(enrollment, lessons):
+    """
+    The first lesson the student has not finished, None once completed.
+    Enrollments without per-lesson tracking read their percentage as the
+    share of lessons (in order) done.
+    """
+    if enrollment.status == 'completed' or not lessons:
+        return None
+    if enrollment.completed_lessons:
+        done = set(completed_positions(enrollment.completed_lessons, len(lessons)))
+        return next((lesson for position, lesson in enumerate(lessons) if position not in done), None)
+    done = len(lessons) * enrollment.progress_percentage // 100
+    return lessons[done] if done < len(lessons) else None
+
+
+def build_dashboard(user):
+    enrollments = list(
+        Enrollment.objects.filter(student=user).select_related('course__instructor').prefetch_related(
+            Prefetch('course__lessons', queryset=Lesson.objects.only(
+                'id', 'course_id', 'title', 'order', 'lesson_type', 'video_duration'
+            ).order_by('order', 'id'))
+        )
+    )
+    for enrollment in enrollments:
+        enrollment.next_lesson = next_lesson(enrollment, list(enrollment.course.lessons.all()))
+    return DashboardSerializer({'user': user, 'enrollments': enrollments}).data
+
+
+def dashboard(user):
+    key = f"{DASHBOARD_CACHE_KEY}_{user.pk}"
+    data = cache.get(key)
+    if data is None:
+        data = build_dashboard(user)
+        cache.set(key, data, timeout=settings.CACHE_TTL)
+    return data
+
+
+def invalidate_dashboard(user_id):
+    cache.delete(f"{DASHBOARD_CACHE_KEY}_{user_id}")
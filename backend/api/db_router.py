@@ -0,0 +1,90 @@
+"""
+Primary/replica database routing.
+
+Reads go to a replica only inside ``replica_reads()``; views opt in for safe
+requests through ``ReplicaReadMixin`` once authentication has run on the
+primary. A user who wrote recently is pinned to the primary for
+``DB_REPLICA_STICKY_SECONDS`` so they always read their own writes.
+Writes always go to the primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_PIN_CACHE_KEY = "db_primary_pin"
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def replica_reads():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def pin_to_primary(user_id):
+    timeout = getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 10)
+    cache.set(f"{PRIMARY_PIN_CACHE_KEY}_{user_id}", True, timeout=timeout)
+
+
+async def apin_to_primary(user_id):
+    timeout = getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 10)
+    await cache.aset(f"{PRIMARY_PIN_CACHE_KEY}_{user_id}", True, timeout=timeout)
+
+
+def is_pinned_to_primary(user_id):
+    return bool(cache.get(f"{PRIMARY_PIN_CACHE_KEY}_{user_id}"))
+
+
+async def ais_pinned_to_primary(user_id):
+    return bool(await cache.aget(f"{PRIMARY_PIN_CACHE_KEY}_{user_id}"))
+
+
+class PrimaryReplicaRouter:
+    """Routes opted-in reads to a random replica and everything else to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        aliases = replica_aliases()
+        if aliases and _use_replica.get():
+            return random.choice(aliases)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Serves safe requests from a read replica unless the requesting user is
+    pinned to the primary after a recent write.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = None
+        if request.method in SAFE_METHODS and replica_aliases():
+            user = request.user
+            if not (user and user.is_authenticated and is_pinned_to_primary(user.pk)):
+                self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,162 @@
+"""
+Account deletion.
+
+Deleting a user cascades to their enrollments and, for an instructor, to
+their courses with every lesson and enrollment in them: too much for one
+request and one transaction. ``request_deletion()`` deactivates the account
+at once (its tokens stop working) and queues ``delete_account``
+(api/tasks.py), which removes the dependents in batches of at most
+DELETION_BATCH_SIZE rows, one transaction each:
+
+- the instructor's courses are unpublished first, so nobody enrolls meanwhile
+- the user's enrollments are taken off their courses' enrolled counts
+- the enrollments in the instructor's courses are taken off the students'
+  profile counts, then the lessons, recommendations and courses go
+- the profile and the user go last, with a ``user.deleted`` event
+
+Each job works for at most DELETION_JOB_SECONDS and queues the next one, so
+a worker's lease never runs out mid-deletion. AccountDeletion records the
+current step and the rows deleted so far. Every step deletes whatever is
+left, so a failed job carries on where it stopped when retried.
+"""
+import logging
+import time
+from collections import Counter, defaultdict, namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.dashboard import invalidate_dashboard
+from api.models.course import ArchivedEnrollment, Course, Enrollment, Lesson
+from api.models.deletion import AccountDeletion
+from api.models.recommendation import CourseRecommendation
+from api.models.user import Profile, User
+from api.outbox import record
+from api.tasks import delete_account
+
+logger = logging.getLogger(__name__)
+
+ENROLLMENT_FIELDS = ('student_id', 'course_id', 'status')
+
+# ``apply`` handles one batch of (pk, *fields) rows and returns how many rows it deleted.
+Step = namedtuple('Step', 'name queryset fields apply')
+
+
+def by_delta(deltas):
+    """{key: delta} as {delta: [keys]}, for one UPDATE per distinct delta."""
+    groups = defaultdict(list)
+    for key, delta in deltas.items():
+        groups[delta].append(key)
+    return groups
+
+
+def take_off_courses(rows):
+    """Takes the counted enrollments in ``rows`` off their courses' enrolled_students_count."""
+    deltas = Counter(course_id for _, _, course_id, status in rows if status in Enrollment.COUNTED_STATUSES)
+    for delta, course_ids in by_delta(deltas).items():
+        Course.objects.filter(pk__in=course_ids).update(enrolled_students_count=F('enrolled_students_count') - delta)
+
+
+def take_off_profiles(rows):
+    """Takes the counted enrollments in ``rows`` off their students' profile counts."""
+    from api.views.user_views import PROFILE_CACHE_KEY
+
+    deltas = {}
+    for _, student_id, _, status in rows:
+        if status in Enrollment.COUNTED_STATUSES:
+            enrolled, completed = deltas.get(student_id, (0, 0))
+            deltas[student_id] = (enrolled + 1, completed + (status == 'completed'))
+    for (enrolled, completed), student_ids in by_delta(deltas).items():
+        Profile.objects.filter(user_id__in=student_ids).update(
+            enrolled_courses_count=F('enrolled_courses_count') - enrolled,
+            completed_courses_count=F('completed_courses_count') - completed,
+        )
+    for student_id in deltas:
+        transaction.on_commit(lambda student_id=student_id: (
+            invalidate_dashboard(student_id), cache.delete(f"{PROFILE_CACHE_KEY}_{student_id}")
+        ))
+
+
+def delete(model, rows, adjust=None):
+    if adjust is not None:
+        adjust(rows)
+    return model.objects.filter(pk__in=[row[0] for row in rows]).delete()[0]
+
+
+def unpublish(rows):
+    Course.objects.filter(pk__in=[row[0] for row in rows]).update(status='draft')
+    return 0
+
+
+def steps(user_id):
+    courses = Course.objects.filter(instructor_id=user_id)
+    return [
+        Step('unpublishing courses', courses.filter(status='published'), (), unpublish),
+        Step('enrollments', Enrollment.objects.filter(student_id=user_id), ENROLLMENT_FIELDS,
+             partial(delete, Enrollment, adjust=take_off_courses)),
+        Step('archived enrollments', ArchivedEnrollment.objects.filter(student_id=user_id), ENROLLMENT_FIELDS,
+             partial(delete, ArchivedEnrollment, adjust=take_off_courses)),
+        Step('course enrollments', Enrollment.objects.filter(course__instructor_id=user_id), ENROLLMENT_FIELDS,
+             partial(delete, Enrollment, adjust=take_off_profiles)),
+        Step('archived course enrollments', ArchivedEnrollment.objects.filter(course__instructor_id=user_id),
+             ENROLLMENT_FIELDS, partial(delete, ArchivedEnrollment, adjust=take_off_profiles)),
+        Step('lessons', Lesson.objects.filter(course__instructor_id=user_id), (), partial(delete, Lesson)),
+        Step('recommendations', CourseRecommendation.objects.filter(
+            Q(course__instructor_id=user_id) | Q(recommended__instructor_id=user_id)
+        ), (), partial(delete, CourseRecommendation)),
+        Step('courses', courses, (), partial(delete, Course)),
+    ]
+
+
+def request_deletion(user):
+    """Deactivates ``user`` and queues the deletion of their data; returns the AccountDeletion."""
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        deletion = AccountDeletion.objects.filter(user_id=user.pk).exclude(status='done').first()
+        if deletion is None:
+            deletion = AccountDeletion.objects.create(user_id=user.pk, username=user.username)
+            delete_account.defer(deletion_id=deletion.pk, dedupe_key=f"delete_account_{deletion.pk}")
+    user.is_active = False
+    return deletion
+
+
+def run(deletion_id, budget=None, batch_size=None):
+    """
+    Deletes batches for ``budget`` seconds (at least one batch); returns
+    whether the deletion is finished.
+    """
+    budget = settings.DELETION_JOB_SECONDS if budget is None else budget
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    deadline = time.monotonic() + budget
+    deletion = AccountDeletion.objects.get(pk=deletion_id)
+    if deletion.status == 'done':
+        return True
+    progress = AccountDeletion.objects.filter(pk=deletion.pk)
+    progress.update(status='running')
+
+    for step in steps(deletion.user_id):
+        while True:
+            with transaction.atomic():
+                # Locking the batch keeps its counts right while students keep working.
+                rows = list(
+                    step.queryset.order_by('pk').select_for_update(of=('self',))
+                    .values_list('pk', *step.fields)[:batch_size]
+                )
+                if not rows:
+                    break
+                deleted = step.apply(rows)
+                progress.update(step=step.name, deleted=F('deleted') + deleted)
+            logger.info("Deleting %s: %s %s", deletion.username, len(rows), step.name)
+            if time.monotonic() >= deadline:
+                return False
+
+    with transaction.atomic():
+        deleted, _ = User.objects.filter(pk=deletion.user_id).delete()
+        record('user.deleted', user_id=deletion.user_id)
+        progress.update(status='done', step='', deleted=F('deleted') + deleted, finished_at=timezone.now())
+    logger.info("Deleted %s", deletion.username)
+    return True
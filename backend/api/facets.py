@@ -0,0 +1,80 @@
+"""
+Facet counts for the course catalog.
+
+``facet_counts(queryset)`` counts the filtered courses per category, level,
+featured flag and price bucket with one grouped aggregate: grouping by all
+four columns at once returns at most categories x levels x 2 x buckets rows,
+which are summed per facet in Python. Results are cached under the catalog
+generation, a counter bumped whenever a course's faceted fields change, so
+a stale entry is never read and old ones simply expire. The counter starts
+from the clock (in nanoseconds) whenever it is missing, so one evicted from
+the cache never comes back at a generation whose entries are still cached.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Value, When
+
+CATALOG_GENERATION_KEY = "catalog_generation"
+FACETS_CACHE_KEY = "catalog_facets"
+
+FACET_FIELDS = ('category', 'level', 'is_featured', 'price')
+# Course fields whose change can alter some user's facet counts.
+GENERATION_FIELDS = frozenset(FACET_FIELDS + ('status', 'instructor'))
+# (name, exclusive upper bound); the last bucket is open-ended.
+PRICE_BUCKETS = [('free', None), ('under_20', 20), ('20_to_50', 50), ('50_to_100', 100), ('100_plus', None)]
+
+
+def catalog_generation():
+    return cache.get_or_set(CATALOG_GENERATION_KEY, time.time_ns, timeout=None)
+
+
+def bump_catalog_generation():
+    try:
+        cache.incr(CATALOG_GENERATION_KEY)
+    except ValueError:
+        cache.set(CATALOG_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def price_bucket():
+    whens = [When(price__lte=0, then=Value('free'))]
+    whens += [When(price__lt=bound, then=Value(name)) for name, bound in PRICE_BUCKETS[1:-1]]
+    return Case(*whens, default=Value(PRICE_BUCKETS[-1][0]), output_field=CharField())
+
+
+def compute_facets(queryset):
+    rows = (
+        queryset.order_by().annotate(price_bucket=price_bucket())
+        .values('category', 'level', 'is_featured', 'price_bucket').annotate(n=Count('pk'))
+    )
+    counts = {facet: {} for facet in FACET_FIELDS}
+    for row in rows:
+        for facet, value in zip(FACET_FIELDS, (row['category'], row['level'], row['is_featured'], row['price_bucket'])):
+            counts[facet][value] = counts[facet].get(value, 0) + row['n']
+
+    facets = {
+        facet: [
+            {'value': value, 'count': n}
+            for value, n in sorted(values.items(), key=lambda item: (-item[1], str(item[0])))
+        ]
+        for facet, values in counts.items() if facet != 'price'
+    }
+    # Price buckets keep their natural order.
+    facets['price'] = [
+        {'value': name, 'count': counts['price'][name]} for name, _ in PRICE_BUCKETS if name in counts['price']
+    ]
+    return facets
+
+
+def facet_counts(queryset):
+    """Facet counts of a Course queryset, cached per catalog generation and query."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f"{sql}{params!r}".encode(), usedforsecurity=False).hexdigest()
+    key = f"{FACETS_CACHE_KEY}_{catalog_generation()}_{digest}"
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, timeout=settings.FACETS_CACHE_TTL)
+    return facets
@@ -0,0 +1,259 @@
+"""
+Request performance instrumentation.
+
+Collects per-request timings (db, serialize, render, cache) for the
+Server-Timing header and keeps a bounded sample of slow SQL statements
+together with the view, serializer and code location that issued them.
+"""
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_METRICS = ('db', 'serialize', 'render', 'cache', 'compress')
+CACHE_METHODS = (
+    'get', 'set', 'add', 'delete', 'touch', 'has_key', 'incr', 'decr',
+    'get_many', 'set_many', 'delete_many', 'get_or_set',
+)
+
+# Frames from the instrumentation itself are never reported as a query's origin.
+_IGNORED_FRAME_FILES = {__file__, os.path.join(os.path.dirname(__file__), 'middleware.py')}
+
+_current_timings = ContextVar('request_timings', default=None)
+_explaining = ContextVar('explaining_slow_query', default=False)
+
+
+class RequestTimings:
+    """Durations (in seconds) accumulated while handling one request."""
+
+    def __init__(self, label='', request=None):
+        self.label = label
+        self.request = request
+        self.serializer_name = None
+        self.query_count = 0
+        self.durations = dict.fromkeys(SERVER_TIMING_METRICS, 0.0)
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    @property
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        if match is None:
+            return None
+        view = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None) or match.func
+        return f"{view.__module__}.{view.__qualname__}"
+
+    def header(self):
+        parts = []
+        for name, seconds in self.durations.items():
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if name == 'db':
+                part += f';desc="{self.query_count} queries"'
+            parts.append(part)
+        return ', '.join(parts)
+
+
+def current_timings():
+    return _current_timings.get()
+
+
+@contextmanager
+def collect_timings(request=None):
+    label = f"{request.method} {request.path}" if request is not None else ''
+    timings = RequestTimings(label, request)
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the wrapped block's duration to the current request's ``name`` metric.
+    Nested blocks of the same metric are only counted once.
+    """
+    timings = _current_timings.get()
+    if timings is None or name in timings._active:
+        yield
+        return
+    timings._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+        timings._active.discard(name)
+
+
+class SlowQueryLog:
+    """Thread-safe ring buffer of the most recent slow query samples."""
+
+    def __init__(self, maxlen):
+        self._entries = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self):
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_queries = SlowQueryLog(getattr(settings, 'SLOW_QUERY_BUFFER_SIZE', 100))
+
+
+class QueryTimer:
+    """
+    Database execute wrapper that adds every statement to the ``db`` metric
+    and samples those slower than ``SLOW_QUERY_THRESHOLD_MS``.
+    """
+
+    def __init__(self, timings):
+        self.timings = timings
+
+    def __call__(self, execute, sql, params, many, context):
+        if _explaining.get():
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.timings.add('db', duration)
+            self.timings.query_count += 1
+
+        threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 200)
+        if threshold >= 0 and duration * 1000 >= threshold:
+            record_slow_query(context['connection'], sql, params, many, duration, self.timings)
+        return result
+
+
+def record_slow_query(connection, sql, params, many, duration, timings):
+    entry = {
+        'recorded_at': timezone.now().isoformat(),
+        'duration_ms': round(duration * 1000, 3),
+        'database': connection.alias,
+        'sql': sql,
+        'params': repr(params)[:500],
+        'request': timings.label,
+        'view': timings.view_name,
+        'serializer': timings.serializer_name,
+        'frame': _origin_frame(),
+        'explain': None if many else explain_query(connection, sql, params),
+    }
+    slow_queries.add(entry)
+    logger.warning(
+        "Slow query (%.1f ms) in %s [%s]: %s",
+        entry['duration_ms'], entry['view'], entry['frame'], sql[:200],
+    )
+
+
+def explain_query(connection, sql, params):
+    """
+    Return the query plan for a SELECT statement, or None for other statements.
+    Runs inside a savepoint so a failing EXPLAIN never poisons the request's transaction.
+    """
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    token = _explaining.set(True)
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+        return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+    except DatabaseError as exc:
+        return f"EXPLAIN failed: {exc}"
+    finally:
+        _explaining.reset(token)
+
+
+def _origin_frame():
+    """
+    Innermost project frame that issued the query, falling back to the
+    innermost library frame outside the ORM when the view is fully inherited.
+    """
+    base_dir = str(settings.BASE_DIR)
+    fallback = None
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename in _IGNORED_FRAME_FILES or f"django{os.sep}db{os.sep}" in filename:
+            continue
+        location = f"{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}"
+        if filename.startswith(base_dir) and 'site-packages' not in filename:
+            return location
+        fallback = fallback or location
+    return fallback
+
+
+def install():
+    """Hook serializer and cache timing into DRF and the configured cache backends."""
+    _install_serializer_timing()
+    _install_cache_timing()
+
+
+def _install_serializer_timing():
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+    if getattr(original.fget, 'timed', False):
+        return
+
+    def data(self):
+        timings = _current_timings.get()
+        if timings is None:
+            return original.fget(self)
+        previous = timings.serializer_name
+        timings.serializer_name = previous or type(getattr(self, 'child', self)).__name__
+        try:
+            with timed('serialize'):
+                return original.fget(self)
+        finally:
+            timings.serializer_name = previous
+
+    data.timed = True
+    BaseSerializer.data = property(data)
+
+
+def _install_cache_timing():
+    from django.core.cache import caches
+
+    for alias in settings.CACHES:
+        backend_class = type(caches[alias])
+        if getattr(backend_class, '_timed', False):
+            continue
+        for name in CACHE_METHODS:
+            setattr(backend_class, name, _timed_method(getattr(backend_class, name)))
+        backend_class._timed = True
+
+
+def _timed_method(method):
+    def wrapper(*args, **kwargs):
+        with timed('cache'):
+            return method(*args, **kwargs)
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
@@ -0,0 +1,190 @@
+"""
+Background jobs.
+
+Functions registered with ``@job`` run outside the request. ``defer``
+queues one when the current transaction commits (at once outside a
+transaction), so a rolled-back request queues nothing and the response
+never waits for the work. Jobs are rows of the Job table, run by
+``manage.py run_workers`` in a thread or process pool:
+
+- a failing job is retried with exponential backoff (JOBS_RETRY_BACKOFF_SECONDS,
+  doubled per attempt, plus up to 10% jitter) until ``max_attempts``, then
+  kept as failed with its traceback
+- a job with a ``dedupe_key`` is not queued again while one with the same
+  key is still waiting
+- each queue runs at most JOBS_QUEUES[queue] jobs at once per worker process
+- a job still running after JOBS_LEASE_SECONDS (a crashed worker) is claimed
+  again, so a job may run more than once and must be idempotent
+
+With JOBS_IMMEDIATE the function runs in-process at commit instead, for
+development without workers.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+def job(name=None, queue='default', max_attempts=3):
+    """Registers a job function; ``function.defer(**kwargs)`` queues it after commit."""
+    def register(function):
+        function.job_name = name or f"{function.__module__}.{function.__name__}"
+        function.queue, function.max_attempts = queue, max_attempts
+        function.defer = lambda **kwargs: defer(function, **kwargs)
+        REGISTRY[function.job_name] = function
+        return function
+    return register
+
+
+def enqueue(function, kwargs=None, queue=None, dedupe_key=None, delay=None):
+    """
+    Inserts a Job for a registered function (or its name) and returns it;
+    with a ``dedupe_key`` already waiting, returns the waiting job instead.
+    """
+    function = REGISTRY[function] if isinstance(function, str) else function
+    fields = {
+        'queue': queue or function.queue, 'name': function.job_name, 'kwargs': kwargs or {},
+        'dedupe_key': dedupe_key, 'max_attempts': function.max_attempts,
+        'run_at': timezone.now() + timedelta(seconds=delay or 0),
+    }
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields)
+    except IntegrityError:
+        if dedupe_key is None:
+            raise
+        return Job.objects.filter(dedupe_key=dedupe_key, status='queued').first()
+
+
+def defer(function, queue=None, dedupe_key=None, delay=None, **kwargs):
+    """Queues ``function(**kwargs)`` once the current transaction commits."""
+    if settings.JOBS_IMMEDIATE:
+        transaction.on_commit(lambda: function(**kwargs), robust=True)
+    else:
+        transaction.on_commit(lambda: enqueue(function, kwargs, queue, dedupe_key, delay), robust=True)
+
+
+def claim(queue, worker, limit):
+    """Marks up to ``limit`` due jobs of ``queue`` as running for ``worker``; returns their ids."""
+    now = timezone.now()
+    due = Q(status='queued', run_at__lte=now) | Q(
+        status='running', locked_at__lt=now - timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+    )
+    candidates = Job.objects.filter(due, queue=queue).order_by('run_at', 'id')
+    if connections[candidates.db].features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(candidates.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            # Re-checking the condition keeps a job claimed by another worker meanwhile out.
+            Job.objects.filter(due, pk__in=ids).update(status='running', locked_by=worker, locked_at=now)
+    else:
+        # One UPDATE: SQLite takes the write lock before reading, so concurrent
+        # claims wait for each other (busy timeout) instead of failing with
+        # "database is locked" on upgrading a read.
+        Job.objects.filter(pk__in=candidates.values('pk')[:limit]).update(
+            status='running', locked_by=worker, locked_at=now
+        )
+    return list(Job.objects.filter(queue=queue, locked_by=worker, locked_at=now).values_list('pk', flat=True))
+
+
+def recycle_connections():
+    """
+    Closes this thread's broken connections and those past CONN_MAX_AGE, as
+    the request cycle does, unless a transaction holds them (the tests' own).
+    """
+    if not any(conn.in_atomic_block for conn in connections.all(initialized_only=True)):
+        close_old_connections()
+
+
+def execute(job_id, worker):
+    """Runs a claimed job and records the outcome; returns whether it succeeded."""
+    # Pool threads live as long as the worker: treat each job like a request.
+    recycle_connections()
+    try:
+        claimed = Job.objects.filter(pk=job_id, status='running', locked_by=worker)
+        job = claimed.first()
+        if job is None:
+            return False
+        try:
+            REGISTRY[job.name](**job.kwargs)
+        except Exception:
+            logger.exception("Job %s (%s) failed", job.pk, job.name)
+            retry(job, worker, traceback.format_exc())
+            return False
+        claimed.delete()
+        return True
+    finally:
+        recycle_connections()
+
+
+def retry(job, worker, error):
+    attempts = job.attempts + 1
+    fields = {'attempts': attempts, 'last_error': error[-5000:], 'locked_by': '', 'locked_at': None}
+    if attempts < job.max_attempts:
+        backoff = settings.JOBS_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1) * (1 + random.random() / 10)
+        fields.update(status='queued', run_at=timezone.now() + timedelta(seconds=backoff))
+    else:
+        fields['status'] = 'failed'
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk, locked_by=worker).update(**fields)
+    except IntegrityError:
+        # A newer job with the same dedupe key is already waiting and covers this one.
+        Job.objects.filter(pk=job.pk, locked_by=worker).delete()
+
+
+def setup_process():
+    import django
+    django.setup()
+
+
+def run_workers(queues=None, pool='thread', once=False, poll_interval=None):
+    """
+    Runs jobs from ``queues`` ({name: concurrency}, default JOBS_QUEUES)
+    until interrupted (``once``: until no job is due). Returns
+    (succeeded, failed).
+    """
+    queues = queues or settings.JOBS_QUEUES
+    poll_interval = settings.JOBS_POLL_SECONDS if poll_interval is None else poll_interval
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    if pool == 'process':
+        # Children open their own connections.
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=sum(queues.values()), initializer=setup_process)
+    else:
+        executor = ThreadPoolExecutor(max_workers=sum(queues.values()), thread_name_prefix='job')
+    running = {queue: set() for queue in queues}
+    outcomes = [0, 0]
+    try:
+        while True:
+            recycle_connections()
+            for queue, limit in queues.items():
+                for future in [future for future in running[queue] if future.done()]:
+                    running[queue].remove(future)
+                    outcomes[0 if future.exception() is None and future.result() else 1] += 1
+                if len(running[queue]) < limit:
+                    for job_id in claim(queue, worker, limit - len(running[queue])):
+                        running[queue].add(executor.submit(execute, job_id, worker))
+            in_flight = set().union(*running.values())
+            if in_flight:
+                wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            elif once:
+                return tuple(outcomes)
+            else:
+                time.sleep(poll_interval)
+    finally:
+        executor.shutdown(wait=True)
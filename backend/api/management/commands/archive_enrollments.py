@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.archive import archive
+
+
+class Command(BaseCommand):
+    help = "Move enrollments completed or dropped long ago to the archive table, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive after this many days (default: ARCHIVE_AFTER_DAYS).")
+        parser.add_argument('--batch-size', type=int, help="Rows per transaction (default: ARCHIVE_BATCH_SIZE).")
+        parser.add_argument('--pause', type=float, help="Seconds between batches (default: ARCHIVE_PAUSE_SECONDS).")
+        parser.add_argument('--dry-run', action='store_true', help="Count the archivable enrollments only.")
+
+    def handle(self, *args, **options):
+        report = archive(options['days'], options['batch_size'], options['pause'], options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"{report.archived} enrollments would be archived")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {report.archived} enrollments in {report.batches} batches in {report.seconds:.2f}s"
+        ))
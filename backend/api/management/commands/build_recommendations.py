@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.recommendations import build
+
+
+class Command(BaseCommand):
+    help = "Rebuild course recommendations from the enrollments added since the last build."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every course, accounting for deletions.")
+
+    def handle(self, *args, **options):
+        run = build(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Full' if run.full else 'Incremental'} build: {run.courses} courses through enrollment "
+            f"{run.last_enrollment_id} in {run.seconds:.2f}s"
+        ))
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.openapi import build_schema, read_schema, schema_version, write_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema for the current code version into SCHEMA_CACHE_DIR."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None, help="Defaults to SCHEMA_CACHE_DIR.")
+        parser.add_argument('--force', action='store_true', help="Rebuild even if this version is stored.")
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or settings.SCHEMA_CACHE_DIR
+        version = schema_version()
+        if not options['force'] and read_schema(version, directory) is not None:
+            self.stdout.write(f"Schema {version} is already built in {directory}")
+            return
+        write_schema(version, build_schema(), directory)
+        self.stdout.write(self.style.SUCCESS(f"Schema {version} written to {directory}"))
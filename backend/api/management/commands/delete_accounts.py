@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.deletion import run
+from api.models.deletion import AccountDeletion
+
+
+class Command(BaseCommand):
+    help = "Show the account deletions in progress, or finish them here instead of in the job workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--run', action='store_true', help="Run the unfinished deletions to completion.")
+        parser.add_argument('--batch-size', type=int, help="Rows per transaction (default: DELETION_BATCH_SIZE).")
+
+    def handle(self, *args, **options):
+        unfinished = AccountDeletion.objects.exclude(status='done').order_by('id')
+        if not options['run']:
+            for deletion in unfinished:
+                self.stdout.write(
+                    f"{deletion.username:<30} {deletion.status:<8} {deletion.step or '-':<28} {deletion.deleted:>10}"
+                )
+            self.stdout.write(f"{len(unfinished)} deletions in progress")
+            return
+        for deletion in unfinished:
+            while not run(deletion.pk, batch_size=options['batch_size']):
+                deletion.refresh_from_db()
+                self.stdout.write(f"{deletion.username}: {deletion.step}, {deletion.deleted} rows deleted")
+            deletion.refresh_from_db()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deletion.username} ({deletion.deleted} rows)"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.models.course import LessonContent
+
+
+class Command(BaseCommand):
+    help = "Report the space saved by storing lesson bodies compressed and deduplicated."
+
+    def handle(self, *args, **options):
+        lessons, raw_bytes, blobs, stored_bytes = LessonContent.usage()
+        if not raw_bytes:
+            self.stdout.write("No lesson bodies stored")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{lessons:,} lesson bodies ({raw_bytes:,} bytes) stored as {blobs:,} compressed blobs "
+            f"({stored_bytes:,} bytes): {1 - stored_bytes / raw_bytes:.1%} saved"
+        ))
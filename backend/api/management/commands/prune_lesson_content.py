@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.models.course import LessonContent
+
+
+class Command(BaseCommand):
+    help = "Delete the stored lesson bodies that no lesson uses any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Count the orphaned bodies without deleting them.")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f"{LessonContent.orphaned().count()} orphaned lesson bodies would be deleted")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Deleted {LessonContent.prune()} orphaned lesson bodies"))
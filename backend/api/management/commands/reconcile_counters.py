@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from api.reconcile import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute the enrollment counters of courses and profiles and correct the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report the differences without correcting them.")
+        parser.add_argument('--chunk-size', type=int, help="Rows per chunk (default: RECONCILE_CHUNK_SIZE).")
+        parser.add_argument('--pause', type=float, help="Seconds between chunks (default: RECONCILE_PAUSE_SECONDS).")
+        parser.add_argument('--restart', action='store_true', help="Start over instead of resuming an unfinished run.")
+        parser.add_argument('--show', type=int, default=10, help="Largest differences to list in a dry run.")
+
+    def handle(self, *args, **options):
+        report = reconcile(
+            dry_run=options['dry_run'], chunk_size=options['chunk_size'], restart=options['restart'],
+            pause=options['pause'], largest=options['show'],
+        )
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Checked {report.checked} rows, corrected {report.corrected} in {report.seconds:.2f}s"
+            ))
+            return
+        self.stdout.write(f"Checked {report.checked} rows, {report.corrected} would be corrected")
+        for counter, drift in sorted(report.drift.items()):
+            self.stdout.write(f"  {counter:<35} total drift {drift}")
+        if report.largest:
+            self.stdout.write(f"{'Row':<20} {'Counter':<28} {'Stored':>8} {'Actual':>8}")
+            for diff in report.largest:
+                self.stdout.write(
+                    f"{f'{diff.phase} {diff.id}':<20} {diff.counter:<28} {diff.stored:>8} {diff.actual:>8}"
+                )
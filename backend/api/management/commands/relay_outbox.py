@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.outbox import load_sinks, prune, relay
+
+
+class Command(BaseCommand):
+    help = "Ship outbox events to the configured sinks in batches (at-least-once)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sink', action='append', dest='sinks',
+                            help="Sink name or dotted path; repeatable (default: OUTBOX_SINKS).")
+        parser.add_argument('--batch-size', type=int, help="Events per batch (default: OUTBOX_BATCH_SIZE).")
+        parser.add_argument('--poll-interval', type=float, help="Seconds to wait when caught up.")
+        parser.add_argument('--once', action='store_true', help="Exit once every sink is caught up.")
+        parser.add_argument('--prune', action='store_true',
+                            help="Then delete delivered events older than OUTBOX_RETENTION_DAYS.")
+
+    def handle(self, *args, **options):
+        sinks = load_sinks(options['sinks'])
+        names = ', '.join(sink.name for sink in sinks)
+        try:
+            delivered = relay(sinks, options['batch_size'], options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write(f"Stopped relaying to {names}")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Delivered {delivered} events to {names}"))
+        if options['prune']:
+            self.stdout.write(f"Pruned {prune(sinks, options['batch_size'])} delivered events")
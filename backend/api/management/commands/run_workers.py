@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import run_workers
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs with a thread or process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues', metavar='NAME[:CONCURRENCY]',
+                            help="Queue to run, repeatable (default: JOBS_QUEUES).")
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--poll-interval', type=float, help="Seconds to wait when no job is due.")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is due.")
+
+    def handle(self, *args, **options):
+        queues = None
+        if options['queues']:
+            queues = {}
+            for entry in options['queues']:
+                name, _, concurrency = entry.partition(':')
+                if concurrency and not concurrency.isdigit():
+                    raise CommandError(f"Invalid concurrency in {entry!r}")
+                queues[name] = int(concurrency or 1)
+        try:
+            succeeded, failed = run_workers(queues, options['pool'], options['once'], options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Ran {succeeded + failed} jobs: {succeeded} succeeded, {failed} failed"))
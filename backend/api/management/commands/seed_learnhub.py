@@ -0,0 +1,37 @@
+import dataclasses
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.seeding import PRESETS, SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = "Insert a synthetic, deterministic LearnHub dataset for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=PRESETS, default='small')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=50_000, help="Rows per insert batch and transaction.")
+        for field in dataclasses.fields(next(iter(PRESETS.values()))):
+            parser.add_argument(f'--{field.name}', type=int, help=f"Override the preset's {field.name}.")
+
+    def handle(self, *args, **options):
+        preset = PRESETS[options['size']]
+        overrides = {name: options[name] for name in dataclasses.asdict(preset) if options[name] is not None}
+        preset = dataclasses.replace(preset, **overrides)
+        self.stdout.write(f"Seeding {preset} with seed {options['seed']}")
+
+        started = time.perf_counter()
+        writers = seed(preset, seed=options['seed'], chunk_size=options['chunk_size'])
+        for writer in writers:
+            rate = writer.rows / writer.seconds if writer.seconds else 0
+            self.stdout.write(
+                f"{writer.model._meta.db_table:<20}{writer.rows:>12,} rows"
+                f"{writer.seconds:>9.1f}s{rate:>12,.0f} rows/s"
+            )
+        total = sum(writer.rows for writer in writers)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s); password: {SEED_PASSWORD}"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.rankings import update
+
+
+class Command(BaseCommand):
+    help = "Fold the enrollment activity since the last run into the trending and popular course scores."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute every score from all enrollments.")
+
+    def handle(self, *args, **options):
+        run = update(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Full' if run.full else 'Incremental'} update: {run.courses} courses through "
+            f"{run.through:%Y-%m-%d %H:%M:%S} in {run.seconds:.2f}s"
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.warming import warm
+
+
+class Command(BaseCommand):
+    help = "Fill the schema, catalog, course detail and per-user caches after a deploy."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, help="Most enrolled courses to warm (default: CACHE_WARM_COURSES).")
+        parser.add_argument('--users', type=int, help="Most recently active users (default: CACHE_WARM_USERS).")
+        parser.add_argument('--concurrency', type=int, help="Threads (default: CACHE_WARM_CONCURRENCY).")
+        parser.add_argument('--budget', type=float, help="Seconds (default: CACHE_WARM_BUDGET_SECONDS).")
+
+    def handle(self, *args, **options):
+        report = warm(options['courses'], options['users'], options['concurrency'], options['budget'])
+        kinds = ', '.join(f"{kind} {keys}" for kind, keys in sorted(report.by_kind.items()))
+        self.stdout.write(self.style.SUCCESS(f"Warmed {report.keys} keys ({kinds}) in {report.seconds:.2f}s"))
+        if report.skipped or report.failed:
+            self.stdout.write(self.style.WARNING(
+                f"{report.skipped} targets skipped (time budget), {report.failed} failed"
+            ))
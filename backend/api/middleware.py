@@ -0,0 +1,232 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers, set_response_etag
+from django.utils.text import compress_string
+from rest_framework.permissions import SAFE_METHODS
+
+from api.db_router import apin_to_primary, pin_to_primary, replica_aliases
+from api.instrumentation import QueryTimer, collect_timings, current_timings, timed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_CACHE_KEY = "compressed_response"
+COMPRESSED_CACHE = 'compressed'
+BROTLI_QUALITY = 5
+
+# Supported content codings, most preferred first.
+ENCODERS = {'gzip': compress_string}
+if brotli is not None:
+    ENCODERS = {'br': lambda content: brotli.compress(content, quality=BROTLI_QUALITY), **ENCODERS}
+
+
+def parse_accept_encoding(header):
+    """Maps each coding in an Accept-Encoding header to its q-value."""
+    weights = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        weight = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding.strip():
+            weights[coding.strip().lower()] = weight
+    return weights
+
+
+def accepted_encoding(header):
+    """The best supported coding the client accepts, or None for identity."""
+    weights = parse_accept_encoding(header)
+    best, best_weight = None, 0.0
+    for coding in ENCODERS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class AsyncCapableMiddleware:
+    """
+    Base for middleware that runs natively in both WSGI and ASGI stacks, so
+    async views are not pushed onto a thread just to pass through it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class ServerTimingMiddleware(AsyncCapableMiddleware):
+    """
+    Adds a Server-Timing header (db, serialize, render, cache, total) to every
+    response. Keep it first in MIDDLEWARE so ``total`` covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        start = time.perf_counter()
+        with collect_timings(request) as timings:
+            with ExitStack() as stack:
+                self.install_query_timer(stack, timings)
+                response = self.get_response(request)
+        return self.finish(response, timings, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with collect_timings(request) as timings:
+            # The async ORM runs queries on the request's sync thread, whose
+            # connections are not the event loop's, so install the wrappers there.
+            stack = ExitStack()
+            await sync_to_async(self.install_query_timer)(stack, timings)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self.finish(response, timings, start)
+
+    def install_query_timer(self, stack, timings):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(QueryTimer(timings)))
+
+    def finish(self, response, timings, start):
+        timings.add('total', time.perf_counter() - start)
+        response['Server-Timing'] = timings.header()
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before the response is rendered; DRF responses render here.
+        timings = current_timings()
+        if timings is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timings.add('render', time.perf_counter() - start)
+            )
+        return response
+
+
+class PrimaryStickinessMiddleware(AsyncCapableMiddleware):
+    """
+    Pins a user's reads to the primary database after a successful write, so
+    replica lag never hides their own enrollments, progress or profile edits.
+    """
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        response = self.get_response(request)
+        if self.wrote(request, response):
+            pin_to_primary(request.user.pk)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.wrote(request, response):
+            await apin_to_primary(request.user.pk)
+        return response
+
+    def wrote(self, request, response):
+        # DRF copies the authenticated (JWT) user back onto the Django request.
+        user = getattr(request, 'user', None)
+        return (
+            request.method not in SAFE_METHODS and response.status_code < 400
+            and user is not None and user.is_authenticated
+        )
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """
+    Compresses GET/HEAD responses with brotli or gzip, as negotiated through
+    Accept-Encoding. Compressed bodies are cached under the response ETag in
+    the 'compressed' cache, so a given body is compressed once and repeat hits
+    cost no compression CPU.
+
+    Unsafe methods are never compressed: login and token refresh responses
+    carry secrets next to request-controlled data (BREACH).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'COMPRESSION_ENABLED', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        response = self.get_response(request)
+        encoding = self.negotiate(request, response)
+        if encoding is None:
+            return response
+        key = self.cache_key(response, encoding)
+        content = caches[COMPRESSED_CACHE].get(key)
+        if content is None:
+            content = self.compress(response.content, encoding)
+            caches[COMPRESSED_CACHE].set(key, content, timeout=settings.COMPRESSION_CACHE_TTL)
+        return self.finish(response, encoding, content)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        encoding = self.negotiate(request, response)
+        if encoding is None:
+            return response
+        key = self.cache_key(response, encoding)
+        content = await caches[COMPRESSED_CACHE].aget(key)
+        if content is None:
+            content = self.compress(response.content, encoding)
+            await caches[COMPRESSED_CACHE].aset(key, content, timeout=settings.COMPRESSION_CACHE_TTL)
+        return self.finish(response, encoding, content)
+
+    def negotiate(self, request, response):
+        if (
+            request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        ):
+            return None
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+    def cache_key(self, response, encoding):
+        # A strong ETag identifies the exact bytes; anything else is re-hashed.
+        if not response.get('ETag', '').startswith('"'):
+            del response['ETag']
+            set_response_etag(response)
+        etag = response['ETag'].strip('"')
+        return f"{COMPRESSED_CACHE_KEY}_{encoding}_{etag}"
+
+    def compress(self, content, encoding):
+        with timed('compress'):
+            return ENCODERS[encoding](content)
+
+    def finish(self, response, encoding, content):
+        # The compressed representation is only weakly equivalent to the original.
+        response['ETag'] = f"W/{response['ETag']}"
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_course_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseRankingUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.BooleanField()),
+                ('through', models.DateTimeField(help_text='Events up to this time are included')),
+                ('courses', models.IntegerField(help_text='Courses whose scores changed')),
+                ('seconds', models.FloatField()),
+                ('ran_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='popular_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', '-trending_score', '-id'], name='course_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', '-popular_score', '-id'], name='course_popular_idx'),
+        ),
+    ]
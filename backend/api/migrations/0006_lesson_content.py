@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:12
+
+import hashlib
+import logging
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def move_content_to_blobs(apps, schema_editor):
+    """
+    Compresses lesson text into LessonContent in batches and logs the space
+    saved (``manage.py lesson_content_stats`` reports it later too).
+    """
+    Lesson = apps.get_model('api', 'Lesson')
+    LessonContent = apps.get_model('api', 'LessonContent')
+    db_alias = schema_editor.connection.alias
+    lessons = Lesson.objects.using(db_alias).exclude(content='').order_by('pk')
+    last_pk, converted, raw_bytes, stored_bytes, blobs = 0, 0, 0, 0, 0
+    while batch := list(lessons.filter(pk__gt=last_pk).only('pk', 'content')[:BATCH_SIZE]):
+        new = {}
+        for lesson in batch:
+            encoded = lesson.content.encode()
+            lesson.body_id = hashlib.sha256(encoded).hexdigest()
+            raw_bytes += len(encoded)
+            if lesson.body_id not in new:
+                new[lesson.body_id] = LessonContent(sha256=lesson.body_id, data=zlib.compress(encoded, 6),
+                                                    size=len(encoded))
+        existing = set(LessonContent.objects.using(db_alias).filter(pk__in=new).values_list('pk', flat=True))
+        added = [blob for digest, blob in new.items() if digest not in existing]
+        LessonContent.objects.using(db_alias).bulk_create(added)
+        Lesson.objects.using(db_alias).bulk_update(batch, ['body'])
+        blobs += len(added)
+        stored_bytes += sum(len(blob.data) for blob in added)
+        converted += len(batch)
+        last_pk = batch[-1].pk
+    if converted:
+        logger.info("Moved %d lesson bodies (%d bytes) into %d compressed blobs (%d bytes): %.1f%% saved",
+                    converted, raw_bytes, blobs, stored_bytes, 100 * (1 - stored_bytes / raw_bytes))
+
+
+def restore_content(apps, schema_editor):
+    Lesson = apps.get_model('api', 'Lesson')
+    db_alias = schema_editor.connection.alias
+    lessons = Lesson.objects.using(db_alias).filter(body__isnull=False).select_related('body').order_by('pk')
+    last_pk = 0
+    while batch := list(lessons.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+        for lesson in batch:
+            lesson.content = zlib.decompress(bytes(lesson.body.data)).decode()
+        Lesson.objects.using(db_alias).bulk_update(batch, ['content'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_enrollment_completed_lessons'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonContent',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(help_text='Uncompressed size in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='body',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='lessons', to='api.lessoncontent'),
+        ),
+        migrations.RunPython(move_content_to_blobs, restore_content),
+        migrations.RemoveField(
+            model_name='lesson',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterReconciliation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phase', models.CharField(help_text='Counters being reconciled', max_length=20)),
+                ('last_id', models.BigIntegerField(default=0, help_text='Rows up to this id are reconciled')),
+                ('checked', models.BigIntegerField(default=0)),
+                ('corrected', models.BigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -1,4 +1,14 @@
 from .user import User, Profile
-from .course import Course, Lesson, Enrollment
+from .course import Course, CourseSlugCounter, Lesson, LessonContent, Enrollment, ArchivedEnrollment
+from .deletion import AccountDeletion
+from .job import Job
+from .outbox import OutboxCursor, OutboxEvent
+from .ranking import CourseRankingUpdate
+from .reconciliation import CounterReconciliation
+from .recommendation import CourseRecommendation, RecommendationBuild
 
-__all__ = ["User", "Profile", "Course", "Lesson", "Enrollment"]
+__all__ = [
+    "User", "Profile", "Course", "CourseSlugCounter", "Lesson", "LessonContent", "Enrollment", "ArchivedEnrollment",
+    "AccountDeletion", "Job", "OutboxCursor", "OutboxEvent", "CourseRankingUpdate", "CounterReconciliation",
+    "CourseRecommendation", "RecommendationBuild",
+]
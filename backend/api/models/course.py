@@ -1,5 +1,15 @@
-from django.db import models
+import hashlib
+import re
+import zlib
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Length
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.text import slugify
 
 User = get_user_model()
 
@@ -44,16 +54,68 @@ class Course(models.Model):
     # Analytics (will be automatically updated)
     enrolled_students_count = models.IntegerField(default=0)
 
+    # Time-decayed rankings, maintained by `manage.py update_course_rankings`
+    # (see api/rankings.py); only their order is meaningful.
+    trending_score = models.FloatField(default=0, editable=False)
+    popular_score = models.FloatField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Top-N of a ranking over the published catalog is an index scan.
+            models.Index(fields=['status', '-trending_score', '-id'], name='course_trending_idx'),
+            models.Index(fields=['status', '-popular_score', '-id'], name='course_popular_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.instructor.username}"
 
 
+class CourseSlugCounter(models.Model):
+    """
+    The last suffix handed out for each base slug. Course creation takes the
+    next one with a single atomic increment, so concurrent courses with the
+    same title never probe for or race on a free slug.
+    """
+    base = models.SlugField(max_length=200, unique=True)
+    last = models.PositiveIntegerField(default=0)
+
+    # Room for "-<suffix>" within Course.slug's max_length.
+    BASE_MAX_LENGTH = 189
+
+    def __str__(self):
+        return f"{self.base} ({self.last})"
+
+    @classmethod
+    def next_slug(cls, title):
+        """``base`` for the first course with this title, then ``base-1``, ``base-2``, ..."""
+        base = slugify(title)[:cls.BASE_MAX_LENGTH].strip('-') or 'course'
+        with transaction.atomic():
+            if not cls.objects.filter(base=base).update(last=F('last') + 1):
+                cls.start(base)
+            last = cls.objects.filter(base=base).values_list('last', flat=True).get()
+        return f"{base}-{last}" if last else base
+
+    @classmethod
+    def start(cls, base):
+        """
+        Creates the counter past any slugs already taken for ``base`` (one
+        prefix scan); if another creator got there first, increments theirs.
+        """
+        pattern = re.compile(rf"{re.escape(base)}-(\d+)")
+        taken = Course.objects.filter(Q(slug=base) | Q(slug__startswith=f"{base}-")).values_list('slug', flat=True)
+        suffixes = [int(match[1]) for slug in taken if (match := pattern.fullmatch(slug))]
+        last = max(suffixes, default=0) + 1 if taken else 0
+        try:
+            with transaction.atomic():
+                cls.objects.create(base=base, last=last)
+        except IntegrityError:
+            cls.objects.filter(base=base).update(last=F('last') + 1)
+
+
 class Enrollment(models.Model):
     """
     Enrollment model to track student enrollments in courses.
@@ -63,6 +125,8 @@ class Enrollment(models.Model):
         ('completed', 'Completed'),
         ('dropped', 'Dropped'),
     )
+    # Statuses counted by enrolled_students_count and the profile course counts.
+    COUNTED_STATUSES = ('active', 'completed')
 
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
@@ -70,6 +134,8 @@ class Enrollment(models.Model):
 
     # Progress tracking
     progress_percentage = models.IntegerField(default=0)
+    # Bit i is set once the i-th lesson (by Lesson.order) is done; see api/progress.py.
+    completed_lessons = models.BinaryField(default=b'')
     last_accessed = models.DateTimeField(auto_now=True)
 
     enrolled_at = models.DateTimeField(auto_now_add=True)
@@ -83,6 +149,131 @@ class Enrollment(models.Model):
         return f"{self.student.username} - {self.course.title}"
 
 
+class ArchivedEnrollment(models.Model):
+    """
+    A completed or dropped enrollment moved out of the Enrollment table by
+    ``manage.py archive_enrollments``, with its original id; see
+    api/archive.py. Rows are never changed once archived.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_enrollments')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='archived_enrollments')
+    status = models.CharField(max_length=20, choices=Enrollment.STATUS_CHOICES)
+    progress_percentage = models.IntegerField(default=0)
+    completed_lessons = models.BinaryField(default=b'')
+    last_accessed = models.DateTimeField()
+    enrolled_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-enrolled_at']
+
+    def __str__(self):
+        return f"{self.student.username} - {self.course.title} (archived)"
+
+
+class LessonContent(models.Model):
+    """
+    A lesson body, zlib-compressed and keyed by the SHA-256 of its text, so
+    identical bodies (cloned or re-run courses) are stored once. Rows are
+    immutable: changed text is a new row, and the rows no lesson uses any
+    more are removed by ``manage.py prune_lesson_content``.
+    """
+    COMPRESSION_LEVEL = 6
+    # A body is stored just before the lesson pointing at it is saved; rows
+    # stored (or reused, which resets created_at) more recently are never
+    # pruned, so that save cannot lose its body.
+    PRUNE_AFTER = timedelta(hours=1)
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(help_text="Uncompressed size in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes)"
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    @classmethod
+    def compress(cls, text):
+        return zlib.compress(text.encode(), cls.COMPRESSION_LEVEL)
+
+    @staticmethod
+    def decompress(data):
+        return zlib.decompress(bytes(data)).decode() if data else ''
+
+    @cached_property
+    def text(self):
+        return self.decompress(self.data)
+
+    @classmethod
+    def store(cls, text, digest=None):
+        """The row holding ``text``, compressed and inserted only if it is new."""
+        digest = digest or cls.digest(text)
+        blob = cls.objects.filter(pk=digest).first()
+        now = timezone.now()
+        if blob is not None and blob.created_at < now - cls.PRUNE_AFTER / 2:
+            # An old row may be an orphan about to be pruned: renew it, or store it
+            # again if prune() got there first.
+            if not cls.objects.filter(pk=digest).update(created_at=now):
+                blob = None
+        if blob is None:
+            blob = cls(sha256=digest, data=cls.compress(text), size=len(text.encode()))
+            cls.objects.bulk_create([blob], ignore_conflicts=True)
+        blob.text = text
+        return blob
+
+    @classmethod
+    def usage(cls):
+        """
+        (lessons with a body, their text in bytes, stored bodies, their
+        compressed bytes): what the content-addressed, compressed storage saves.
+        """
+        lessons = Lesson.objects.filter(body__isnull=False).aggregate(n=Count('pk'), raw=Sum('body__size'))
+        blobs = cls.objects.aggregate(n=Count('pk'), stored=Sum(Length('data')))
+        return lessons['n'], lessons['raw'] or 0, blobs['n'], blobs['stored'] or 0
+
+    @classmethod
+    def orphaned(cls):
+        """Bodies no lesson uses (replaced or deleted), older than PRUNE_AFTER."""
+        return cls.objects.filter(lessons__isnull=True, created_at__lt=timezone.now() - cls.PRUNE_AFTER)
+
+    @classmethod
+    def prune(cls):
+        """
+        Deletes the orphaned bodies; returns how many went. The rows are locked
+        and checked again before they go, so one that store() renewed or a
+        lesson took meanwhile stays.
+        """
+        with transaction.atomic():
+            orphans = list(cls.orphaned().select_for_update().values_list('pk', flat=True))
+            return cls.orphaned().filter(pk__in=orphans).delete()[0]
+
+
+class LessonQuerySet(models.QuerySet):
+    """Refuses bulk writes of lessons whose ``content`` was set: only save() stores it."""
+
+    def check_content(self, objs):
+        if any(lesson._new_content is not None for lesson in objs):
+            raise ValueError(
+                "Lesson.content is stored by save(); bulk writes need body=LessonContent.store(text) instead."
+            )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self.check_content(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self.check_content(objs)
+        return super().bulk_update(objs, *args, **kwargs)
+
+
 class Lesson(models.Model):
     """
     Lesson model for course content (text lessons and videos).
@@ -98,8 +289,10 @@ class Lesson(models.Model):
 
     lesson_type = models.CharField(max_length=20, choices=LESSON_TYPE_CHOICES, default='text')
 
-    # Text content
-    content = models.TextField(blank=True)
+    # Text content, stored deduplicated in LessonContent; see the `content` property.
+    body = models.ForeignKey(
+        LessonContent, on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name='lessons'
+    )
 
     # Video content
     video_url = models.URLField(blank=True, help_text="Video lesson URL")
@@ -111,8 +304,38 @@ class Lesson(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = LessonQuerySet.as_manager()
+
     class Meta:
         ordering = ['order']
+        indexes = [
+            # A course's lessons in order are a range scan (course-scoped routes, progress positions).
+            models.Index(fields=['course', 'order', 'id'], name='lesson_course_order_idx'),
+        ]
+
+    _new_content = None
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+
+    @property
+    def content(self):
+        """The lesson text, decompressed on first access (select_related('body') avoids a query)."""
+        if self._new_content is not None:
+            return self._new_content
+        return self.body.text if self.body_id else ''
+
+    @content.setter
+    def content(self, value):
+        self._new_content = value or ''
+
+    def save(self, *args, **kwargs):
+        if self._new_content is not None:
+            text, self._new_content = self._new_content, None
+            digest = LessonContent.digest(text) if text else None
+            # Unchanged text never touches the content table.
+            if digest != self.body_id:
+                self.body = LessonContent.store(text, digest) if digest else None
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'body'}
+        super().save(*args, **kwargs)
@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class AccountDeletion(models.Model):
+    """
+    A requested account deletion and how far it got; see api/deletion.py.
+    The row outlives the user, so it keeps their id and username.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    )
+
+    user_id = models.BigIntegerField(db_index=True)
+    username = models.CharField(max_length=150)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    step = models.CharField(max_length=50, blank=True, help_text="Dependents being deleted")
+    deleted = models.BigIntegerField(default=0, help_text="Rows deleted so far")
+    requested_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"Deletion of {self.username} ({self.status}, {self.deleted} rows)"
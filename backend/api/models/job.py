@@ -0,0 +1,44 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A unit of background work: a registered job function and its keyword
+    arguments, run by ``manage.py run_workers``; see api/jobs.py. Finished
+    jobs are deleted, failed ones are kept with their last error.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    )
+
+    queue = models.CharField(max_length=50, default='default')
+    name = models.CharField(max_length=100, help_text="Registered job name")
+    kwargs = models.JSONField(default=dict)
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True,
+                                  help_text="At most one queued job per key")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            # Workers claim the due jobs of a queue in run_at order.
+            models.Index(fields=['queue', 'status', 'run_at'], name='job_claim_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedupe_key'], condition=Q(status='queued'),
+                                    name='unique_queued_job_dedupe_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} on {self.queue} ({self.status})"
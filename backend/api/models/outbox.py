@@ -0,0 +1,34 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event (registration, enrollment, progress, completion, course
+    status change), appended in the same transaction as the change it
+    describes. ``manage.py relay_outbox`` ships events to the sinks in id
+    order; see api/outbox.py.
+    """
+    kind = models.CharField(max_length=50, help_text="e.g. enrollment.created")
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind}"
+
+
+class OutboxCursor(models.Model):
+    """
+    How far the relay has delivered to one sink: every event up to
+    ``last_event_id`` was accepted by it.
+    """
+    sink = models.CharField(max_length=100, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+    delivered = models.BigIntegerField(default=0, help_text="Events delivered so far")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.sink} through #{self.last_event_id}"
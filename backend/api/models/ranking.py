@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class CourseRankingUpdate(models.Model):
+    """
+    One run of the course ranking job. The latest run's ``through`` is where
+    the next incremental run starts.
+    """
+    full = models.BooleanField()
+    through = models.DateTimeField(help_text="Events up to this time are included")
+    courses = models.IntegerField(help_text="Courses whose scores changed")
+    seconds = models.FloatField()
+    ran_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{'Full' if self.full else 'Incremental'} ranking update through {self.through}"
@@ -0,0 +1,42 @@
+from django.db import models
+
+from api.models.course import Course
+
+
+class CourseRecommendation(models.Model):
+    """
+    "Students who took this also took": the top-K courses most often
+    co-enrolled with ``course``, ranked from 1. Built by
+    ``manage.py build_recommendations``.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommended_by')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['course_id', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'rank'], name='unique_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.recommended_id} (#{self.rank})"
+
+
+class RecommendationBuild(models.Model):
+    """
+    One run of the recommendation builder. The latest build's
+    ``last_enrollment_id`` is where the next incremental build starts.
+    """
+    full = models.BooleanField()
+    last_enrollment_id = models.BigIntegerField()
+    courses = models.IntegerField(help_text="Courses whose recommendations were rebuilt")
+    seconds = models.FloatField()
+    built_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{'Full' if self.full else 'Incremental'} build through enrollment {self.last_enrollment_id}"
@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class CounterReconciliation(models.Model):
+    """
+    One run of ``manage.py reconcile_counters``. ``phase`` and ``last_id``
+    record how far it got, so an interrupted run resumes where it stopped.
+    """
+    phase = models.CharField(max_length=20, help_text="Counters being reconciled")
+    last_id = models.BigIntegerField(default=0, help_text="Rows up to this id are reconciled")
+    checked = models.BigIntegerField(default=0)
+    corrected = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        state = 'finished' if self.finished_at else f"at {self.phase} {self.last_id}"
+        return f"Counter reconciliation {self.pk} ({state})"
@@ -0,0 +1,108 @@
+"""
+Precomputed OpenAPI schema.
+
+Generating the schema introspects every view and serializer, so it is done
+once per code version: at image build time with ``manage.py build_schema``,
+or on the first request when no build matches. The rendered YAML and JSON
+documents, plus their compressed variants, are written to SCHEMA_CACHE_DIR
+and kept in memory by each process.
+
+The code version is APP_VERSION when set, otherwise a fingerprint of the
+project's source files and the schema-relevant library versions.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import drf_spectacular
+import rest_framework
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+from api.middleware import ENCODERS
+
+RENDERERS = {'yaml': OpenApiYamlRenderer, 'json': OpenApiJsonRenderer}
+SOURCE_PACKAGES = ('api', 'learnhub_api')
+
+_lock = threading.Lock()
+_cached = None
+
+
+@lru_cache(maxsize=None)
+def schema_version():
+    if settings.APP_VERSION:
+        return settings.APP_VERSION
+    digest = hashlib.sha256(f"{drf_spectacular.__version__}:{rest_framework.VERSION}".encode())
+    base_dir = Path(settings.BASE_DIR)
+    paths = (path for package in SOURCE_PACKAGES for path in (base_dir / package).rglob('*.py'))
+    for path in sorted(paths):
+        digest.update(str(path.relative_to(base_dir)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def variant_names():
+    """(format, encoding) of every stored variant; encoding None is uncompressed."""
+    return [(fmt, encoding) for fmt in RENDERERS for encoding in (None, *ENCODERS)]
+
+
+def variant_path(directory, version, fmt, encoding):
+    return Path(directory) / (f"{version}.{fmt}.{encoding}" if encoding else f"{version}.{fmt}")
+
+
+def build_schema():
+    """Generates the schema and renders every variant; returns {(format, encoding): bytes}."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(urlconf=spectacular_settings.SERVE_URLCONF)
+    data = generator.get_schema(request=None, public=spectacular_settings.SERVE_PUBLIC)
+    variants = {}
+    for fmt, renderer_class in RENDERERS.items():
+        renderer = renderer_class()
+        content = renderer.render(data, renderer.media_type, {})
+        variants[(fmt, None)] = content
+        for encoding, compress in ENCODERS.items():
+            variants[(fmt, encoding)] = compress(content)
+    return variants
+
+
+def write_schema(version, variants, directory):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for (fmt, encoding), content in variants.items():
+        # Write-then-rename so concurrent workers never read a partial file.
+        handle, temp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'wb') as temp_file:
+            temp_file.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, variant_path(directory, version, fmt, encoding))
+
+
+def read_schema(version, directory):
+    """The stored variants for ``version``, or None if any is missing."""
+    try:
+        return {
+            (fmt, encoding): variant_path(directory, version, fmt, encoding).read_bytes()
+            for fmt, encoding in variant_names()
+        }
+    except OSError:
+        return None
+
+
+def get_schema():
+    """(version, variants) for the running code, building and storing them if needed."""
+    global _cached
+    version = schema_version()
+    with _lock:
+        if _cached is None or _cached[0] != version:
+            variants = read_schema(version, settings.SCHEMA_CACHE_DIR)
+            if variants is None:
+                variants = build_schema()
+                try:
+                    write_schema(version, variants, settings.SCHEMA_CACHE_DIR)
+                except OSError:
+                    pass  # read-only filesystem: keep serving from memory
+            _cached = (version, variants)
+        return _cached
@@ -0,0 +1,202 @@
+"""
+Transactional outbox for domain events.
+
+``record(kind, **payload)`` appends an OutboxEvent inside the transaction
+of the change it describes, so an event exists exactly when its change was
+committed. ``relay()`` (``manage.py relay_outbox``) reads events in id
+order, a batch at a time, and hands each batch to every configured sink:
+
+- ``ndjson``: appends one JSON line per event to a file per UTC day
+- any dotted path to a Sink subclass
+
+QueueSink hands batches to a consumer thread in the relaying process, so it
+is for embedding ``relay()`` (tests, benchmarks), not for relay_outbox.
+
+Each sink has its own OutboxCursor, advanced only after the sink accepted
+a batch, so delivery is at-least-once: a crash between the two resends the
+batch, and consumers deduplicate on the event ``id``. A failing sink stops
+its own cursor, not the others: its error is logged and the batch is
+retried after OUTBOX_RETRY_BACKOFF_SECONDS, doubled per consecutive failure
+up to OUTBOX_RETRY_MAX_SECONDS. Memory is bounded by one batch.
+
+Ids are allocated when a transaction inserts, not when it commits, so a
+slow transaction can commit an event below one that is already visible.
+The relay therefore never moves a cursor past a missing id: it delivers up
+to the gap and waits for the gap to fill. A gap can also be an id whose
+transaction rolled back, which never fills, so once the event after it is
+older than OUTBOX_RELAY_LAG_SECONDS the missing ids are logged and skipped.
+"""
+import itertools
+import logging
+import os
+import queue
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from api.models.outbox import OutboxCursor, OutboxEvent
+from api.renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ('id', 'kind', 'payload', 'created_at')
+
+
+def record(kind, **payload):
+    """Appends an event; call it inside the atomic block that makes the change."""
+    return OutboxEvent.objects.create(kind=kind, payload=payload)
+
+
+class Sink:
+    """Receives batches of events (dicts in id order); raising leaves the batch undelivered."""
+    name = None
+    # Consecutive failed batches, and the monotonic time before which the relay skips the sink.
+    failures = 0
+    retry_at = 0.0
+
+    def send(self, events):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NDJSONSink(Sink):
+    """Appends events to ``<directory>/events-YYYY-MM-DD.ndjson``, fsynced once per batch and file."""
+    name = 'ndjson'
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.OUTBOX_NDJSON_DIR)
+        self.renderer = FastJSONRenderer()
+
+    def send(self, events):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for day, group in itertools.groupby(events, key=lambda event: event['created_at'][:10]):
+            lines = b''.join(self.renderer.render(event) + b'\n' for event in group)
+            with open(self.directory / f"events-{day}.ndjson", 'ab') as stream:
+                stream.write(lines)
+                stream.flush()
+                os.fsync(stream.fileno())
+
+
+class QueueSink(Sink):
+    """
+    Puts each batch on a bounded queue.Queue for a consumer in the same
+    process; a full queue past ``timeout`` fails the batch (backpressure).
+    Not registered for relay_outbox: nothing in that process reads the queue.
+    """
+    name = 'queue'
+
+    def __init__(self, maxsize=100, timeout=5.0):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.timeout = timeout
+
+    def send(self, events):
+        self.queue.put(events, timeout=self.timeout)
+
+
+SINKS = {sink.name: sink for sink in (NDJSONSink,)}
+
+
+def load_sinks(names=None):
+    """Sink instances for ``names`` (default OUTBOX_SINKS): registered names or dotted paths."""
+    return [(SINKS.get(name) or import_string(name))() for name in (names or settings.OUTBOX_SINKS)]
+
+
+def pending(after, limit):
+    """
+    Up to ``limit`` events after id ``after``, as dicts, stopping at the first
+    id gap younger than OUTBOX_RELAY_LAG_SECONDS. A reader starting from 0
+    takes the oldest event as it finds it: ids below it were pruned.
+    """
+    settled = timezone.now() - timedelta(seconds=settings.OUTBOX_RELAY_LAG_SECONDS)
+    expected = after + 1 if after else None
+    events = []
+    for event in OutboxEvent.objects.filter(pk__gt=after).order_by('pk').values(*EVENT_FIELDS)[:limit]:
+        if expected is not None and event['id'] != expected:
+            if event['created_at'] > settled:
+                break
+            logger.warning("Outbox events %s-%s never committed within %ss; skipped",
+                           expected, event['id'] - 1, settings.OUTBOX_RELAY_LAG_SECONDS)
+        expected = event['id'] + 1
+        event['created_at'] = event['created_at'].isoformat()
+        events.append(event)
+    return events
+
+
+def relay_once(sinks, batch_size=None):
+    """
+    Delivers at most one batch to each sink not backing off after a failure;
+    returns how many events went out.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    delivered = 0
+    for sink in sinks:
+        if time.monotonic() < sink.retry_at:
+            continue
+        cursor, _ = OutboxCursor.objects.get_or_create(sink=sink.name)
+        events = pending(cursor.last_event_id, batch_size)
+        if not events:
+            continue
+        try:
+            sink.send(events)
+        except Exception:
+            sink.failures += 1
+            backoff = min(settings.OUTBOX_RETRY_BACKOFF_SECONDS * 2 ** (sink.failures - 1),
+                          settings.OUTBOX_RETRY_MAX_SECONDS)
+            sink.retry_at = time.monotonic() + backoff
+            logger.exception("Outbox sink %s failed on events %s-%s; retrying in %.0fs",
+                             sink.name, events[0]['id'], events[-1]['id'], backoff)
+            continue
+        sink.failures = 0
+        OutboxCursor.objects.filter(sink=sink.name).update(
+            last_event_id=events[-1]['id'], delivered=F('delivered') + len(events), updated_at=timezone.now()
+        )
+        delivered += len(events)
+    return delivered
+
+
+def relay(sinks, batch_size=None, poll_interval=None, once=False):
+    """
+    Ships events until interrupted, sleeping ``poll_interval`` seconds when
+    caught up (``once``: until caught up or backing off). Returns the events
+    delivered.
+    """
+    poll_interval = settings.OUTBOX_POLL_SECONDS if poll_interval is None else poll_interval
+    total = 0
+    try:
+        while True:
+            delivered = relay_once(sinks, batch_size)
+            total += delivered
+            if not delivered:
+                if once:
+                    return total
+                time.sleep(poll_interval)
+    finally:
+        for sink in sinks:
+            sink.close()
+
+
+def prune(sinks, batch_size=None):
+    """
+    Deletes events older than OUTBOX_RETENTION_DAYS that every one of
+    ``sinks`` has received, a batch at a time. Returns the number deleted.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    names = [sink.name for sink in sinks]
+    cursors = OutboxCursor.objects.filter(sink__in=names)
+    if cursors.count() < len(set(names)):
+        return 0
+    delivered = cursors.aggregate(through=Min('last_event_id'))['through']
+    expired = OutboxEvent.objects.filter(
+        pk__lte=delivered, created_at__lt=timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    )
+    deleted = 0
+    while ids := list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size]):
+        deleted += OutboxEvent.objects.filter(pk__in=ids).delete()[0]
+    return deleted
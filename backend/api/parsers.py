@@ -0,0 +1,34 @@
+"""
+JSON parser backed by orjson, with DRF's JSONParser as the fallback.
+
+One known difference: integers beyond 64 bits parse as floats rather than
+exact ints. No API field accepts them either way.
+"""
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from api.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    Parses UTF-8 request bodies with orjson. Bodies orjson rejects (NaN,
+    lone surrogates, malformed JSON) are handed to JSONParser, so accepted
+    input and error messages match the stock parser.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,150 @@
+"""
+Per-lesson completion, stored as one bitmap per enrollment.
+
+Bit i of ``Enrollment.completed_lessons`` (least significant bit first
+within each byte) is set once the student finishes the i-th lesson of the
+course in ``Lesson.order``; a 40-lesson course costs 5 bytes per
+enrollment instead of 40 rows. Reordering or inserting lessons shifts the
+positions of the lessons after the change.
+
+Marking a lesson is a single UPDATE that sets the bit and derives
+``progress_percentage`` from the bit count, capped at the lesson count (bits
+of removed lessons stay set), so concurrent completions never lose each
+other. Postgres (14+) does this with ``set_bit``/``bit_count`` on
+bytea; SQLite uses the equivalent functions registered by
+``register_sqlite_functions`` on every connection. The statement is raw
+SQL: completions are frequent and ORM compilation would dominate them.
+Each completion appends a ``lesson.completed`` outbox event in the same
+transaction.
+"""
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models.course import Enrollment, Lesson
+from api.outbox import record
+from api.tasks import defer_profile_counts
+
+# Sets bit {position} of {bitmap}, zero-padding it as needed, and counts set bits.
+SET_BIT_SQL = {
+    'postgresql': "set_bit({bitmap} || decode(repeat('00', greatest(0, {position} / 8 + 1 - length({bitmap}))), "
+                  "'hex'), {position}, 1)",
+    'sqlite': "lh_set_bit({bitmap}, {position})",
+}
+BIT_COUNT_SQL = {
+    'postgresql': "bit_count({bitmap})",
+    'sqlite': "lh_bit_count({bitmap})",
+}
+LEAST_SQL = {
+    'postgresql': "least({}, {})",
+    'sqlite': "min({}, {})",
+}
+
+
+def set_bit(bitmap, position):
+    bitmap = bytearray(bitmap or b'')
+    byte = position // 8
+    if len(bitmap) <= byte:
+        bitmap.extend(bytes(byte + 1 - len(bitmap)))
+    bitmap[byte] |= 1 << position % 8
+    return bytes(bitmap)
+
+
+def bit_count(bitmap):
+    return int.from_bytes(bitmap or b'', 'little').bit_count()
+
+
+def register_sqlite_functions(sender, connection, **kwargs):
+    """connection_created receiver: the SQLite functions used by SET_BIT_SQL and BIT_COUNT_SQL."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('lh_set_bit', 2, set_bit, deterministic=True)
+        connection.connection.create_function('lh_bit_count', 1, bit_count, deterministic=True)
+
+
+def completed_positions(bitmap, lesson_count):
+    """Positions of the set bits below ``lesson_count``."""
+    bits = np.unpackbits(np.frombuffer(bytes(bitmap or b''), dtype=np.uint8), bitorder='little')
+    return np.flatnonzero(bits[:lesson_count]).tolist()
+
+
+def progress_percentage(bitmap, lesson_count):
+    """The progress a bitmap stands for: its finished positions out of ``lesson_count``."""
+    if not lesson_count:
+        return 0
+    return len(completed_positions(bitmap, lesson_count)) * 100 // lesson_count
+
+
+def course_lessons(course_id):
+    """The course's lesson ids in position order."""
+    return list(Lesson.objects.filter(course_id=course_id).order_by('order', 'id').values_list('pk', flat=True))
+
+
+def complete_lesson(enrollment, lesson):
+    """
+    Marks ``lesson`` done for ``enrollment`` and recomputes its progress in
+    one UPDATE; completing the last lesson completes the enrollment.
+    Returns the enrollment with its new bitmap and progress. A dropped
+    enrollment cannot complete lessons: it is counted nowhere, so
+    completing it would leave the counters out of step.
+    """
+    if enrollment.status == 'dropped':
+        raise ValueError("A dropped enrollment cannot complete lessons.")
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*), COUNT(CASE WHEN {quote('order')} < %s OR ({quote('order')} = %s AND id < %s) "
+            f"THEN 1 END) FROM {quote(Lesson._meta.db_table)} WHERE course_id = %s",
+            [lesson.order, lesson.order, lesson.pk, enrollment.course_id],
+        )
+        total, position = cursor.fetchone()
+        # Both integers come from the database, so they can be inlined.
+        bitmap = SET_BIT_SQL[connection.vendor].format(bitmap=quote('completed_lessons'), position=int(position))
+        done = LEAST_SQL[connection.vendor].format(BIT_COUNT_SQL[connection.vendor].format(bitmap=bitmap), int(total))
+        update = (
+            f"UPDATE {quote(Enrollment._meta.db_table)} SET completed_lessons = {bitmap}, "
+            f"progress_percentage = {done} * 100 / {int(total)}, last_accessed = %s WHERE id = %s"
+        )
+        now = timezone.now()
+        params = [connection.ops.adapt_datetimefield_value(now), enrollment.pk]
+        if connection.features.can_return_columns_from_insert:
+            cursor.execute(f"{update} RETURNING completed_lessons, progress_percentage", params)
+            bitmap, progress = cursor.fetchone()
+        else:
+            cursor.execute(update, params)
+            bitmap, progress = Enrollment.objects.filter(pk=enrollment.pk).values_list(
+                'completed_lessons', 'progress_percentage').get()
+        enrollment.completed_lessons, enrollment.progress_percentage = bytes(bitmap), progress
+        enrollment.last_accessed = now
+        record('lesson.completed', enrollment_id=enrollment.pk, student_id=enrollment.student_id,
+               course_id=enrollment.course_id, lesson_id=lesson.pk, progress_percentage=progress)
+        if enrollment.progress_percentage >= 100:
+            mark_completed(enrollment)
+    return enrollment
+
+
+def mark_completed(enrollment):
+    """
+    Completes an active enrollment, once, and queues the recount of the
+    student's profile counts (call it in a transaction).
+    """
+    now = timezone.now()
+    if Enrollment.objects.filter(pk=enrollment.pk, status='active').update(status='completed', completed_at=now):
+        enrollment.status, enrollment.completed_at = 'completed', now
+        record('enrollment.completed', enrollment_id=enrollment.pk, student_id=enrollment.student_id,
+               course_id=enrollment.course_id)
+        defer_profile_counts(enrollment.student_id)
+
+
+def lesson_completion_counts(course_id, lesson_count):
+    """How many enrollments of the course completed each lesson position."""
+    width = (lesson_count + 7) // 8
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT completed_lessons FROM {connection.ops.quote_name(Enrollment._meta.db_table)} "
+            f"WHERE course_id = %s AND length(completed_lessons) > 0", [course_id]
+        )
+        packed = b''.join(bytes(bitmap)[:width].ljust(width, b'\0') for bitmap, in cursor.fetchall())
+    if not width or not packed:
+        return [0] * lesson_count
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8).reshape(-1, width), axis=1, bitorder='little')
+    return bits[:, :lesson_count].sum(axis=0).tolist()
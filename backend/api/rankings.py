@@ -0,0 +1,140 @@
+"""
+Trending and popular course rankings.
+
+A course's score at time t is the sum of its enrollment, completion and
+progress-activity events, each weighted and decayed exponentially:
+
+    score(t) = sum(w * exp(-rate * (t - t_event)))
+
+with a short half-life for ``trending_score`` and a long one for
+``popular_score``. Every course decays by the same factor between two
+moments, so the order is fully captured by
+
+    log(1 + sum(w * exp(rate * (t_event - EPOCH))))
+
+which never changes as time passes. That is what the columns store: a run
+only updates the courses with new events, folding them in with logaddexp,
+and reading a top-N needs no arithmetic at all.
+
+Incremental runs take the events since the previous run. Progress activity
+is an enrollment's ``last_accessed`` (more than a minute after enrolling);
+a full run only sees each enrollment's latest activity, incremental runs
+accumulate every activity they observe.
+"""
+import itertools
+import math
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models.course import Course, Enrollment
+from api.models.ranking import CourseRankingUpdate
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+ACTIVITY_GRACE = timedelta(minutes=1)
+CHUNK_SIZE = 500
+FETCH_SIZE = 20_000
+
+
+def half_lives():
+    return {
+        'trending_score': timedelta(hours=settings.RANKING_TRENDING_HALF_LIFE_HOURS),
+        'popular_score': timedelta(days=settings.RANKING_POPULAR_HALF_LIFE_DAYS),
+    }
+
+
+def events(since, until):
+    """(course ids, seconds since EPOCH, weights) of the events in (since, until]."""
+    def window(field):
+        bounds = {f'{field}__lte': until}
+        if since is not None:
+            bounds[f'{field}__gt'] = since
+        return Enrollment.objects.filter(**bounds).order_by()
+
+    sources = [
+        (window('enrolled_at'), 'enrolled_at', settings.RANKING_ENROLLMENT_WEIGHT),
+        (window('completed_at'), 'completed_at', settings.RANKING_COMPLETION_WEIGHT),
+        (window('last_accessed').filter(last_accessed__gt=F('enrolled_at') + ACTIVITY_GRACE),
+         'last_accessed', settings.RANKING_ACTIVITY_WEIGHT),
+    ]
+    epoch = EPOCH.timestamp()
+    courses, times, weights = [], [], []
+    for queryset, field, weight in sources:
+        if weight <= 0:
+            continue
+        rows = queryset.values_list('course_id', field).iterator(chunk_size=FETCH_SIZE)
+        pairs = np.fromiter(
+            itertools.chain.from_iterable((course_id, moment.timestamp() - epoch) for course_id, moment in rows),
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        courses.append(pairs[:, 0].astype(np.int64))
+        times.append(pairs[:, 1])
+        weights.append(np.full(len(pairs), weight))
+    if not courses:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    return np.concatenate(courses), np.concatenate(times), np.concatenate(weights)
+
+
+def decayed_log_sums(courses, times, weights, half_life):
+    """(course ids, log of sum(w * exp(rate * t))) per course, as a stable logsumexp."""
+    if not len(courses):
+        return courses, times
+    rate = math.log(2) / half_life.total_seconds()
+    exponents = np.log(weights) + rate * times
+    order = np.argsort(courses, kind='stable')
+    courses, exponents = courses[order], exponents[order]
+    ids, starts = np.unique(courses, return_index=True)
+    peaks = np.maximum.reduceat(exponents, starts)
+    sizes = np.diff(np.append(starts, len(exponents)))
+    return ids, peaks + np.log(np.add.reduceat(np.exp(exponents - np.repeat(peaks, sizes)), starts))
+
+
+def current_scores(ids, fields):
+    scores = {}
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE].tolist()
+        for pk, *values in Course.objects.filter(pk__in=chunk).values_list('pk', *fields):
+            scores[pk] = values
+    return np.array([scores.get(pk, [0.0] * len(fields)) for pk in ids.tolist()]).reshape(len(ids), len(fields))
+
+
+def write_scores(ids, fields, values):
+    quote = connection.ops.quote_name
+    assignments = ', '.join(f"{quote(field)} = %s" for field in fields)
+    sql = f"UPDATE {quote(Course._meta.db_table)} SET {assignments} WHERE id = %s"
+    rows = [(*row, pk) for pk, row in zip(ids.tolist(), values.tolist())]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), CHUNK_SIZE):
+            cursor.executemany(sql, rows[start:start + CHUNK_SIZE])
+
+
+def update(full=False):
+    """
+    Folds the events since the last run into the course scores (all events,
+    from zero, when ``full`` or on the first run) and records the run.
+    """
+    started = time.perf_counter()
+    previous = None if full else CourseRankingUpdate.objects.first()
+    until = timezone.now()
+    fields = list(half_lives())
+
+    with transaction.atomic():
+        courses, times, weights = events(previous.through if previous else None, until)
+        sums = [decayed_log_sums(courses, times, weights, half_life) for half_life in half_lives().values()]
+        ids = sums[0][0]
+        new = np.column_stack([column for _, column in sums]) if len(ids) else np.empty((0, len(fields)))
+        if previous is None:
+            Course.objects.update(**{field: 0 for field in fields})
+            old = np.zeros_like(new)
+        else:
+            old = current_scores(ids, fields)
+        # Scores start at log(1) = 0, so a course with no events ranks last.
+        write_scores(ids, fields, np.logaddexp(old, new))
+        return CourseRankingUpdate.objects.create(
+            full=previous is None, through=until, courses=len(ids), seconds=time.perf_counter() - started,
+        )
@@ -0,0 +1,131 @@
+"""
+Co-enrollment course recommendations.
+
+Enrollments form a sparse binary student x course matrix X. Column j of
+X.T @ X counts, for every course, the students it shares with course j;
+scaled by the courses' enrollment counts that is their cosine (or Jaccard)
+similarity. The top RECOMMENDATIONS_TOP_K courses per course are stored in
+CourseRecommendation, so serving them is one indexed query.
+
+Columns are computed in blocks to bound memory. A full build covers every
+course. An incremental build handles the enrollments created since the
+last build: a new enrollment (s, c) changes c's similarities and those of
+every other course s took, so exactly those courses, plus the ones already
+recommending c, are rebuilt from the enrollments of the students involved.
+Deleted enrollments are only accounted for by the next full build.
+"""
+import itertools
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from scipy import sparse
+
+from api.bulk import TableWriter
+from api.models.course import Course, Enrollment
+from api.models.recommendation import CourseRecommendation, RecommendationBuild
+
+BLOCK_SIZE = 2048
+FETCH_SIZE = 20_000
+
+
+def enrollment_matrix(enrollments):
+    """(X, course id of each column) for an Enrollment queryset."""
+    pairs = enrollments.order_by().values_list('student_id', 'course_id').iterator(chunk_size=FETCH_SIZE)
+    flat = np.fromiter(itertools.chain.from_iterable(pairs), dtype=np.int64).reshape(-1, 2)
+    students, rows = np.unique(flat[:, 0], return_inverse=True)
+    courses, columns = np.unique(flat[:, 1], return_inverse=True)
+    matrix = sparse.csc_matrix(
+        (np.ones(len(flat), dtype=np.int32), (rows, columns)), shape=(len(students), len(courses))
+    )
+    return matrix, courses
+
+
+def enrollment_counts(course_ids):
+    """Enrollments per course, aligned with ``course_ids``."""
+    # Counting every course is an index-only scan, cheaper than restricting it.
+    counts = dict(Enrollment.objects.order_by().values('course').annotate(n=Count('pk')).values_list('course', 'n'))
+    return np.array([counts.get(course_id, 0) for course_id in course_ids.tolist()], dtype=np.float64)
+
+
+def similarities(shared, counts, target_count, similarity):
+    if similarity == 'jaccard':
+        return shared / (counts + target_count - shared)
+    return shared / np.sqrt(counts * target_count)
+
+
+def neighbours(matrix, courses, counts, targets, top_k, similarity, min_support):
+    """
+    Yields (course id, [(recommended id, score), ...]) for each column index
+    in ``targets``, best first; ties go to the lower course id.
+    """
+    transposed = matrix.T.tocsr()
+    for start in range(0, len(targets), BLOCK_SIZE):
+        block = targets[start:start + BLOCK_SIZE]
+        shared = (transposed @ matrix[:, block]).tocsc()
+        for column, target in enumerate(block):
+            indices = shared.indices[shared.indptr[column]:shared.indptr[column + 1]]
+            values = shared.data[shared.indptr[column]:shared.indptr[column + 1]]
+            keep = (indices != target) & (values >= min_support)
+            indices, values = indices[keep], values[keep].astype(np.float64)
+            scores = similarities(values, counts[indices], counts[target], similarity)
+            order = np.lexsort((courses[indices], -scores))[:top_k]
+            yield int(courses[target]), [(int(courses[indices[i]]), float(scores[i])) for i in order]
+
+
+def store(results, replace):
+    """Replaces the recommendations of the course ids in ``replace`` (all when None)."""
+    if replace is None:
+        CourseRecommendation.objects.all().delete()
+    for start in range(0, len(replace or ()), BLOCK_SIZE):
+        CourseRecommendation.objects.filter(course__in=replace[start:start + BLOCK_SIZE]).delete()
+    writer = TableWriter(CourseRecommendation, ['course', 'recommended', 'rank', 'score'], FETCH_SIZE, timezone.now())
+    writer.write(
+        (course_id, recommended_id, rank, score)
+        for course_id, ranked in results
+        for rank, (recommended_id, score) in enumerate(ranked, start=1)
+    )
+
+
+def build(full=False):
+    """
+    Rebuilds recommendations (incrementally, unless ``full`` or there is no
+    previous build) and records the build.
+    """
+    started = time.perf_counter()
+    top_k = settings.RECOMMENDATIONS_TOP_K
+    similarity = settings.RECOMMENDATIONS_SIMILARITY
+    min_support = settings.RECOMMENDATIONS_MIN_SUPPORT
+    previous = None if full else RecommendationBuild.objects.first()
+
+    with transaction.atomic():
+        last_enrollment_id = Enrollment.objects.aggregate(last=Max('pk'))['last'] or 0
+        if previous is not None:
+            new = Enrollment.objects.filter(pk__gt=previous.last_enrollment_id, pk__lte=last_enrollment_id)
+            affected = Course.objects.filter(
+                Q(pk__in=Enrollment.objects.filter(student__in=new.values('student')).values('course'))
+                | Q(pk__in=CourseRecommendation.objects.filter(recommended__in=new.values('course')).values('course'))
+            ).values('pk')
+            replace = list(affected.values_list('pk', flat=True))
+            if len(replace) * 2 > Course.objects.count():
+                previous = None  # most courses changed: a full build is cheaper
+
+        if previous is None:
+            matrix, courses = enrollment_matrix(Enrollment.objects.all())
+            counts = np.asarray(matrix.sum(axis=0), dtype=np.float64).ravel()
+            targets = np.arange(len(courses))
+            replace = None
+        else:
+            involved = Enrollment.objects.filter(course__in=affected).values('student')
+            matrix, courses = enrollment_matrix(Enrollment.objects.filter(student__in=involved))
+            counts = enrollment_counts(courses)
+            targets = np.flatnonzero(np.isin(courses, replace))
+
+        store(neighbours(matrix, courses, counts, targets, top_k, similarity, min_support), replace)
+        return RecommendationBuild.objects.create(
+            full=previous is None, last_enrollment_id=last_enrollment_id, courses=len(targets),
+            seconds=time.perf_counter() - started,
+        )
@@ -0,0 +1,183 @@
+"""
+Reconciliation of the denormalized enrollment counters.
+
+``Course.enrolled_students_count`` and the profile course counts are kept
+up to date as enrollments are made, but nothing takes them back down, so
+they drift. ``reconcile()`` recomputes them from the counted enrollments
+(Enrollment.COUNTED_STATUSES), archived ones included, with one grouped
+aggregate per chunk of RECONCILE_CHUNK_SIZE courses or students and corrects
+the rows that differ with a single ``UPDATE ... FROM`` (PostgreSQL, SQLite
+3.33+):
+
+- each chunk is its own short transaction, so only that chunk's rows are
+  locked, and RECONCILE_PAUSE_SECONDS between chunks leaves room for traffic
+- the run records its phase and the last course or user id reconciled with
+  each chunk; an interrupted run resumes there
+- a dry run reports what would change, with the largest differences, and
+  writes nothing
+
+A counter changed by a request while its chunk is being corrected may be
+off by that change until the next run.
+"""
+import heapq
+import logging
+import time
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models.course import ArchivedEnrollment, Course, Enrollment
+from api.models.reconciliation import CounterReconciliation
+from api.models.user import Profile
+
+logger = logging.getLogger(__name__)
+
+# Chunks follow ``owner``, the column of the counted table that enrollments
+# reference through ``join``, so each chunk reads a range of that index.
+Phase = namedtuple('Phase', 'name model owner join counters')
+PHASES = [
+    Phase('courses', Course, 'id', 'course_id', {
+        'enrolled_students_count': ("COUNT(e.id)", []),
+    }),
+    Phase('profiles', Profile, 'user_id', 'student_id', {
+        'enrolled_courses_count': ("COUNT(e.id)", []),
+        'completed_courses_count': ("COUNT(CASE WHEN e.status = %s THEN 1 END)", ['completed']),
+    }),
+]
+
+Diff = namedtuple('Diff', 'phase id counter stored actual')
+Report = namedtuple('Report', 'run checked corrected drift largest seconds')
+
+
+def actual_counts(phase, low, high):
+    """SQL and params computing the counters of the rows with ``low < owner <= high``, keyed ``k``."""
+    quote = connection.ops.quote_name
+    owner, join = quote(phase.owner), quote(phase.join)
+    counters = ', '.join(f"{expression} AS {quote(counter)}" for counter, (expression, _) in phase.counters.items())
+    placeholders = ', '.join(['%s'] * len(Enrollment.COUNTED_STATUSES))
+    enrollments = ' UNION ALL '.join(
+        f"SELECT id, status, {join} FROM {quote(model._meta.db_table)} "
+        f"WHERE {join} > %s AND {join} <= %s AND status IN ({placeholders})"
+        for model in (Enrollment, ArchivedEnrollment)
+    )
+    sql = (
+        f"SELECT t.{owner} AS k, {counters} FROM {quote(phase.model._meta.db_table)} t "
+        f"LEFT JOIN ({enrollments}) e ON e.{join} = t.{owner} "
+        f"WHERE t.{owner} > %s AND t.{owner} <= %s GROUP BY t.{owner}"
+    )
+    params = [param for _, extra in phase.counters.values() for param in extra]
+    return sql, [*params, *[low, high, *Enrollment.COUNTED_STATUSES] * 2, low, high]
+
+
+def differs(phase, table):
+    quote = connection.ops.quote_name
+    return ' OR '.join(f"{table}.{quote(counter)} <> fixed.{quote(counter)}" for counter in phase.counters)
+
+
+def correct(phase, low, high):
+    """Sets the chunk's counters that differ from the enrollments; returns how many rows changed."""
+    quote = connection.ops.quote_name
+    table = quote(phase.model._meta.db_table)
+    subquery, params = actual_counts(phase, low, high)
+    assignments = ', '.join(f"{quote(counter)} = fixed.{quote(counter)}" for counter in phase.counters)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {assignments} FROM ({subquery}) fixed "
+            f"WHERE {table}.{quote(phase.owner)} = fixed.k AND ({differs(phase, table)})",
+            params,
+        )
+        return cursor.rowcount
+
+
+def compare(phase, low, high):
+    """The chunk's counters that differ from the enrollments, as Diffs."""
+    quote = connection.ops.quote_name
+    subquery, params = actual_counts(phase, low, high)
+    columns = ', '.join(f"t.{quote(counter)}, fixed.{quote(counter)}" for counter in phase.counters)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT fixed.k, {columns} FROM ({subquery}) fixed "
+            f"JOIN {quote(phase.model._meta.db_table)} t ON t.{quote(phase.owner)} = fixed.k "
+            f"WHERE {differs(phase, 't')}",
+            params,
+        )
+        rows = cursor.fetchall()
+    return [
+        Diff(phase.name, pk, counter, values[2 * i], values[2 * i + 1])
+        for pk, *values in rows
+        for i, counter in enumerate(phase.counters)
+        if values[2 * i] != values[2 * i + 1]
+    ]
+
+
+def tally(diffs, drift, heap, largest):
+    """Adds ``diffs`` to the drift per counter and keeps the ``largest`` of them in ``heap``."""
+    for diff in diffs:
+        size = abs(diff.actual - diff.stored)
+        drift[f"{diff.phase}.{diff.counter}"] += size
+        if len(heap) < largest:
+            heapq.heappush(heap, (size, diff))
+        elif largest:
+            heapq.heappushpop(heap, (size, diff))
+
+
+def start(restart):
+    """The latest unfinished run to resume, or a new one."""
+    run = None if restart else CounterReconciliation.objects.filter(finished_at__isnull=True).first()
+    if run is None:
+        return CounterReconciliation.objects.create(phase=PHASES[0].name)
+    logger.info("Resuming counter reconciliation %s at %s %s", run.pk, run.phase, run.last_id)
+    return run
+
+
+def reconcile(dry_run=False, chunk_size=None, restart=False, pause=None, largest=10):
+    """
+    Reconciles every counter, resuming the latest unfinished run unless
+    ``restart``, and returns a Report. A ``dry_run`` starts from the
+    beginning and only reports: ``corrected`` is then the rows that would
+    change, ``drift`` the total difference per counter and ``largest`` the
+    biggest differences.
+    """
+    chunk_size = chunk_size or settings.RECONCILE_CHUNK_SIZE
+    pause = settings.RECONCILE_PAUSE_SECONDS if pause is None else pause
+    started = time.perf_counter()
+    run = CounterReconciliation(phase=PHASES[0].name) if dry_run else start(restart)
+    checked, corrected = run.checked, run.corrected
+    drift, heap = Counter(), []
+
+    names = [phase.name for phase in PHASES]
+    for phase in PHASES[names.index(run.phase):]:
+        last_id = run.last_id if phase.name == run.phase else 0
+        while True:
+            ids = list(
+                phase.model.objects.filter(**{f'{phase.owner}__gt': last_id}).order_by(phase.owner)
+                .values_list(phase.owner, flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            checked += len(ids)
+            if dry_run:
+                diffs = compare(phase, last_id, ids[-1])
+                corrected += len({diff.id for diff in diffs})
+                tally(diffs, drift, heap, largest)
+            else:
+                with transaction.atomic():
+                    corrected += correct(phase, last_id, ids[-1])
+                    CounterReconciliation.objects.filter(pk=run.pk).update(
+                        phase=phase.name, last_id=ids[-1], checked=checked, corrected=corrected,
+                    )
+            last_id = ids[-1]
+            logger.info("Reconciled %s through id %s (%s corrected so far)", phase.name, last_id, corrected)
+            if pause and len(ids) == chunk_size:
+                time.sleep(pause)
+
+    if not dry_run:
+        CounterReconciliation.objects.filter(pk=run.pk).update(
+            phase=PHASES[-1].name, checked=checked, corrected=corrected, finished_at=timezone.now(),
+        )
+        run.refresh_from_db()
+    largest_diffs = [entry[-1] for entry in sorted(heap, reverse=True)]
+    return Report(None if dry_run else run, checked, corrected, dict(drift), largest_diffs,
+                  time.perf_counter() - started)
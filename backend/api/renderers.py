@@ -0,0 +1,51 @@
+"""
+JSON renderer backed by orjson.
+
+Produces the same bytes as DRF's JSONRenderer for the compact, UTF-8 output
+the API serves, several times faster on large course and enrollment lists.
+Anything orjson cannot reproduce (indented or ASCII-only output, integers
+beyond 64 bits) goes through the stock renderer, as does everything when
+orjson is not installed.
+
+Known differences, neither of which the API's serializers produce:
+- floats outside [1e-4, 1e16) use orjson's exponent form (``1e16``, not ``1e+16``)
+- NaN and infinity render as ``null`` instead of raising under STRICT_JSON
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Datetimes go through DRF's encoder for its "Z" suffix; dataclasses are
+    # not JSON to DRF either. Dict keys are coerced to strings like json.dumps.
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in replacement for JSONRenderer using orjson when available."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not self.use_orjson(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Oversized integers and anything else orjson rejects; the stock
+            # renderer either handles it or raises the error callers expect.
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, so the output is valid JavaScript.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+    def use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None and self.compact and not self.ensure_ascii
+            and not self.get_indent(accepted_media_type, renderer_context)
+        )
@@ -0,0 +1,274 @@
+"""
+Synthetic LearnHub data for load testing.
+
+``seed(preset, seed=...)`` inserts users, profiles, courses, lessons and
+enrollments with realistic shapes: course popularity and instructor output
+follow a power law, lesson counts are log-normal and enrollment progress is
+skewed towards the start of a course, with a share of completed and dropped
+enrollments. The same seed always produces the same rows, with timestamps
+relative to the current day.
+
+Rows are built as plain tuples and written in chunks with ``COPY`` on
+Postgres and ``executemany`` elsewhere, bypassing model instances, the
+profile signal and ``auto_now`` (so timestamps can be spread over time).
+Every user shares one precomputed password hash and lesson text goes
+through the deduplicated LessonContent table. Denormalized counters
+(``enrolled_students_count`` and the profile course counts) are filled in
+from the generated enrollments, leaving out dropped ones.
+"""
+import bisect
+import itertools
+import math
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.bulk import TableWriter
+from api.models.course import Course, Enrollment, Lesson, LessonContent
+from api.models.user import Profile, User
+
+SEED_PASSWORD = 'learnhub-seed-123'
+
+
+@dataclass(frozen=True)
+class Preset:
+    students: int
+    instructors: int
+    courses: int
+    lessons: int  # mean per course
+    enrollments: int
+
+
+PRESETS = {
+    'tiny': Preset(students=200, instructors=10, courses=50, lessons=5, enrollments=1_000),
+    'small': Preset(students=5_000, instructors=100, courses=1_000, lessons=8, enrollments=50_000),
+    'medium': Preset(students=100_000, instructors=1_000, courses=10_000, lessons=8, enrollments=1_000_000),
+    'large': Preset(students=1_000_000, instructors=10_000, courses=50_000, lessons=10, enrollments=10_000_000),
+}
+
+CATEGORIES = [
+    'programming', 'data-science', 'design', 'business', 'marketing', 'music',
+    'photography', 'languages', 'finance', 'health', 'devops', 'security',
+]
+TOPICS = [
+    'Python', 'Django', 'SQL', 'React', 'Statistics', 'Machine Learning', 'Docker', 'Kubernetes',
+    'Typography', 'Negotiation', 'SEO', 'Guitar', 'Lighting', 'Spanish', 'Accounting', 'Nutrition',
+]
+LEVELS = ['beginner', 'intermediate', 'advanced']
+PRICES = [Decimal('0.00'), Decimal('9.99'), Decimal('19.99'), Decimal('49.99'), Decimal('99.99')]
+WORDS = (
+    'learn build practice concept example project review module exercise skill theory apply '
+    'design data model test deploy measure improve quiz summary reading lecture'
+).split()
+
+# Zipf exponent for course popularity and instructor output.
+POPULARITY_EXPONENT = 1.1
+HISTORY_DAYS = 365
+
+
+def zipf_cum_weights(count, rng):
+    """Cumulative Zipf weights over a shuffled ranking, so popularity is not ordered by id."""
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1 / rank ** POPULARITY_EXPONENT for rank in ranks))
+
+
+def pick(cum_weights, rng):
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words)).capitalize() + '.'
+
+
+class Seeder:
+    def __init__(self, preset, seed, chunk_size):
+        self.preset = preset
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.password = make_password(SEED_PASSWORD, salt=f'learnhubseed{seed}')
+        self.timestamp = connection.ops.adapt_datetimefield_value
+        self.writers = []
+
+    def rng(self, stage):
+        return random.Random(f"{self.seed}:{stage}")
+
+    def writer(self, model, fields):
+        writer = TableWriter(model, fields, self.chunk_size, self.now)
+        self.writers.append(writer)
+        return writer
+
+    def past(self, rng, days=HISTORY_DAYS):
+        return self.now - timedelta(seconds=rng.randrange(days * 86400))
+
+    def run(self):
+        first_user, first_course = next_id(User), next_id(Course)
+        instructors = range(first_user, first_user + self.preset.instructors)
+        students = range(instructors.stop, instructors.stop + self.preset.students)
+        courses = range(first_course, first_course + self.preset.courses)
+
+        self.write_users(instructors, 'instructor')
+        self.write_users(students, 'student')
+        published = self.write_courses(courses, instructors)
+        self.write_lessons(courses)
+        course_counts, student_counts = self.write_enrollments(students, published)
+        self.write_profiles(instructors, students, student_counts)
+        self.update_course_counts(course_counts)
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Profile, Course, Lesson, Enrollment]):
+                cursor.execute(sql)
+        return self.writers
+
+    def write_users(self, ids, role):
+        rng = self.rng(f'users:{role}')
+        writer = self.writer(User, [
+            'id', 'password', 'username', 'email', 'role', 'is_verified', 'date_joined', 'created_at',
+        ])
+        writer.write(
+            (user_id, self.password, f"seed_{role}{user_id}", f"seed_{role}{user_id}@seed.learnhub.test", role,
+             rng.random() < 0.8, joined, joined)
+            for user_id in ids for joined in [self.timestamp(self.past(rng, HISTORY_DAYS * 2))]
+        )
+
+    def write_courses(self, ids, instructors):
+        """Returns the ids of the published courses."""
+        rng = self.rng('courses')
+        output = zipf_cum_weights(len(instructors), rng)
+        published = []
+        rows = []
+        for course_id in ids:
+            status = 'published' if rng.random() < 0.9 else 'draft'
+            if status == 'published':
+                published.append(course_id)
+            topic = rng.choice(TOPICS)
+            created = self.timestamp(self.past(rng, HISTORY_DAYS * 2))
+            rows.append((
+                course_id, f"{rng.choice(LEVELS).capitalize()} {topic} {course_id}", f"seed-course-{course_id}",
+                sentence(rng, 40), instructors[pick(output, rng)], rng.choice(CATEGORIES), rng.choice(LEVELS),
+                rng.randint(1, 60), status, rng.random() < 0.02, rng.choice(PRICES), created, created,
+            ))
+        self.writer(Course, [
+            'id', 'title', 'slug', 'description', 'instructor', 'category', 'level', 'duration_hours',
+            'status', 'is_featured', 'price', 'created_at', 'updated_at',
+        ]).write(rows)
+        return published
+
+    def write_lessons(self, courses):
+        """Writes the text bodies first (deduplicated, compressed), then the lessons pointing at them."""
+        # Log-normal with sigma 0.6 has mean exp(mu + 0.18).
+        mean = math.log(max(1, self.preset.lessons)) - 0.18
+
+        def lessons():
+            # Replayable: both passes draw the same lessons.
+            rng = self.rng('lessons')
+            for course_id in courses:
+                count = min(60, max(1, round(rng.lognormvariate(mean, 0.6))))
+                for order in range(1, count + 1):
+                    if rng.random() < 0.4:
+                        yield course_id, order, None, rng.randint(3, 45)
+                    else:
+                        yield course_id, order, sentence(rng, 120), 0
+
+        def bodies():
+            """New bodies only: earlier runs may have stored the same text."""
+            seen = set()
+            texts = ((LessonContent.digest(text), text) for _, _, text, _ in lessons() if text)
+            while batch := dict(itertools.islice(texts, 1000)):
+                stored = set(LessonContent.objects.filter(pk__in=batch).values_list('pk', flat=True))
+                for digest, text in batch.items():
+                    if digest not in seen and digest not in stored:
+                        seen.add(digest)
+                        yield digest, LessonContent.compress(text), len(text.encode())
+
+        self.writer(LessonContent, ['sha256', 'data', 'size']).write(bodies())
+        self.writer(Lesson, [
+            'course', 'title', 'order', 'lesson_type', 'body', 'video_url', 'video_duration',
+        ]).write(
+            (course_id, f"Lesson {order}", order, 'text', LessonContent.digest(text), '', 0) if text else
+            (course_id, f"Lesson {order}", order, 'video', None,
+             f"https://videos.learnhub.test/{course_id}/{order}", duration)
+            for course_id, order, text, duration in lessons()
+        )
+
+    def write_enrollments(self, students, published):
+        """
+        Gives each student an exponentially distributed number of courses drawn
+        by popularity. Returns per-course counts and per-student (enrolled,
+        completed) counts.
+        """
+        rng = self.rng('enrollments')
+        popularity = zipf_cum_weights(len(published), rng)
+        mean = self.preset.enrollments / max(1, len(students))
+        course_counts = {}
+        student_counts = {}
+        writer = self.writer(Enrollment, [
+            'student', 'course', 'status', 'progress_percentage', 'enrolled_at', 'last_accessed', 'completed_at',
+        ])
+
+        def rows():
+            for student_id in students:
+                wanted = min(len(published), max(1, round(rng.expovariate(1 / mean)))) if published else 0
+                chosen = set()
+                for _ in range(3):
+                    chosen.update(rng.choices(published, cum_weights=popularity, k=wanted - len(chosen)))
+                    if len(chosen) == wanted:
+                        break
+                completed = dropped = 0
+                for course_id in sorted(chosen):
+                    enrolled = self.past(rng)
+                    accessed = enrolled + (self.now - enrolled) * rng.random()
+                    roll = rng.random()
+                    if roll < 0.2:
+                        status, progress, done = 'completed', 100, self.timestamp(accessed)
+                        completed += 1
+                    elif roll < 0.3:
+                        status, progress, done = 'dropped', int(rng.betavariate(0.8, 3) * 100), None
+                        dropped += 1
+                    else:
+                        status, progress, done = 'active', int(rng.betavariate(0.8, 2) * 99), None
+                    if status in Enrollment.COUNTED_STATUSES:
+                        course_counts[course_id] = course_counts.get(course_id, 0) + 1
+                    yield (student_id, course_id, status, progress, self.timestamp(enrolled),
+                           self.timestamp(accessed), done)
+                student_counts[student_id] = (len(chosen) - dropped, completed)
+
+        writer.write(rows())
+        return course_counts, student_counts
+
+    def write_profiles(self, instructors, students, student_counts):
+        rng = self.rng('profiles')
+        writer = self.writer(Profile, [
+            'user', 'bio', 'teaching_experience', 'enrolled_courses_count', 'completed_courses_count',
+        ])
+        writer.write(itertools.chain(
+            ((user_id, sentence(rng, 20), rng.randint(1, 25), 0, 0) for user_id in instructors),
+            ((user_id, '', 0, *student_counts.get(user_id, (0, 0))) for user_id in students),
+        ))
+
+    def update_course_counts(self, course_counts):
+        table = connection.ops.quote_name(Course._meta.db_table)
+        items = list(course_counts.items())
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(items), self.chunk_size):
+                cursor.executemany(
+                    f"UPDATE {table} SET enrolled_students_count = %s WHERE id = %s",
+                    [(count, course_id) for course_id, count in items[start:start + self.chunk_size]],
+                )
+
+
+def seed(preset, seed=0, chunk_size=50_000):
+    """Inserts a ``preset`` sized dataset; returns the TableWriters with their row counts and timings."""
+    return Seeder(preset, seed, chunk_size).run()
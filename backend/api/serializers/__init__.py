@@ -4,6 +4,7 @@ from .user_serializers import (
     UserRegistrationSerializer,
     LogoutSerializer,
     CustomTokenObtainPairSerializer,
+    AccountDeletionSerializer,
 )
 
 from .course_serializers import (
@@ -12,8 +13,14 @@ from .course_serializers import (
     CourseListSerializer,
     LessonSerializer,
     LessonCreateSerializer,
+    LessonOutlineSerializer,
     EnrollmentSerializer,
+    EnrollmentHistorySerializer,
     EnrollmentCreateSerializer,
+    DashboardEnrollmentSerializer,
+    DashboardSerializer,
+    LessonCompletionSerializer,
+    LessonProgressSerializer,
 )
 
 __all__ = [
@@ -22,11 +29,18 @@ __all__ = [
     "UserRegistrationSerializer",
     "LogoutSerializer",
     "CustomTokenObtainPairSerializer",
+    "AccountDeletionSerializer",
     "CourseSerializer",
     "CourseCreateSerializer",
     "CourseListSerializer",
     "LessonSerializer",
     "LessonCreateSerializer",
+    "LessonOutlineSerializer",
     "EnrollmentSerializer",
+    "EnrollmentHistorySerializer",
     "EnrollmentCreateSerializer",
+    "DashboardEnrollmentSerializer",
+    "DashboardSerializer",
+    "LessonCompletionSerializer",
+    "LessonProgressSerializer",
 ]
@@ -1,11 +1,13 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from django.utils.text import slugify
-from api.models.course import Course, Lesson, Enrollment
+from api.models.course import ArchivedEnrollment, Course, CourseSlugCounter, Lesson, Enrollment
 from api.serializers.user_serializers import UserSerializer
+from api.tasks import defer_profile_counts
 
 
 class LessonSerializer(serializers.ModelSerializer):
     """Serializer for Lesson model"""
+    content = serializers.CharField(allow_blank=True, required=False)
 
     class Meta:
         model = Lesson
@@ -19,6 +21,7 @@ class LessonSerializer(serializers.ModelSerializer):
 
 class LessonCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating lessons (instructor only)"""
+    content = serializers.CharField(allow_blank=True, required=False)
 
     class Meta:
         model = Lesson
@@ -28,6 +31,14 @@ class LessonCreateSerializer(serializers.ModelSerializer):
         ]
 
 
+class LessonOutlineSerializer(serializers.ModelSerializer):
+    """Lesson titles and order for a course outline, without lesson content"""
+
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'order', 'lesson_type', 'video_duration']
+
+
 class CourseSerializer(serializers.ModelSerializer):
     """Detailed course serializer with instructor info and lessons"""
     instructor = UserSerializer(read_only=True)
@@ -56,23 +67,28 @@ class CourseCreateSerializer(serializers.ModelSerializer):
             'category', 'level', 'duration_hours', 'thumbnail',
             'preview_video_url', 'status', 'is_featured', 'price'
         ]
+        extra_kwargs = {'slug': {'required': False}}
+
+    # Allocated slugs can still be taken by a course created with that slug
+    # explicitly; each retry moves past it.
+    SLUG_ATTEMPTS = 5
 
     def create(self, validated_data):
         # Set instructor to the current user
         validated_data['instructor'] = self.context['request'].user
 
-        # Auto-generate slug if not provided
-        if not validated_data.get('slug'):
-            base_slug = slugify(validated_data['title'])
-            # Ensure uniqueness by appending a number if needed
-            slug = base_slug
-            counter = 1
-            while Course.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            validated_data['slug'] = slug
+        if validated_data.get('slug'):
+            return super().create(validated_data)
 
-        return super().create(validated_data)
+        # Auto-generate a unique slug from the title
+        for attempt in range(self.SLUG_ATTEMPTS):
+            validated_data['slug'] = CourseSlugCounter.next_slug(validated_data['title'])
+            try:
+                with transaction.atomic():
+                    return super().create(validated_data)
+            except IntegrityError:
+                if attempt == self.SLUG_ATTEMPTS - 1:
+                    raise
 
 
 class CourseListSerializer(serializers.ModelSerializer):
@@ -102,7 +118,54 @@ class EnrollmentSerializer(serializers.ModelSerializer):
             'id', 'student', 'course', 'status', 'progress_percentage',
             'last_accessed', 'enrolled_at', 'completed_at'
         ]
-        read_only_fields = ['student', 'enrolled_at', 'last_accessed']
+        # Progress is derived from the finished lessons (api/progress.py).
+        read_only_fields = ['student', 'progress_percentage', 'enrolled_at', 'last_accessed']
+
+
+class EnrollmentHistorySerializer(EnrollmentSerializer):
+    """An enrollment, current or archived"""
+    archived = serializers.SerializerMethodField()
+
+    class Meta(EnrollmentSerializer.Meta):
+        fields = EnrollmentSerializer.Meta.fields + ['archived']
+
+    def get_archived(self, enrollment) -> bool:
+        return isinstance(enrollment, ArchivedEnrollment)
+
+
+class LessonCompletionSerializer(serializers.Serializer):
+    """A lesson finished by the current student"""
+    lesson = serializers.IntegerField()
+
+
+class LessonProgressSerializer(serializers.ModelSerializer):
+    """Server-derived progress of an enrollment, with the finished lesson ids"""
+    completed_lessons = serializers.ListField(child=serializers.IntegerField(), source='completed_lesson_ids')
+
+    class Meta:
+        model = Enrollment
+        fields = ['id', 'status', 'progress_percentage', 'completed_lessons', 'completed_at']
+        read_only_fields = fields
+
+
+class DashboardEnrollmentSerializer(serializers.ModelSerializer):
+    """An enrollment on the student dashboard, with the lesson to resume"""
+    course = CourseListSerializer(read_only=True)
+    next_lesson = LessonOutlineSerializer(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Enrollment
+        fields = [
+            'id', 'course', 'status', 'progress_percentage', 'next_lesson',
+            'last_accessed', 'enrolled_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+
+class DashboardSerializer(serializers.Serializer):
+    """Everything the student home page shows, in one payload"""
+    user = UserSerializer(read_only=True)
+    enrollments = DashboardEnrollmentSerializer(many=True, read_only=True)
 
 
 class EnrollmentCreateSerializer(serializers.ModelSerializer):
@@ -128,14 +191,18 @@ class EnrollmentCreateSerializer(serializers.ModelSerializer):
             defaults={'status': validated_data['status']}
         )
 
+        if created and ArchivedEnrollment.objects.filter(
+            student=enrollment.student, course=enrollment.course, status='completed'
+        ).exists():
+            # Rolled back by the view's transaction
+            raise serializers.ValidationError({'course': "You have already completed this course."})
+
         if created:
             # Increment enrolled_students_count
             enrollment.course.enrolled_students_count += 1
-            enrollment.course.save()
+            enrollment.course.save(update_fields=['enrolled_students_count', 'updated_at'])
 
-            # Update student's enrolled_courses_count
-            if hasattr(validated_data['student'], 'profile'):
-                validated_data['student'].profile.enrolled_courses_count += 1
-                validated_data['student'].profile.save()
+            # Recount the student's enrolled_courses_count in the background
+            defer_profile_counts(validated_data['student'].pk)
 
         return enrollment
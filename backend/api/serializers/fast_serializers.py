@@ -0,0 +1,195 @@
+"""
+Values-based fast path for list serializers.
+
+``compile_serializer`` turns a ModelSerializer class into a flat
+``values_list()`` projection plus a row-to-dict converter that produces
+exactly what ``serializer_class(queryset, many=True).data`` would, without
+instantiating models or binding fields per row. Nested serializers become
+joined columns, simple fields are copied as-is and everything else goes
+through the DRF field's own ``to_representation``.
+
+Serializers the compiler cannot reproduce faithfully (method fields,
+many=True nesting, custom ``to_representation``) raise ImproperlyConfigured
+when compiled, so an unsupported serializer never silently diverges.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import BinaryField, Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from api.instrumentation import timed
+from api.models.course import Course, Lesson, LessonContent
+from api.serializers.user_serializers import UserSerializer
+
+# DRF fields whose to_representation returns database values unchanged.
+IDENTITY_FIELDS = {
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.EmailField,
+    serializers.IntegerField, serializers.ReadOnlyField, serializers.SlugField, serializers.URLField,
+}
+
+# Serializers whose to_representation override is reproduced by the compiler:
+# UserSerializer only maps a missing profile to None, as nested lookups do.
+EQUIVALENT_OVERRIDES = {UserSerializer}
+
+COMPUTED_SOURCES = {}
+
+
+def register_computed_source(model, source, expression, convert=None):
+    """
+    Projects ``source`` on ``model`` through an annotation rather than a column.
+    ``expression(prefix)`` builds it for the relation path ``prefix`` (e.g.
+    ``'course__'``) and ``convert``, if given, maps the annotated value to the
+    model attribute value before the serializer field converts it.
+    """
+    COMPUTED_SOURCES[(model, source)] = (expression, convert)
+
+
+def lessons_count(prefix):
+    # A correlated subquery rather than a joined Count: no GROUP BY, so the
+    # list keeps its ordering and query plan.
+    lessons = Lesson.objects.filter(course=OuterRef(f'{prefix}pk')).order_by().values('course')
+    return Coalesce(Subquery(lessons.annotate(count=Count('pk')).values('count')), 0)
+
+
+register_computed_source(Course, 'lessons.count', lessons_count)
+
+
+def lesson_body(prefix):
+    return Coalesce(F(f'{prefix}body__data'), Value(b''), output_field=BinaryField())
+
+
+register_computed_source(Lesson, 'content', lesson_body, LessonContent.decompress)
+
+
+def chain(first, second):
+    if first is None or second is None:
+        return first or second
+    return lambda value: second(first(value))
+
+
+def field_converter(field):
+    """None when the database value is already the representation."""
+    field_class = type(field)
+    if field_class in IDENTITY_FIELDS:
+        return None
+    if field_class is serializers.JSONField and not field.binary:
+        return None
+    if field_class is serializers.PrimaryKeyRelatedField:
+        return field.pk_field.to_representation if field.pk_field is not None else None
+    if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField, serializers.SerializerMethodField)):
+        raise ImproperlyConfigured(f"{field.field_name}: {field_class.__name__} has no values-based equivalent")
+    return field.to_representation
+
+
+def resolve_path(model, source):
+    """
+    The model field a dotted source ends at, checking that it is reached
+    through non-null to-one relations and is not itself multi-valued.
+    """
+    for attr in source[:-1]:
+        relation = model._meta.get_field(attr)
+        if not (relation.many_to_one or relation.one_to_one) or relation.null:
+            raise ImproperlyConfigured(f"{'.'.join(source)}: {attr} is not a required to-one relation")
+        model = relation.related_model
+    field = model._meta.get_field(source[-1])
+    if field.many_to_many or field.one_to_many:
+        raise ImproperlyConfigured(f"{'.'.join(source)} is a multi-valued relation")
+    return field
+
+
+class CompiledSerializer:
+    """A serializer class compiled to a ``values_list()`` projection and row converter."""
+
+    def __init__(self, serializer_class):
+        self.columns = {}
+        self.annotations = {}
+        self.steps = self.compile(serializer_class(), '')
+
+    def project(self, queryset):
+        return queryset.annotate(**self.annotations).values_list(*self.columns)
+
+    def to_representation(self, rows):
+        return [self.build(row, self.steps) for row in rows]
+
+    def build(self, row, steps):
+        data = {}
+        for name, index, convert, nested in steps:
+            value = row[index]
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                data[name] = self.build(row, nested)
+            elif convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+
+    def column(self, name):
+        """Row index of ``name``, adding it to the projection on first use."""
+        return self.columns.setdefault(name, len(self.columns))
+
+    def compile(self, serializer, prefix):
+        serializer_class = type(serializer)
+        if (
+            serializer_class.to_representation is not serializers.Serializer.to_representation
+            and serializer_class not in EQUIVALENT_OVERRIDES
+        ):
+            raise ImproperlyConfigured(f"{serializer_class.__name__} overrides to_representation")
+        model = serializer.Meta.model
+        return [
+            self.compile_field(field, model, prefix)
+            for field in serializer.fields.values() if not field.write_only
+        ]
+
+    def compile_field(self, field, model, prefix):
+        if (model, field.source) in COMPUTED_SOURCES:
+            expression, convert = COMPUTED_SOURCES[(model, field.source)]
+            alias = f"fast_{len(self.annotations)}"
+            self.annotations[alias] = expression(prefix)
+            return field.field_name, self.column(alias), chain(convert, field_converter(field)), None
+
+        if isinstance(field, serializers.ListSerializer):
+            raise ImproperlyConfigured(f"{field.field_name}: many=True serializers are not supported")
+        try:
+            model_field = resolve_path(model, field.source_attrs)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f"{field.source} is not a column of {model.__name__}")
+        path = prefix + '__'.join(field.source_attrs)
+        if isinstance(field, serializers.BaseSerializer):
+            # A nested object is present when its primary key is.
+            exists = self.column(f"{path}__{field.Meta.model._meta.pk.name}")
+            return field.field_name, exists, None, self.compile(field, f"{path}__")
+        if model_field.is_relation and type(field) is not serializers.PrimaryKeyRelatedField:
+            # A relation projects to its key, which only a primary key field represents.
+            raise ImproperlyConfigured(f"{field.source}: relations need a PrimaryKeyRelatedField or serializer")
+        return field.field_name, self.column(path), field_converter(field), None
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    return CompiledSerializer(serializer_class)
+
+
+class FastListMixin:
+    """
+    Builds ``list`` responses with the compiled serializer when
+    FAST_READ_SERIALIZERS is on; the payload is identical either way.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'FAST_READ_SERIALIZERS', False):
+            return super().list(request, *args, **kwargs)
+
+        compiled = compile_serializer(self.get_serializer_class())
+        rows = compiled.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        with timed('serialize'):
+            data = compiled.to_representation(page if page is not None else rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from api.models.deletion import AccountDeletion
 from api.models.user import User, Profile
 from django.contrib.auth.models import Group
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
@@ -42,6 +43,15 @@ class UserSerializer(serializers.ModelSerializer):
         return representation
 
 
+class AccountDeletionSerializer(serializers.ModelSerializer):
+    """Progress of a requested account deletion"""
+
+    class Meta:
+        model = AccountDeletion
+        fields = ['id', 'user_id', 'username', 'status', 'step', 'deleted', 'requested_at', 'finished_at']
+        read_only_fields = fields
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -0,0 +1,183 @@
+"""
+Live course progress over Server-Sent Events.
+
+GET /api/courses/{id}/progress/stream/ (the course's instructor, served by
+``learnhub_api.asgi``) keeps the response open and pushes the course's
+enrollment changes as they happen, instead of the roster being polled
+through ``my_students``:
+
+    event: enrollment
+    id: 1234
+    data: {"id": 7, "student_id": 3, "status": "active", "progress_percentage": 40}
+
+``id`` is the last outbox event folded into the message. Changes come from
+the outbox (api/outbox.py), which every process can read: while anyone is
+subscribed, one task per event loop tails OutboxEvent every
+STREAM_POLL_SECONDS and the Hub fans each event out to the subscribers of
+its course. A worker serves any number of streams with one query per
+poll, whichever process made the change. Like the relay, the feed waits
+at a missing event id for a slower transaction, for up to
+OUTBOX_RELAY_LAG_SECONDS.
+
+Each subscriber buffers changes by enrollment: changes to an enrollment
+not sent yet are merged, so a slow client gets the latest state, not every
+step. A client more than STREAM_BUFFER_SIZE enrollments behind gets a
+``reset`` event instead, telling it to reload the roster; the hub never
+waits for a client. A comment line every STREAM_HEARTBEAT_SECONDS keeps
+idle connections and proxies alive.
+"""
+import asyncio
+import contextvars
+import logging
+import weakref
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max
+
+from api.models.outbox import OutboxEvent
+from api.outbox import pending
+from api.renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = b": heartbeat\n\n"
+
+renderer = FastJSONRenderer()
+
+
+def delta(event):
+    """The enrollment change an outbox event describes, or None."""
+    kind, payload = event['kind'], event['payload']
+    if not kind.startswith(('enrollment.', 'lesson.')) or 'enrollment_id' not in payload:
+        return None
+    change = {'id': payload['enrollment_id'], 'student_id': payload.get('student_id')}
+    if kind == 'enrollment.created':
+        change.update(status='active', progress_percentage=0)
+    elif kind == 'enrollment.completed':
+        change.update(status='completed', progress_percentage=100)
+    elif 'progress_percentage' in payload:
+        change['progress_percentage'] = payload['progress_percentage']
+    if 'lesson_id' in payload:
+        change['last_lesson_id'] = payload['lesson_id']
+    return change
+
+
+def message(event, data, event_id=None):
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else '')
+    return head.encode() + b"data: " + renderer.render(data) + b"\n\n"
+
+
+class Subscription:
+    """One client's pending changes, by enrollment id; lives on the event loop."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.changes = {}
+        self.last_id = None
+        self.overflowed = False
+        self.wakeup = asyncio.Event()
+
+    def offer(self, event_id, change):
+        if not self.overflowed:
+            merged = self.changes.get(change['id'])
+            if merged is None and len(self.changes) >= self.limit:
+                self.changes.clear()
+                self.overflowed = True
+            else:
+                self.changes[change['id']] = {**merged, **change} if merged else change
+        self.last_id = event_id
+        self.wakeup.set()
+
+    async def take(self, timeout):
+        """Waits up to ``timeout`` for changes; returns (last event id, overflowed, changes) or None."""
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.wakeup.clear()
+        changes, self.changes = list(self.changes.values()), {}
+        overflowed, self.overflowed = self.overflowed, False
+        return self.last_id, overflowed, changes
+
+
+class Hub:
+    """The subscribers of one event loop, by course, and the outbox feed serving them."""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.feed = None
+
+    async def subscribe(self, course_id):
+        """A new Subscription to ``course_id``; every change recorded from now on reaches it."""
+        if self.feed is None or self.feed.done():
+            last_id = (await OutboxEvent.objects.aaggregate(last=Max('pk')))['last'] or 0
+            if self.feed is None or self.feed.done():
+                # A fresh context: the feed outlives the request that started it, and
+                # its queries go to the process's sync thread, not that request's.
+                self.feed = asyncio.get_running_loop().create_task(self.tail(last_id), context=contextvars.Context())
+        subscription = Subscription(settings.STREAM_BUFFER_SIZE)
+        self.subscribers[course_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, course_id, subscription):
+        subscriptions = self.subscribers.get(course_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscribers[course_id]
+
+    def publish(self, event):
+        subscriptions = self.subscribers.get(event['payload'].get('course_id'))
+        change = delta(event) if subscriptions else None
+        if change is not None:
+            for subscription in subscriptions:
+                subscription.offer(event['id'], change)
+
+    async def tail(self, last_id):
+        """Publishes the outbox events after ``last_id`` while anyone is subscribed."""
+        while self.subscribers:
+            try:
+                events = await sync_to_async(pending)(last_id, settings.OUTBOX_BATCH_SIZE)
+            except DatabaseError:
+                logger.exception("Reading the outbox for progress streams failed")
+                events = []
+            for event in events:
+                self.publish(event)
+            if events:
+                last_id = events[-1]['id']
+            if len(events) < settings.OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(settings.STREAM_POLL_SECONDS)
+
+
+hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The Hub of the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in hubs:
+        hubs[loop] = Hub()
+    return hubs[loop]
+
+
+async def course_progress(course_id):
+    """The SSE byte stream of a course's enrollment changes, until the client goes away."""
+    hub = get_hub()
+    subscription = await hub.subscribe(course_id)
+    try:
+        yield message('ready', {'course': course_id})
+        while True:
+            taken = await subscription.take(settings.STREAM_HEARTBEAT_SECONDS)
+            if taken is None:
+                yield HEARTBEAT
+                continue
+            last_id, overflowed, changes = taken
+            if overflowed:
+                yield message('reset', {'course': course_id}, last_id)
+            else:
+                yield b''.join(message('enrollment', change, last_id) for change in changes)
+    finally:
+        hub.unsubscribe(course_id, subscription)
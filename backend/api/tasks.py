@@ -0,0 +1,54 @@
+"""
+Background jobs of the API (see api/jobs.py), registered when the app loads.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from api.jobs import job
+from api.models.course import ArchivedEnrollment, Enrollment
+from api.models.user import Profile
+
+
+@job()
+def refresh_profile_counts(user_id):
+    """Recounts a student's enrolled and completed courses from their enrollments, archived ones included."""
+    from api.dashboard import invalidate_dashboard
+    from api.views.user_views import PROFILE_CACHE_KEY
+
+    enrolled = completed = 0
+    for model in (Enrollment, ArchivedEnrollment):
+        counts = model.objects.filter(student_id=user_id, status__in=Enrollment.COUNTED_STATUSES).aggregate(
+            enrolled=Count('pk'), completed=Count('pk', filter=Q(status='completed'))
+        )
+        enrolled, completed = enrolled + counts['enrolled'], completed + counts['completed']
+    Profile.objects.filter(user_id=user_id).update(enrolled_courses_count=enrolled, completed_courses_count=completed)
+    invalidate_dashboard(user_id)
+    cache.delete(f"{PROFILE_CACHE_KEY}_{user_id}")
+
+
+def defer_profile_counts(user_id):
+    """Queues one recount per student, however many changes arrive before it runs."""
+    refresh_profile_counts.defer(user_id=user_id, dedupe_key=f"profile_counts_{user_id}")
+
+
+@job(max_attempts=5)
+def delete_account(deletion_id):
+    """Deletes a deactivated account's data a slice at a time, queueing the next slice."""
+    from api import deletion
+
+    if not deletion.run(deletion_id):
+        delete_account.defer(deletion_id=deletion_id, dedupe_key=f"delete_account_{deletion_id}")
+
+
+@job(queue='analytics')
+def update_course_rankings(full=False):
+    from api import rankings
+
+    rankings.update(full=full)
+
+
+@job(queue='analytics')
+def build_recommendations(full=False):
+    from api import recommendations
+
+    recommendations.build(full=full)
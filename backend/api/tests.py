@@ -1,7 +1,1713 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import decimal
+import gzip
+import io
+import json
+import random
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.text import compress_string
+from drf_spectacular.generators import SchemaGenerator
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.authentication import get_tokens_for_user
+from api.dashboard import DASHBOARD_QUERY_BUDGET
+
+from api.db_router import PrimaryReplicaRouter, replica_reads
+from api.facets import CATALOG_GENERATION_KEY, compute_facets
+from api.instrumentation import slow_queries
+from api import jobs
+from api.middleware import COMPRESSED_CACHE_KEY, accepted_encoding
+from api import outbox
+from api.archive import archive
+from api.deletion import request_deletion, run as run_deletion
+from api.openapi import schema_version
+from api.rankings import update as update_rankings
+from api.reconcile import reconcile
+from api.recommendations import build as build_recommendations
+from api.parsers import FastJSONParser
+from api.progress import complete_lesson, completed_positions
+from api.renderers import FastJSONRenderer
+from api import seeding
+from api import streams
+from api.views.async_views import (
+    AsyncCourseDetailView, AsyncCourseListView, AsyncCourseOutlineView, AsyncCourseProgressStreamView,
+    AsyncCurrentUserView, AsyncReadView,
+)
+from api.models.course import ArchivedEnrollment, Course, CourseSlugCounter, Enrollment, Lesson, LessonContent
+from api.models.deletion import AccountDeletion
+from api.models.job import Job
+from api.models.outbox import OutboxCursor, OutboxEvent
+from api.models.ranking import CourseRankingUpdate
+from api.models.reconciliation import CounterReconciliation
+from api.models.recommendation import CourseRecommendation, RecommendationBuild
+from api.models.user import Profile, User
+from api.serializers import CourseListSerializer, CourseSerializer, EnrollmentSerializer, LessonSerializer
+from api.serializers.course_serializers import CourseCreateSerializer
+from api.serializers.fast_serializers import compile_serializer
+
+
+def make_user(username, role='student', **extra):
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password='pass12345', role=role, **extra
+    )
+
+
+def make_course(instructor, title='Intro to Python', status='published', **extra):
+    return Course.objects.create(
+        title=title, slug=extra.pop('slug', None) or f"{title.lower().replace(' ', '-')}-{Course.objects.count()}",
+        description='A course', instructor=instructor, status=status, **extra
+    )
 
 
 class HealthCheckTest(TestCase):
     def test_basic_math(self):
         """A minimal test that always passes."""
         self.assertEqual(1 + 1, 2)
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.instructor = make_user('teacher', role='instructor')
+        course = make_course(self.instructor)
+        Lesson.objects.create(course=course, title='Lesson 1', order=1)
+        slow_queries.clear()
+
+    def test_every_response_has_server_timing(self):
+        response = self.client.get('/api/courses/')
+        self.assertEqual(response.status_code, 200)
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'serialize;dur=', 'render;dur=', 'cache;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, FAST_READ_SERIALIZERS=False)
+    def test_slow_queries_are_sampled_with_context(self):
+        with self.assertLogs('api.instrumentation', 'WARNING') as logs:
+            self.client.get('/api/courses/')
+        self.assertIn('CourseViewSet', logs.output[0])
+        entries = slow_queries.entries()
+        self.assertTrue(entries)
+        select = next(entry for entry in entries if entry['sql'].startswith('SELECT'))
+        self.assertIn('CourseViewSet', select['view'])
+        self.assertTrue(select['explain'])
+        self.assertNotIn('middleware.py', select['frame'])
+        self.assertTrue(any(entry['serializer'] == 'CourseListSerializer' for entry in entries))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_query_endpoint_is_admin_only(self):
+        with self.assertLogs('api.instrumentation', 'WARNING'):
+            self.client.get('/api/courses/')
+            self.client.force_authenticate(self.instructor)
+            self.assertEqual(self.client.get('/api/diagnostics/slow-queries/').status_code, 403)
+
+            admin = make_user('admin', role='instructor', is_staff=True)
+            self.client.force_authenticate(admin)
+            response = self.client.get('/api/diagnostics/slow-queries/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data['count'], 0)
+
+
+class CourseActionPermissionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.instructor = make_user('teacher', role='instructor')
+        self.course = make_course(self.instructor)
+
+    def test_students_can_enroll(self):
+        self.client.force_authenticate(make_user('student'))
+        response = self.client.post(f'/api/courses/{self.course.id}/enroll/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 1)
+
+    def test_my_students_is_instructor_only(self):
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.id}/my_students/').status_code, 200)
+        self.client.force_authenticate(make_user('student'))
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.id}/my_students/').status_code, 403)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_ROUTERS=['api.db_router.PrimaryReplicaRouter'])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.student = make_user('student')
+        self.course = make_course(make_user('teacher', role='instructor'))
+
+    def test_router_only_uses_replicas_when_opted_in(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Course), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Course), 'replica')
+            self.assertEqual(router.db_for_write(Course), 'default')
+
+    @mock.patch('api.db_router.random.choice', return_value='default')
+    def test_safe_catalog_requests_read_from_replica(self, choice):
+        self.client.force_authenticate(self.student)
+        self.client.get('/api/courses/')
+        self.assertTrue(choice.called)
+
+        choice.reset_mock()
+        self.client.get('/api/enrollments/')
+        self.assertFalse(choice.called)
+
+    @mock.patch('api.db_router.random.choice', return_value='default')
+    def test_reads_stick_to_primary_after_a_write(self, choice):
+        self.client.force_authenticate(self.student)
+        response = self.client.post('/api/enrollments/', {'course': self.course.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(choice.called)
+
+        self.client.get('/api/courses/')
+        self.assertFalse(choice.called)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_ROUTERS=['api.db_router.PrimaryReplicaRouter'])
+class ReplicaDatabaseTest(TestCase):
+    """Routing against a real second SQLite database holding different rows than the primary."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The alias only exists for this class, so the runner must not set it up:
+        # it is declared here, after the test databases were created.
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'NAME': str(Path(cls.directory.name) / 'replica.sqlite3'),
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.student = make_user('student')
+        self.course = make_course(make_user('teacher', role='instructor'), title='Primary course')
+        teacher = User.objects.db_manager('replica').create_user(
+            username='teacher', email='teacher@example.com', password='pass12345', role='instructor'
+        )
+        Course.objects.using('replica').create(
+            title='Replica course', slug='replica-course', description='A course', instructor=teacher,
+            status='published',
+        )
+
+    def titles(self):
+        return [course['title'] for course in self.client.get('/api/courses/').data['results']]
+
+    def test_reads_go_to_the_replica_until_the_user_writes(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.titles(), ['Replica course'])
+        # Unsafe requests and unrouted views read from the primary.
+        response = self.client.post('/api/enrollments/', {'course': self.course.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Enrollment.objects.using('default').count(), 1)
+        self.assertFalse(Enrollment.objects.using('replica').exists())
+
+        # Pinned to the primary, the student reads their own write.
+        self.assertEqual(self.titles(), ['Primary course'])
+        cache.clear()
+        self.assertEqual(self.titles(), ['Replica course'])
+
+
+class AsyncReadViewTest(TestCase):
+    """The async read views must return exactly what the DRF views return."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.factory = RequestFactory()
+        self.instructor = make_user('teacher', role='instructor')
+        self.student = make_user('student')
+        self.course = make_course(self.instructor, price='19.99', category='data')
+        make_course(self.instructor, title='Draft course', status='draft')
+        for index in range(25):
+            make_course(self.instructor, title=f'Course {index}', price=index)
+        for order in range(3):
+            Lesson.objects.create(course=self.course, title=f'Lesson {order}', order=order, content='Body')
+
+    def call(self, view_class, path, user=None, **kwargs):
+        headers = {}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f"Bearer {get_tokens_for_user(user)['access']}"
+        request = self.factory.get(path, **headers)
+        response = async_to_sync(view_class.as_view())(request, **kwargs)
+        return response.status_code, json.loads(response.content)
+
+    def drf(self, path, user=None):
+        self.client.force_authenticate(user)
+        response = self.client.get(path)
+        return response.status_code, response.json()
+
+    def test_course_list_matches_drf(self):
+        for path in ('/api/courses/', '/api/courses/?page=2', '/api/courses/?search=data&ordering=-price',
+                     '/api/courses/?page=9', '/api/courses/?facets=true&search=Course'):
+            for user in (None, self.instructor):
+                self.assertEqual(self.call(AsyncCourseListView, path, user), self.drf(path, user), path)
+
+    def test_course_detail_and_outline_match_drf(self):
+        path = f'/api/courses/{self.course.id}/'
+        self.assertEqual(self.call(AsyncCourseDetailView, path, self.student, pk=self.course.id), self.drf(path))
+        outline = f'{path}outline/'
+        self.assertEqual(self.call(AsyncCourseOutlineView, outline, pk=self.course.id), self.drf(outline))
+        self.assertEqual(self.call(AsyncCourseDetailView, '/api/courses/999/', pk=999)[0], 404)
+
+    def test_current_user_matches_drf(self):
+        self.assertEqual(
+            self.call(AsyncCurrentUserView, '/api/user/', self.student), self.drf('/api/user/', self.student)
+        )
+        self.assertEqual(self.call(AsyncCurrentUserView, '/api/user/')[0], 401)
+
+    def test_views_without_get_are_not_allowed(self):
+        request = self.factory.get('/api/courses/')
+        view = AsyncReadView()
+        view.setup(request)
+        self.assertEqual(async_to_sync(view.dispatch)(request).status_code, 405)
+
+
+class CatalogFacetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.instructor = make_user('teacher', role='instructor')
+        self.student = make_user('student')
+        for index, (category, level, price) in enumerate([
+            ('data', 'beginner', 0), ('data', 'advanced', 15), ('design', 'beginner', 49.99),
+            ('design', 'beginner', 120), ('music', 'intermediate', 0),
+        ]):
+            make_course(self.instructor, title=f"Course {index}", category=category, level=level, price=price,
+                        is_featured=index == 0)
+        make_course(self.instructor, title='Hidden draft', category='data', status='draft')
+
+    def test_facets_count_the_filtered_catalog(self):
+        self.client.force_authenticate(self.student)
+        facets = self.client.get('/api/courses/?facets=true&level=beginner').data['facets']
+        self.assertEqual(facets, {
+            'category': [{'value': 'design', 'count': 2}, {'value': 'data', 'count': 1}],
+            'level': [{'value': 'beginner', 'count': 3}],
+            'is_featured': [{'value': False, 'count': 2}, {'value': True, 'count': 1}],
+            'price': [{'value': 'free', 'count': 1}, {'value': '20_to_50', 'count': 1},
+                      {'value': '100_plus', 'count': 1}],
+        })
+        self.assertNotIn('facets', self.client.get('/api/courses/').data)
+        # The instructor also sees their draft.
+        self.client.force_authenticate(self.instructor)
+        facets = self.client.get('/api/courses/?facets=true').data['facets']
+        self.assertEqual(facets['category'][0], {'value': 'data', 'count': 3})
+        self.assertEqual(facets, compute_facets(Course.objects.all()))
+
+    def test_facets_cost_one_query_and_follow_the_catalog_generation(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/courses/')
+        plain = len(queries)
+        with self.assertNumQueries(plain + 1):
+            self.client.get('/api/courses/?facets=true')
+        with self.assertNumQueries(plain):
+            self.client.get('/api/courses/?facets=true')
+
+        # Enrolling only touches counters: the cached facets stay valid.
+        self.client.force_authenticate(self.student)
+        course = Course.objects.get(title='Course 0')
+        self.client.post(f'/api/courses/{course.pk}/enroll/')
+        with self.assertNumQueries(plain):
+            self.client.get('/api/courses/?facets=true')
+
+        course.category = 'music'
+        course.save()
+        facets = self.client.get('/api/courses/?facets=true').data['facets']
+        self.assertIn({'value': 'music', 'count': 2}, facets['category'])
+
+    def test_an_evicted_generation_does_not_serve_stale_facets(self):
+        cache.clear()
+        self.client.get('/api/courses/?facets=true')
+        course = Course.objects.get(title='Course 0')
+        course.category = 'music'
+        course.save()
+        self.client.get('/api/courses/?facets=true')
+        # The counter is evicted while the facets cached under earlier generations are not.
+        cache.delete(CATALOG_GENERATION_KEY)
+        facets = self.client.get('/api/courses/?facets=true').data['facets']
+        self.assertIn({'value': 'music', 'count': 2}, facets['category'])
+
+
+class FastJSONTest(TestCase):
+    """FastJSONRenderer/FastJSONParser must be byte-for-byte compatible with DRF's."""
+
+    def assertSameBytes(self, data, renderer_context=None):
+        expected = JSONRenderer().render(data, 'application/json', renderer_context)
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json', renderer_context), expected)
+
+    def test_serializer_payloads_match(self):
+        instructor = make_user('teacher', role='instructor', first_name='Zoë', last_name='\u2028Ünicode')
+        student = make_user('student')
+        course = make_course(instructor, title='Données & "quotes"', price='49.99', category='data')
+        for order in range(5):
+            Lesson.objects.create(course=course, title=f'Lesson {order} \u2029', order=order, content='<b>x</b>\n\t')
+        Enrollment.objects.create(student=student, course=course, completed_at=timezone.now())
+        courses = Course.objects.all()
+        self.assertSameBytes(CourseSerializer(courses.get()).data)
+        self.assertSameBytes(CourseListSerializer(courses, many=True).data)
+        self.assertSameBytes(EnrollmentSerializer(Enrollment.objects.all(), many=True).data)
+
+    def test_python_types_match(self):
+        aware = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+        self.assertSameBytes({
+            'price': decimal.Decimal('19.99'),
+            'aware': aware,
+            'offset': aware.astimezone(datetime.timezone(datetime.timedelta(hours=2))),
+            'naive': datetime.datetime(2024, 5, 1, 12, 30),
+            'date': datetime.date(2024, 5, 1),
+            'time': datetime.time(8, 15, 0, 500),
+            'duration': datetime.timedelta(minutes=90),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': gettext_lazy('Not found.'),
+            'keys': {1: 'int', False: 'bool', None: 'none', 2.5: 'float'},
+            'iterables': [(1, 2), {3}, b'bytes'],
+            'numbers': [0, -1, 2 ** 63 - 1, 2 ** 64, 0.1, -0.0, 1234.5678],
+            'text': ['', 'control \x00\x1f\x7f', 'emoji 😀', 'separators \u2028\u2029', '\\/"'],
+        })
+
+    def test_indented_and_empty_output_match(self):
+        data = {'results': [{'id': 1, 'title': 'Intro'}]}
+        self.assertSameBytes(data, {'indent': 4})
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        with mock.patch('api.renderers.orjson', None):
+            self.assertSameBytes(data)
+
+    def test_parser_matches_stdlib(self):
+        bodies = [
+            b'{"title": "Intro", "price": "19.99", "tags": [1, 2.5, true, null]}',
+            '{"name": "Zoë \u2028"}'.encode(),
+            b'{"ids": [18446744073709551615, -9223372036854775808]}',
+            b'{"surrogate": "\\ud800"}',
+        ]
+        for body in bodies:
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)), body)
+        for body in (b'{"title": ', b'NaN', b'\xef\xbb\xbf{}'):
+            with self.assertRaises(ParseError) as expected:
+                JSONParser().parse(io.BytesIO(body))
+            with self.assertRaises(ParseError) as fast:
+                FastJSONParser().parse(io.BytesIO(body))
+            self.assertEqual(str(fast.exception), str(expected.exception))
+
+    def test_requests_round_trip(self):
+        client = APIClient()
+        client.force_authenticate(make_user('teacher', role='instructor'))
+        response = client.post('/api/courses/', {
+            'title': 'Fast JSON', 'slug': 'fast-json', 'description': 'Body', 'category': 'programming',
+            'price': '10.50',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['price'], '10.50')
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['compressed'].clear()
+        self.client = APIClient()
+        instructor = make_user('teacher', role='instructor')
+        for index in range(20):
+            make_course(instructor, title=f'Course {index}')
+
+    def test_responses_are_gzipped_once_and_served_from_cache(self):
+        plain = self.client.get('/api/courses/')
+        compress = mock.Mock(wraps=compress_string)
+        with mock.patch.dict('api.middleware.ENCODERS', {'gzip': compress}):
+            first = self.client.get('/api/courses/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            second = self.client.get('/api/courses/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(first.content), plain.content)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(first['ETag'], f"W/{plain['ETag']}")
+        self.assertIn('Accept-Encoding', first['Vary'])
+        # Compressed bodies stay out of the default cache.
+        etag = plain['ETag'].strip('"')
+        key = f"{COMPRESSED_CACHE_KEY}_gzip_{etag}"
+        self.assertEqual(caches['compressed'].get(key), first.content)
+        self.assertIsNone(cache.get(key))
+
+        not_modified = self.client.get('/api/courses/', HTTP_ACCEPT_ENCODING='gzip',
+                                       HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_small_unsafe_and_unaccepted_responses_are_left_alone(self):
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get('/api/courses/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/api/courses/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        with override_settings(COMPRESSION_MIN_SIZE=0):
+            response = self.client.post('/api/auth/login/', {'email': 'nobody@example.com', 'password': 'x'},
+                                        HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_accept_encoding_negotiation(self):
+        self.assertEqual(accepted_encoding('deflate, gzip'), 'gzip')
+        self.assertIsNone(accepted_encoding(''))
+        self.assertIsNone(accepted_encoding('deflate, gzip;q=0'))
+        self.assertIsNone(accepted_encoding('gzip;q=nonsense'))
+        with mock.patch('api.middleware.ENCODERS', {'br': bytes, 'gzip': bytes}):
+            self.assertEqual(accepted_encoding('gzip, br'), 'br')
+            self.assertEqual(accepted_encoding('*'), 'br')
+            self.assertEqual(accepted_encoding('br;q=0.5, gzip'), 'gzip')
+
+
+class CachedSchemaTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = Path(cache_dir.name)
+        settings_override = override_settings(SCHEMA_CACHE_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        memo = mock.patch('api.openapi._cached', None)
+        memo.start()
+        self.addCleanup(memo.stop)
+
+    def test_schema_matches_spectacular_and_is_generated_once(self):
+        expected = self.client.get('/api/schema/?format=json&lang=en').content
+        with mock.patch('drf_spectacular.generators.SchemaGenerator.get_schema', autospec=True,
+                        side_effect=SchemaGenerator.get_schema) as generate:
+            json_response = self.client.get('/api/schema/?format=json')
+            yaml_response = self.client.get('/api/schema/')
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(json_response.content, expected)
+        self.assertEqual(yaml_response['Content-Type'], 'application/vnd.oai.openapi')
+        self.assertIn(b'openapi: 3.0.3', yaml_response.content)
+        self.assertTrue((self.cache_dir / f"{schema_version()}.json").exists())
+
+    def test_precompressed_variants_and_etags(self):
+        plain = self.client.get('/api/schema/?format=json')
+        compressed = self.client.get('/api/schema/?format=json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+        revalidated = self.client.get('/api/schema/?format=json', HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_build_command_reuses_stored_schema_until_version_changes(self):
+        call_command('build_schema', stdout=io.StringIO())
+        stored = {path.name for path in self.cache_dir.iterdir()}
+        self.assertIn(f"{schema_version()}.yaml.gzip", stored)
+        with mock.patch('api.openapi.build_schema') as build:
+            self.client.get('/api/schema/')
+        build.assert_not_called()
+
+        with mock.patch('api.openapi.schema_version', return_value='next-release'):
+            response = self.client.get('/api/schema/')
+        self.assertEqual(response['ETag'], '"next-release-yaml"')
+        self.assertTrue((self.cache_dir / 'next-release.yaml').exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class FastSerializerTest(TestCase):
+    """Compiled values serializers must reproduce the DRF serializers exactly, on any data."""
+    SEEDS = range(8)
+    ALPHABET = 'abcXYZ019 _-."\\/\n\té€😀\u2028'
+
+    def text(self, rng, max_length):
+        return ''.join(rng.choice(self.ALPHABET) for _ in range(rng.randint(0, max_length)))
+
+    def moment(self, rng):
+        return datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(
+            seconds=rng.randint(0, 10 ** 8), microseconds=rng.choice([0, rng.randint(1, 999999)]))
+
+    def json_value(self, rng, depth=0):
+        choices = [None, True, rng.randint(-10 ** 6, 10 ** 6), rng.random() * 1000, self.text(rng, 8)]
+        if depth < 2:
+            choices += [[self.json_value(rng, depth + 1) for _ in range(rng.randint(0, 3))],
+                        {self.text(rng, 5): self.json_value(rng, depth + 1) for _ in range(rng.randint(0, 3))}]
+        return rng.choice(choices)
+
+    def seed_catalog(self, seed):
+        """Random users (some without a profile), courses, lessons and enrollments."""
+        rng = random.Random(seed)
+        users = []
+        for n in range(rng.randint(2, 5)):
+            user = make_user(f'user_{seed}_{n}', role=rng.choice(['student', 'instructor']),
+                             first_name=self.text(rng, 10), phone_number=self.text(rng, 20)[:20],
+                             country=self.text(rng, 30), is_verified=rng.random() < 0.5)
+            if rng.random() < 0.3:
+                user.profile.delete()
+            else:
+                Profile.objects.filter(user=user).update(
+                    bio=self.text(rng, 200), languages=[self.json_value(rng)], credentials=[self.json_value(rng)],
+                    teaching_experience=rng.randint(0, 40), updated_at=self.moment(rng))
+            users.append(user)
+        for n in range(rng.randint(1, 6)):
+            course = make_course(rng.choice(users), title=f'Course {seed} {n} {self.text(rng, 40)}',
+                                 status=rng.choice(['draft', 'published']), category=self.text(rng, 20),
+                                 level=rng.choice(['beginner', 'intermediate', 'advanced']),
+                                 price=decimal.Decimal(rng.randint(0, 10 ** 10 - 1)) / 100,
+                                 is_featured=rng.random() < 0.5, enrolled_students_count=rng.randint(0, 10 ** 6))
+            Course.objects.filter(pk=course.pk).update(created_at=self.moment(rng))
+            for order in range(rng.randint(0, 4)):
+                Lesson.objects.create(course=course, title=self.text(rng, 50), order=rng.randint(-5, 50),
+                                      content=self.text(rng, 500), resources=[self.json_value(rng)],
+                                      lesson_type=rng.choice(['text', 'video']), video_duration=rng.randint(0, 500))
+            for student in rng.sample(users, rng.randint(0, len(users))):
+                Enrollment.objects.create(student=student, course=course, progress_percentage=rng.randint(0, 100),
+                                          status=rng.choice(['active', 'completed', 'dropped']),
+                                          completed_at=rng.choice([None, self.moment(rng)]))
+
+    def assertSameRepresentation(self, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        compiled = compile_serializer(serializer_class)
+        actual = compiled.to_representation(compiled.project(queryset))
+        self.assertEqual(actual, expected)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_compiled_serializers_match_drf_on_random_data(self):
+        for seed in self.SEEDS:
+            with self.subTest(seed=seed):
+                self.seed_catalog(seed)
+                self.assertSameRepresentation(CourseListSerializer, Course.objects.order_by('id'))
+                self.assertSameRepresentation(LessonSerializer, Lesson.objects.order_by('id'))
+                self.assertSameRepresentation(EnrollmentSerializer, Enrollment.objects.order_by('id'))
+
+    def test_list_endpoints_match_and_use_two_queries(self):
+        self.seed_catalog(42)
+        instructor = Course.objects.first().instructor
+        student = Enrollment.objects.first().student if Enrollment.objects.exists() else make_user('learner')
+        client = APIClient()
+        for user, path in ((instructor, '/api/courses/?ordering=price'), (instructor, '/api/lessons/'),
+                           (student, '/api/enrollments/'), (instructor, '/api/enrollments/')):
+            client.force_authenticate(user)
+            with override_settings(FAST_READ_SERIALIZERS=False):
+                expected = client.get(path)
+            with self.assertNumQueries(2):
+                actual = client.get(path)
+            self.assertEqual(actual.content, expected.content, path)
+
+    def test_unsupported_serializers_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            compile_serializer(CourseSerializer)
+
+
+class SeedingTest(TestCase):
+    preset = seeding.Preset(students=40, instructors=3, courses=12, lessons=4, enrollments=150)
+
+    def snapshot(self):
+        """Generated enrollments with ids relative to the first seeded user and course."""
+        users = self.preset.students + self.preset.instructors
+        first_user = User.objects.order_by('-id').values_list('id', flat=True)[users - 1]
+        first_course = Course.objects.order_by('-id').values_list('id', flat=True)[self.preset.courses - 1]
+        return sorted(
+            (student - first_user, course - first_course, status, progress)
+            for student, course, status, progress in Enrollment.objects.filter(
+                student_id__gte=first_user
+            ).values_list('student_id', 'course_id', 'status', 'progress_percentage')
+        )
+
+    def test_seed_inserts_consistent_rows(self):
+        seeding.seed(self.preset, seed=7, chunk_size=25)
+        self.assertEqual(User.objects.count(), 43)
+        self.assertEqual(Profile.objects.count(), 43)
+        self.assertTrue(Lesson.objects.exists())
+        self.assertFalse(Enrollment.objects.exclude(course__status='published').exists())
+        for course in Course.objects.all():
+            self.assertEqual(course.enrolled_students_count,
+                             course.enrollments.filter(status__in=Enrollment.COUNTED_STATUSES).count())
+        for profile in Profile.objects.filter(user__role='student'):
+            enrollments = Enrollment.objects.filter(student=profile.user_id)
+            self.assertEqual(profile.enrolled_courses_count,
+                             enrollments.filter(status__in=Enrollment.COUNTED_STATUSES).count())
+            self.assertEqual(profile.completed_courses_count, enrollments.filter(status='completed').count())
+
+        self.assertTrue(User.objects.filter(role='student').first().check_password(seeding.SEED_PASSWORD))
+        make_user('after')  # ids continue after the seeded rows
+
+    def test_seed_is_deterministic(self):
+        seeding.seed(self.preset, seed=7)
+        first = self.snapshot()
+        seeding.seed(self.preset, seed=7)
+        self.assertEqual(self.snapshot(), first)
+        seeding.seed(self.preset, seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+
+class CourseSlugTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.instructor = make_user('teacher', role='instructor')
+        self.client.force_authenticate(self.instructor)
+
+    def create(self, title='Introduction to Python', **extra):
+        response = self.client.post('/api/courses/', {'title': title, 'description': 'A course', **extra})
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data['slug']
+
+    def test_duplicate_titles_get_numbered_slugs_in_constant_queries(self):
+        self.assertEqual(self.create(), 'introduction-to-python')
+        self.assertEqual(self.create(), 'introduction-to-python-1')
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.create(), 'introduction-to-python-2')
+        for n in range(3, 10):
+            self.create()
+        with CaptureQueriesContext(connection) as tenth:
+            self.assertEqual(self.create(), 'introduction-to-python-10')
+        self.assertEqual(len(tenth), len(second))
+
+    def test_counter_starts_past_existing_slugs(self):
+        make_course(self.instructor, slug='introduction-to-python')
+        make_course(self.instructor, slug='introduction-to-python-7')
+        make_course(self.instructor, slug='introduction-to-python-advanced')
+        self.assertEqual(self.create(), 'introduction-to-python-8')
+        self.assertEqual(self.create('!!!'), 'course')
+
+    def test_explicit_slug_in_the_way_is_skipped(self):
+        self.assertEqual(self.create(), 'introduction-to-python')
+        self.assertEqual(self.create(slug='introduction-to-python-1'), 'introduction-to-python-1')
+        self.assertEqual(self.create(), 'introduction-to-python-2')
+
+
+class ConcurrentCourseSlugTest(TransactionTestCase):
+    def test_parallel_same_title_creates_all_succeed(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("SQLite needs a file-backed test database (DB_TEST_NAME)")
+        instructor = make_user('teacher', role='instructor')
+        request = RequestFactory().post('/api/courses/')
+        request.user = instructor
+
+        def create(n):
+            try:
+                serializer = CourseCreateSerializer(
+                    data={'title': 'Introduction to Python', 'description': 'A course'}, context={'request': request}
+                )
+                serializer.is_valid(raise_exception=True)
+                with CaptureQueriesContext(connection) as queries:
+                    course = serializer.save()
+                return course.slug, len(queries)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(create, range(200)))
+
+        slugs = {slug for slug, _ in results}
+        self.assertEqual(len(slugs), 200)
+        self.assertEqual(Course.objects.count(), 200)
+        self.assertEqual(CourseSlugCounter.objects.get().last, 199)
+        # Including transaction statements, and the first create's prefix scan.
+        self.assertLessEqual(max(count for _, count in results), 12)
+
+
+@override_settings(
+    RECOMMENDATIONS_TOP_K=3, RECOMMENDATIONS_MIN_SUPPORT=1,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class RecommendationTest(TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        instructor = make_user('teacher', role='instructor')
+        self.courses = [make_course(instructor, title=f"Course {n}") for n in range(24)]
+        self.students = [make_user(f"student{n}") for n in range(30)]
+        self.enroll(rng, 100)
+
+    def enroll(self, rng, count):
+        """Random enrollments; each student sticks to one of four groups of courses."""
+        pairs = set()
+        for _ in range(count):
+            student = rng.randrange(len(self.students))
+            group = self.courses[student % 4 * 6:student % 4 * 6 + 6]
+            pairs.add((self.students[student].pk, rng.choice(group[:rng.randint(1, 6)]).pk))
+        existing = set(Enrollment.objects.values_list('student_id', 'course_id'))
+        Enrollment.objects.bulk_create([
+            Enrollment(student_id=student, course_id=course) for student, course in sorted(pairs - existing)
+        ])
+
+    def snapshot(self):
+        return [
+            (course, recommended, rank, round(score, 9))
+            for course, recommended, rank, score in CourseRecommendation.objects.values_list(
+                'course_id', 'recommended_id', 'rank', 'score')
+        ]
+
+    def expected(self, similarity):
+        takers = {}
+        for student, course in Enrollment.objects.values_list('student_id', 'course_id'):
+            takers.setdefault(course, set()).add(student)
+        expected = []
+        for course, students in sorted(takers.items()):
+            scored = []
+            for other, others in takers.items():
+                shared = len(students & others)
+                if other == course or not shared:
+                    continue
+                if similarity == 'jaccard':
+                    score = shared / len(students | others)
+                else:
+                    score = shared / (len(students) * len(others)) ** 0.5
+                scored.append((-score, other))
+            for rank, (score, other) in enumerate(sorted(scored)[:3], start=1):
+                expected.append((course, other, rank, round(-score, 9)))
+        return expected
+
+    def test_full_build_matches_brute_force(self):
+        for similarity in ('cosine', 'jaccard'):
+            with self.settings(RECOMMENDATIONS_SIMILARITY=similarity):
+                run = build_recommendations(full=True)
+            self.assertTrue(run.full)
+            self.assertEqual(self.snapshot(), self.expected(similarity))
+
+    def test_incremental_build_matches_full_build(self):
+        build_recommendations()
+        rng = random.Random(4)
+        for _ in range(3):
+            self.enroll(rng, 2)
+            run = build_recommendations()
+            self.assertFalse(run.full)
+            self.assertLess(run.courses, len(self.courses))
+            incremental = self.snapshot()
+            build_recommendations(full=True)
+            self.assertEqual(incremental, self.snapshot())
+        self.enroll(rng, 100)
+        self.assertTrue(build_recommendations().full)  # most courses changed
+        self.assertEqual(RecommendationBuild.objects.first().last_enrollment_id, Enrollment.objects.latest('pk').pk)
+
+    def test_endpoint_serves_published_recommendations_in_one_query(self):
+        build_recommendations()
+        course = self.courses[0]
+        self.courses[1].status = 'draft'
+        self.courses[1].save()
+        expected = [
+            recommended for recommended in
+            course.recommendations.values_list('recommended_id', flat=True) if recommended != self.courses[1].pk
+        ]
+        client = APIClient()
+        with self.assertNumQueries(1):
+            response = client.get(f'/api/courses/{course.pk}/recommendations/')
+        self.assertEqual([item['id'] for item in response.data], expected)
+        self.assertEqual(response.data[0], CourseListSerializer(Course.objects.get(pk=expected[0])).data)
+        self.assertEqual(client.get('/api/courses/abc/recommendations/').status_code, 404)
+
+
+class RankingTest(TestCase):
+    def setUp(self):
+        instructor = make_user('teacher', role='instructor')
+        self.courses = [make_course(instructor, title=f"Course {n}") for n in range(4)]
+        self.students = [make_user(f"student{n}") for n in range(4)]
+
+    def enroll(self, course, students, age=datetime.timedelta(0)):
+        Enrollment.objects.bulk_create([Enrollment(student=student, course=course) for student in students])
+        enrolled = timezone.now() - age
+        Enrollment.objects.filter(course=course).update(enrolled_at=enrolled, last_accessed=enrolled)
+
+    def scores(self):
+        return list(Course.objects.order_by('pk').values_list('trending_score', 'popular_score'))
+
+    def test_scores_decay_with_the_half_life(self):
+        fresh, old, quiet, _ = self.courses
+        self.enroll(fresh, self.students[:1])
+        self.enroll(old, self.students[:2], age=datetime.timedelta(hours=48))
+        run = update_rankings()
+        self.assertTrue(run.full)
+        self.assertEqual(run.courses, 2)
+        fresh.refresh_from_db()
+        old.refresh_from_db()
+        quiet.refresh_from_db()
+        # Two enrollments one trending half-life ago weigh as much as one now.
+        self.assertAlmostEqual(fresh.trending_score, old.trending_score, places=6)
+        self.assertLess(fresh.popular_score, old.popular_score)
+        self.assertEqual((quiet.trending_score, quiet.popular_score), (0, 0))
+
+    def test_incremental_update_matches_full_update(self):
+        self.enroll(self.courses[0], self.students, age=datetime.timedelta(days=3))
+        update_rankings()
+        self.enroll(self.courses[1], self.students[:2])
+        Enrollment.objects.filter(course=self.courses[0], student=self.students[0]).update(
+            status='completed', completed_at=timezone.now())
+        run = update_rankings()
+        self.assertFalse(run.full)
+        self.assertEqual(run.courses, 2)
+        incremental = self.scores()
+        update_rankings(full=True)
+        for got, expected in zip(incremental, self.scores()):
+            self.assertAlmostEqual(got[0], expected[0], places=9)
+            self.assertAlmostEqual(got[1], expected[1], places=9)
+        self.assertEqual(CourseRankingUpdate.objects.count(), 3)
+
+    def test_ranking_endpoints_order_published_courses(self):
+        self.enroll(self.courses[1], self.students[:1])
+        self.enroll(self.courses[2], self.students[:3])
+        self.enroll(self.courses[3], self.students[:2], age=datetime.timedelta(days=5))
+        self.courses[2].status = 'draft'
+        self.courses[2].save()
+        update_rankings()
+        client = APIClient()
+        client.force_authenticate(self.courses[2].instructor)
+        trending = client.get('/api/courses/trending/')
+        self.assertEqual([item['id'] for item in trending.data['results']],
+                         [self.courses[1].pk, self.courses[3].pk, self.courses[0].pk])
+        popular = client.get('/api/courses/popular/')
+        self.assertEqual([item['id'] for item in popular.data['results']],
+                         [self.courses[3].pk, self.courses[1].pk, self.courses[0].pk])
+        self.assertEqual(client.get('/api/courses/trending/?level=advanced').data['count'], 0)
+
+
+class DashboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = make_user('student')
+        instructor = make_user('teacher', role='instructor')
+        self.courses = [make_course(instructor, title=f"Course {n}") for n in range(3)]
+        for course in self.courses:
+            for order in range(1, 5):
+                Lesson.objects.create(course=course, title=f"Lesson {order}", order=order)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.student)['access']}")
+
+    def enroll(self, course, **fields):
+        return Enrollment.objects.create(student=self.student, course=course, **fields)
+
+    def test_dashboard_lists_enrollments_with_next_lesson(self):
+        self.enroll(self.courses[0], progress_percentage=50)
+        self.enroll(self.courses[1], status='completed', progress_percentage=100)
+        data = self.client.get('/api/dashboard/').json()
+        self.assertEqual(data['user']['username'], 'student')
+        self.assertEqual(data['user']['profile']['enrolled_courses_count'], 0)
+        by_course = {item['course']['id']: item for item in data['enrollments']}
+        self.assertEqual(by_course[self.courses[0].pk]['next_lesson']['title'], 'Lesson 3')
+        self.assertEqual(by_course[self.courses[0].pk]['course']['lessons_count'], 4)
+        self.assertIsNone(by_course[self.courses[1].pk]['next_lesson'])
+        self.assertEqual(APIClient().get('/api/dashboard/').status_code, 401)
+
+    def test_dashboard_query_budget_and_cache(self):
+        self.enroll(self.courses[0])
+        # Plus one for the JWT user lookup.
+        with self.assertNumQueries(DASHBOARD_QUERY_BUDGET + 1):
+            self.client.get('/api/dashboard/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/dashboard/')
+        for course in self.courses[1:]:
+            self.enroll(course)
+        with self.assertNumQueries(DASHBOARD_QUERY_BUDGET + 1):
+            self.assertEqual(len(self.client.get('/api/dashboard/').data['enrollments']), 3)
+
+    def test_progress_writes_refresh_the_dashboard(self):
+        enrollment = self.enroll(self.courses[0])
+        self.assertEqual(self.client.get('/api/dashboard/').data['enrollments'][0]['next_lesson']['title'], 'Lesson 1')
+        Enrollment.objects.filter(pk=enrollment.pk).update(completed_lessons=bytes([0b111]))
+        # The client's figure is ignored; progress comes from the finished lessons.
+        self.client.patch(f'/api/enrollments/{enrollment.pk}/update_progress/', {'progress_percentage': 10},
+                          format='json')
+        item = self.client.get('/api/dashboard/').data['enrollments'][0]
+        self.assertEqual((item['progress_percentage'], item['next_lesson']['title']), (75, 'Lesson 4'))
+        response = self.client.patch(f'/api/enrollments/{enrollment.pk}/', {'progress_percentage': 100},
+                                     format='json')
+        self.assertEqual((response.status_code, response.data['progress_percentage']), (200, 75))
+        self.client.patch('/api/profile/', {'bio': 'Learning'}, format='json')
+        self.assertEqual(self.client.get('/api/dashboard/').data['user']['profile']['bio'], 'Learning')
+
+
+class LessonProgressTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.instructor = make_user('teacher', role='instructor')
+        self.course = make_course(self.instructor)
+        # Positions follow `order`, not creation.
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f"Lesson {order}", order=order) for order in (3, 1, 2, 4)
+        ]
+        self.lessons.sort(key=lambda lesson: lesson.order)
+        self.student = make_user('student')
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def complete(self, lesson, enrollment=None):
+        return self.client.post(
+            f'/api/enrollments/{(enrollment or self.enrollment).pk}/complete_lesson/', {'lesson': lesson.pk},
+            format='json',
+        )
+
+    def test_completing_lessons_derives_progress(self):
+        response = self.complete(self.lessons[2])
+        self.assertEqual(response.data['progress_percentage'], 25)
+        self.assertEqual(response.data['completed_lessons'], [self.lessons[2].pk])
+        self.complete(self.lessons[0])
+        response = self.complete(self.lessons[0])
+        self.assertEqual((response.data['progress_percentage'], response.data['status']), (50, 'active'))
+        self.assertEqual(response.data['completed_lessons'], [self.lessons[0].pk, self.lessons[2].pk])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(bytes(self.enrollment.completed_lessons), bytes([0b101]))
+        next_lesson = self.client.get('/api/dashboard/').data['enrollments'][0]['next_lesson']
+        self.assertEqual(next_lesson['id'], self.lessons[1].pk)
+
+        with override_settings(JOBS_IMMEDIATE=True), self.captureOnCommitCallbacks(execute=True):
+            for lesson in self.lessons[1:]:
+                response = self.complete(lesson)
+            self.assertEqual((response.data['progress_percentage'], response.data['status']), (100, 'completed'))
+            self.complete(self.lessons[3])
+        self.student.profile.refresh_from_db()
+        self.assertEqual(self.student.profile.completed_courses_count, 1)
+
+    def test_dropped_enrollments_cannot_complete_lessons(self):
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(status='dropped')
+        # Even through a stale 'active' instance, finishing the course does not complete it.
+        for lesson in self.lessons:
+            complete_lesson(self.enrollment, lesson)
+        self.enrollment.status = 'dropped'
+        self.assertEqual(self.complete(self.lessons[3]).status_code, 400)
+        with self.assertRaises(ValueError):
+            complete_lesson(self.enrollment, self.lessons[3])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.status, 'dropped')
+        self.assertEqual(reconcile(dry_run=True).corrected, 0)
+
+    def test_completion_is_checked_and_bitmaps_grow(self):
+        other = Lesson.objects.create(course=make_course(self.instructor, title='Other'), title='Elsewhere')
+        self.assertEqual(self.complete(other).status_code, 400)
+        stranger = Enrollment.objects.create(student=make_user('stranger'), course=self.course)
+        self.assertEqual(self.complete(self.lessons[0], stranger).status_code, 404)
+
+        extra = [Lesson.objects.create(course=self.course, title=f"Extra {n}", order=10 + n) for n in range(16)]
+        enrollment = complete_lesson(self.enrollment, extra[-1])
+        self.assertEqual(completed_positions(enrollment.completed_lessons, 20), [19])
+        self.assertEqual(enrollment.progress_percentage, 5)
+
+    def test_progress_never_passes_100_when_lessons_are_removed(self):
+        for lesson in self.lessons[:3]:
+            self.complete(lesson)
+        self.lessons.pop(0).delete()
+        self.lessons.pop(0).delete()
+        response = self.complete(self.lessons[1])
+        self.assertEqual((response.data['progress_percentage'], response.data['status']), (100, 'completed'))
+        response = self.client.patch(f'/api/enrollments/{self.enrollment.pk}/update_progress/', format='json')
+        self.assertEqual(response.data['progress_percentage'], 100)
+
+    def test_lesson_completion_counts(self):
+        for index, done in enumerate([[0, 1], [0], [0, 3]]):
+            enrollment = Enrollment.objects.create(student=make_user(f"learner{index}"), course=self.course)
+            for position in done:
+                complete_lesson(enrollment, self.lessons[position])
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.pk}/lesson_completion/').status_code, 403)
+        self.client.force_authenticate(self.instructor)
+        response = self.client.get(f'/api/courses/{self.course.pk}/lesson_completion/')
+        self.assertEqual([(item['id'], item['completed']) for item in response.data],
+                         [(lesson.pk, count) for lesson, count in zip(self.lessons, [3, 1, 0, 1])])
+
+
+class LessonContentTest(TestCase):
+    def setUp(self):
+        self.instructor = make_user('teacher', role='instructor')
+        self.course = make_course(self.instructor)
+
+    def test_identical_bodies_are_stored_once(self):
+        text = "Variables, loops and functions — ünïcode included. " * 40
+        first = Lesson.objects.create(course=self.course, title='One', content=text)
+        second = Lesson.objects.create(course=make_course(self.instructor, title='Clone'), title='One', content=text)
+        self.assertEqual(first.body_id, second.body_id)
+        self.assertEqual(LessonContent.objects.count(), 1)
+        blob = LessonContent.objects.get()
+        self.assertEqual(blob.size, len(text.encode()))
+        self.assertLess(len(bytes(blob.data)), blob.size // 10)
+        self.assertEqual(Lesson.objects.get(pk=second.pk).content, text)
+
+    def test_saving_only_writes_new_text(self):
+        lesson = Lesson.objects.create(course=self.course, title='One', content='Original text')
+        lesson = Lesson.objects.get(pk=lesson.pk)
+        lesson.content, lesson.title = 'Original text', 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            lesson.save()
+        self.assertFalse([q for q in queries.captured_queries if 'api_lessoncontent' in q['sql']])
+
+        lesson.content = 'Edited text'
+        lesson.save(update_fields=['title'])
+        self.assertEqual(Lesson.objects.get(pk=lesson.pk).content, 'Edited text')
+        self.assertEqual(LessonContent.objects.count(), 2)
+        lesson.content = ''
+        lesson.save()
+        self.assertIsNone(Lesson.objects.get(pk=lesson.pk).body_id)
+
+    def test_api_reads_and_writes_content(self):
+        client = APIClient()
+        client.force_authenticate(self.instructor)
+        response = client.post('/api/lessons/', {
+            'course': self.course.pk, 'title': 'Intro', 'lesson_type': 'text', 'content': 'Hello there', 'order': 1,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['content'], 'Hello there')
+        response = client.get(f'/api/courses/{self.course.pk}/')
+        self.assertEqual(response.data['lessons'][0]['content'], 'Hello there')
+        with CaptureQueriesContext(connection) as queries:
+            listed = client.get('/api/lessons/')
+        plain = len(queries)
+        self.assertEqual(listed.data['results'][0]['content'], 'Hello there')
+        self.assertLessEqual(plain, 3)
+
+    def test_bulk_writes_refuse_unsaved_content(self):
+        with self.assertRaises(ValueError):
+            Lesson.objects.bulk_create([Lesson(course=self.course, title='One', content='Lost text')])
+        body = LessonContent.store('Kept text')
+        Lesson.objects.bulk_create([Lesson(course=self.course, title='One', body=body)])
+        self.assertEqual(Lesson.objects.get().content, 'Kept text')
+
+    def test_prune_removes_unused_bodies(self):
+        lesson = Lesson.objects.create(course=self.course, title='One', content='First draft')
+        lesson.content = 'Second draft'
+        lesson.save()
+        Lesson.objects.create(course=self.course, title='Two', content='Deleted lesson').delete()
+        self.assertEqual(LessonContent.prune(), 0)
+        LessonContent.objects.update(created_at=timezone.now() - 2 * LessonContent.PRUNE_AFTER)
+        call_command('prune_lesson_content', stdout=io.StringIO())
+        self.assertEqual(list(LessonContent.objects.values_list('pk', flat=True)), [lesson.body_id])
+        self.assertEqual(Lesson.objects.get(pk=lesson.pk).content, 'Second draft')
+
+    def test_storing_an_old_orphan_again_keeps_it_from_pruning(self):
+        Lesson.objects.create(course=self.course, title='Gone', content='Reused text').delete()
+        LessonContent.objects.update(created_at=timezone.now() - 2 * LessonContent.PRUNE_AFTER)
+        body = LessonContent.store('Reused text')
+        self.assertEqual(LessonContent.prune(), 0)
+        Lesson.objects.bulk_create([Lesson(course=self.course, title='Back', body=body)])
+        self.assertEqual(Lesson.objects.get().content, 'Reused text')
+
+    def test_stats_report_the_space_saved(self):
+        text = 'Repeated paragraph. ' * 50
+        for title in ('One', 'Two', 'Three'):
+            Lesson.objects.create(course=self.course, title=title, content=text)
+        lessons, raw_bytes, blobs, stored_bytes = LessonContent.usage()
+        self.assertEqual((lessons, raw_bytes, blobs), (3, 3 * len(text), 1))
+        self.assertEqual(stored_bytes, len(LessonContent.compress(text)))
+        out = io.StringIO()
+        call_command('lesson_content_stats', stdout=out)
+        self.assertIn(f"3 lesson bodies ({3 * len(text):,} bytes) stored as 1 compressed blobs", out.getvalue())
+
+
+class CourseLessonRouteTest(TestCase):
+    def setUp(self):
+        self.instructor = make_user('teacher', role='instructor')
+        self.course = make_course(self.instructor)
+        self.draft = make_course(self.instructor, title='Draft', status='draft')
+        for course in (self.course, self.draft):
+            for order in (2, 1, 3):
+                Lesson.objects.create(course=course, title=f"{course.title} {order}", order=order, content='Body')
+        self.client = APIClient()
+
+    def test_lists_one_course_in_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/courses/{self.course.pk}/lessons/')
+        plain = len(queries)
+        self.assertEqual([lesson['title'] for lesson in response.data['results']],
+                         [f"{self.course.title} {order}" for order in (1, 2, 3)])
+        self.assertEqual(response.data['results'][0]['content'], 'Body')
+        # The course check, the count and the page.
+        self.assertEqual(plain, 3)
+        lesson = Lesson.objects.filter(course=self.course).first()
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.pk}/lessons/{lesson.pk}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/courses/{self.draft.pk}/lessons/{lesson.pk}/').status_code, 404)
+
+    def test_hidden_courses_and_writes(self):
+        self.assertEqual(self.client.get(f'/api/courses/{self.draft.pk}/lessons/').status_code, 404)
+        self.client.force_authenticate(make_user('student'))
+        self.assertEqual(self.client.get(f'/api/courses/{self.draft.pk}/lessons/').status_code, 404)
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(len(self.client.get(f'/api/courses/{self.draft.pk}/lessons/').data['results']), 3)
+        response = self.client.post(f'/api/courses/{self.course.pk}/lessons/', {'title': 'New'}, format='json')
+        self.assertEqual(response.status_code, 405)
+
+    def test_global_list_uses_one_visibility_predicate(self):
+        other = make_user('other', role='instructor')
+        make_course(other, title='Hidden', status='draft')
+        self.client.force_authenticate(other)
+        titles = {lesson['title'] for lesson in self.client.get('/api/lessons/').data['results']}
+        self.assertEqual(titles, {f"{self.course.title} {order}" for order in (1, 2, 3)})
+        self.client.force_authenticate(self.instructor)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/lessons/')
+        self.assertEqual(response.data['count'], 6)
+        for query in queries.captured_queries:
+            self.assertLessEqual(query['sql'].count('JOIN "api_course"'), 1, query['sql'])
+
+
+class FailingSink(outbox.Sink):
+    name = 'failing'
+
+    def send(self, events):
+        raise ConnectionError("sink down")
+
+
+@override_settings(OUTBOX_RELAY_LAG_SECONDS=0)
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.instructor = make_user('teacher', role='instructor')
+        self.course = make_course(self.instructor)
+        self.student = make_user('student')
+        self.client = APIClient()
+
+    def events(self):
+        return list(OutboxEvent.objects.values_list('kind', flat=True))
+
+    def test_actions_record_events_in_their_transaction(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'newbie', 'email': 'newbie@example.com', 'password': 'pass12345', 'role': 'student',
+            'phone_number': '123', 'country': 'RW', 'city': 'Kigali',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.client.force_authenticate(self.student)
+        response = self.client.post(f'/api/courses/{self.course.pk}/enroll/')
+        enrollment_id = response.data['id']
+        Lesson.objects.create(course=self.course, title='Only', order=1)
+        Enrollment.objects.filter(pk=enrollment_id).update(completed_lessons=bytes([0b1]))
+        self.client.patch(f'/api/enrollments/{enrollment_id}/update_progress/', format='json')
+        self.assertEqual(OutboxEvent.objects.get(kind='enrollment.progress').payload['progress_percentage'], 100)
+        self.assertEqual(self.events(), ['user.registered', 'enrollment.created', 'enrollment.progress',
+                                         'enrollment.completed'])
+        self.assertEqual(OutboxEvent.objects.get(kind='enrollment.created').payload,
+                         {'enrollment_id': enrollment_id, 'student_id': self.student.pk, 'course_id': self.course.pk})
+
+        self.client.force_authenticate(self.instructor)
+        draft = self.client.post('/api/courses/', {'title': 'Draft', 'description': 'x', 'status': 'draft'},
+                                 format='json').data
+        self.client.patch(f"/api/courses/{draft['id']}/", {'description': 'y'}, format='json')
+        self.client.patch(f"/api/courses/{draft['id']}/", {'status': 'published'}, format='json')
+        event = OutboxEvent.objects.last()
+        self.assertEqual(self.events()[-2:], ['course.created', 'course.status_changed'])
+        self.assertEqual((event.payload['previous'], event.payload['status']), ('draft', 'published'))
+
+    def test_failed_change_leaves_no_event(self):
+        self.client.force_authenticate(self.student)
+        with mock.patch.object(Course, 'save', side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.client.post(f'/api/courses/{self.course.pk}/enroll/')
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertEqual(self.events(), [])
+
+    def test_lesson_completion_records_events(self):
+        lesson = Lesson.objects.create(course=self.course, title='Only', order=1)
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        complete_lesson(enrollment, lesson)
+        self.assertEqual(self.events(), ['lesson.completed', 'enrollment.completed'])
+        self.assertEqual(OutboxEvent.objects.first().payload['progress_percentage'], 100)
+
+    def test_relay_delivers_at_least_once_per_sink(self):
+        for n in range(5):
+            outbox.record('test.event', n=n)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        ndjson, failing = outbox.NDJSONSink(directory.name), FailingSink()
+
+        # The failing sink is logged and backs off; the healthy one keeps going.
+        with self.assertLogs('api.outbox', 'ERROR'):
+            self.assertEqual(outbox.relay_once([ndjson, failing], batch_size=2), 2)
+        self.assertEqual(OutboxCursor.objects.get(sink='ndjson').last_event_id, OutboxEvent.objects.all()[1].pk)
+        self.assertEqual(outbox.relay([ndjson, failing], batch_size=2, once=True), 3)
+        self.assertEqual(failing.failures, 1)
+        lines = [json.loads(line) for path in Path(directory.name).iterdir() for line in path.read_text().splitlines()]
+        self.assertEqual([line['payload']['n'] for line in lines], list(range(5)))
+        self.assertEqual(OutboxCursor.objects.get(sink='ndjson').delivered, 5)
+        self.assertEqual(OutboxCursor.objects.get(sink='failing').last_event_id, 0)
+
+        # A full queue fails the batch; it is resent once there is room and the backoff has passed.
+        sink = outbox.QueueSink(maxsize=1, timeout=0)
+        outbox.relay_once([sink], batch_size=3)
+        with self.assertLogs('api.outbox', 'ERROR') as logs, override_settings(OUTBOX_RETRY_BACKOFF_SECONDS=0):
+            self.assertEqual(outbox.relay_once([sink], batch_size=3), 0)
+        self.assertIn('queue.Full', logs.output[0])
+        self.assertEqual([event['payload']['n'] for event in sink.queue.get()], [0, 1, 2])
+        outbox.relay_once([sink], batch_size=3)
+        self.assertEqual([event['payload']['n'] for event in sink.queue.get()], [3, 4])
+        # Nothing would read its queue in relay_outbox.
+        with self.assertRaises(ImportError):
+            outbox.load_sinks(['queue'])
+
+    @override_settings(OUTBOX_RELAY_LAG_SECONDS=60)
+    def test_relay_waits_at_id_gaps_and_prunes_delivered(self):
+        old = outbox.record('test.event')
+        OutboxEvent.objects.filter(pk=old.pk).update(created_at=timezone.now() - datetime.timedelta(days=30))
+        # An id taken by a transaction that has not committed yet.
+        outbox.record('test.event').delete()
+        outbox.record('test.event')
+        sink = outbox.QueueSink()
+        self.assertEqual(outbox.relay([sink], once=True), 1)
+        self.assertEqual(outbox.prune([sink, FailingSink()]), 0)
+        self.assertEqual(outbox.prune([sink]), 1)
+        self.assertEqual(outbox.relay([sink], once=True), 0)
+
+        # It never commits: past the lag the gap is logged and skipped.
+        OutboxEvent.objects.update(created_at=timezone.now() - datetime.timedelta(minutes=2))
+        with self.assertLogs('api.outbox', 'WARNING') as logs:
+            self.assertEqual(outbox.relay([sink], once=True), 1)
+        self.assertIn(f'Outbox events {old.pk + 1}-{old.pk + 1} never committed', logs.output[0])
+
+
+JOB_CALLS = []
+
+
+@jobs.job(name='tests.record_call', queue='tests', max_attempts=2)
+def record_call(value, failures=0):
+    JOB_CALLS.append(value)
+    if JOB_CALLS.count(value) <= failures:
+        raise ValueError(f"failure {JOB_CALLS.count(value)}")
+
+
+class BackgroundJobTest(TestCase):
+    def setUp(self):
+        JOB_CALLS.clear()
+        self.instructor = make_user('teacher', role='instructor')
+        self.courses = [make_course(self.instructor, title=f"Course {n}") for n in range(2)]
+        self.student = make_user('student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_enrollments_defer_one_profile_recount(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for course in self.courses:
+                self.client.post(f'/api/courses/{course.pk}/enroll/')
+        queued = Job.objects.get()
+        self.assertEqual(queued.name, 'api.tasks.refresh_profile_counts')
+        self.assertEqual(queued.kwargs, {'user_id': self.student.pk})
+        self.student.profile.refresh_from_db()
+        self.assertEqual(self.student.profile.enrolled_courses_count, 0)
+
+        ids = jobs.claim('default', 'worker', 10)
+        self.assertEqual(ids, [queued.pk])
+        self.assertTrue(jobs.execute(queued.pk, 'worker'))
+        self.student.profile.refresh_from_db()
+        self.assertEqual(self.student.profile.enrolled_courses_count, 2)
+        self.assertFalse(Job.objects.exists())
+
+    def test_rolled_back_request_queues_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with mock.patch.object(Course, 'save', side_effect=RuntimeError("boom")):
+                with self.assertRaises(RuntimeError):
+                    self.client.post(f'/api/courses/{self.courses[0].pk}/enroll/')
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_IMMEDIATE=True)
+    def test_immediate_mode_runs_at_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/courses/{self.courses[0].pk}/enroll/')
+        self.assertFalse(Job.objects.exists())
+        self.student.profile.refresh_from_db()
+        self.assertEqual(self.student.profile.enrolled_courses_count, 1)
+
+    def test_retries_with_backoff_then_fails(self):
+        queued = jobs.enqueue(record_call, {'value': 'a', 'failures': 5})
+        self.assertEqual(jobs.claim('tests', 'worker', 10), [queued.pk])
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.assertFalse(jobs.execute(queued.pk, 'worker'))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('failure 1', queued.last_error)
+        self.assertEqual(jobs.claim('tests', 'worker', 10), [])
+
+        Job.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        jobs.claim('tests', 'worker', 10)
+        with self.assertLogs('api.jobs', 'ERROR'):
+            jobs.execute(queued.pk, 'worker')
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('failed', 2))
+
+    def test_claims_respect_limits_dedupe_and_leases(self):
+        first = jobs.enqueue(record_call, {'value': 'b'}, dedupe_key='b')
+        self.assertEqual(jobs.enqueue(record_call, {'value': 'b'}, dedupe_key='b'), first)
+        for value in 'cde':
+            jobs.enqueue(record_call, {'value': value})
+        jobs.enqueue(record_call, {'value': 'later'}, delay=60)
+        self.assertEqual(len(jobs.claim('tests', 'one', 2)), 2)
+        self.assertEqual(len(jobs.claim('tests', 'two', 10)), 2)
+        self.assertEqual(jobs.claim('tests', 'three', 10), [])
+
+        # A running job is only claimed again once its worker's lease ran out.
+        Job.objects.filter(locked_by='one').update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+        reclaimed = jobs.claim('tests', 'three', 10)
+        self.assertEqual(len(reclaimed), 2)
+        self.assertFalse(jobs.execute(reclaimed[0], 'one'))
+        self.assertTrue(jobs.execute(reclaimed[0], 'three'))
+
+
+class JobWorkerTest(TransactionTestCase):
+    def test_thread_pool_runs_due_jobs(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("SQLite needs a file-backed test database (DB_TEST_NAME)")
+        JOB_CALLS.clear()
+        for value in range(6):
+            jobs.enqueue(record_call, {'value': value, 'failures': 1 if value == 5 else 0})
+        with override_settings(JOBS_RETRY_BACKOFF_SECONDS=60), self.assertLogs('api.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_workers({'tests': 3}, poll_interval=0.01, once=True), (5, 1))
+        self.assertEqual(sorted(JOB_CALLS), list(range(6)))
+        self.assertEqual(list(Job.objects.values_list('status', 'attempts')), [('queued', 1)])
+
+
+@override_settings(COMPRESSION_MIN_SIZE=0)
+class CacheWarmingTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.instructor = make_user('teacher', role='instructor', last_login=timezone.now())
+        self.student = make_user('student', last_login=timezone.now())
+        self.courses = [make_course(self.instructor, title=f"Course {n}", category='code') for n in range(3)]
+        Enrollment.objects.create(student=self.student, course=self.courses[0])
+
+    def test_warms_catalog_courses_and_users(self):
+        from api.views.user_views import USER_CACHE_KEY
+        from api.warming import warm
+
+        report = warm(courses=2, users=5, concurrency=3, budget=60)
+        self.assertEqual((report.skipped, report.failed), (0, 0))
+        self.assertEqual(set(report.by_kind), {'schema', 'catalog', 'users'})
+        self.assertEqual(report.keys, sum(report.by_kind.values()))
+        self.assertIsNotNone(cache.get(f"{USER_CACHE_KEY}_{self.student.pk}"))
+
+        # The replayed pages are now cache hits: the facets come from the cache.
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/api/courses/?facets=true')
+        self.assertIn('facets', response.data)
+        self.assertFalse([q for q in queries.captured_queries if 'price_bucket' in q['sql']])
+        # Warming again finds everything in place and writes the same keys.
+        self.assertEqual(warm(courses=2, users=5, concurrency=3, budget=60).keys, report.keys)
+
+    def test_budget_skips_what_did_not_start(self):
+        from api.warming import warm
+
+        report = warm(courses=2, users=5, concurrency=1, budget=0)
+        self.assertEqual(report.keys, 0)
+        self.assertGreater(report.skipped, 0)
+        out = io.StringIO()
+        call_command('warm_caches', '--budget', '60', '--courses', '1', stdout=out)
+        self.assertIn('Warmed', out.getvalue())
+
+    def test_warm_set_fits_the_caches(self):
+        from api.warming import capacity, fit
+
+        self.assertEqual(capacity('default'), 300)
+        self.assertEqual(fit(50, 100), (50, 46))
+        with self.settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 60}},
+            'compressed': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        }):
+            # (60 / 2 - 11 facet entries) // 3 keys per user; no limit on the dummy cache.
+            self.assertEqual(fit(50, 100), (50, 6))
+            self.assertEqual(fit(50, 2), (50, 2))
+
+
+class CounterReconciliationTest(TestCase):
+    def setUp(self):
+        instructor = make_user('teacher', role='instructor')
+        self.courses = [make_course(instructor, title=f"Course {n}") for n in range(3)]
+        self.students = [make_user(f'student{n}') for n in range(3)]
+        for student, course, status in [
+            (self.students[0], self.courses[0], 'active'),
+            (self.students[0], self.courses[1], 'completed'),
+            (self.students[1], self.courses[0], 'dropped'),
+            (self.students[2], self.courses[0], 'completed'),
+        ]:
+            Enrollment.objects.create(student=student, course=course, status=status)
+        # Drift: stale increments, and nothing taken back for the drop.
+        Course.objects.update(enrolled_students_count=5)
+        Profile.objects.filter(user__in=self.students).update(enrolled_courses_count=1, completed_courses_count=0)
+
+    def counters(self):
+        return (
+            list(Course.objects.order_by('pk').values_list('enrolled_students_count', flat=True)),
+            [(profile.enrolled_courses_count, profile.completed_courses_count)
+             for profile in Profile.objects.filter(user__in=self.students).order_by('user_id')],
+        )
+
+    def test_dry_run_reports_without_writing(self):
+        before = self.counters()
+        report = reconcile(dry_run=True, chunk_size=2, largest=2)
+        self.assertEqual(self.counters(), before)
+        self.assertIsNone(report.run)
+        self.assertFalse(CounterReconciliation.objects.exists())
+        # Three courses and three profiles; student1 dropped their only course and has 1 stored.
+        self.assertEqual(report.corrected, 3 + 3)
+        self.assertEqual(report.drift['courses.enrolled_students_count'], 3 + 4 + 5)
+        self.assertEqual([(diff.phase, diff.id, diff.actual) for diff in report.largest],
+                         [('courses', self.courses[2].pk, 0), ('courses', self.courses[1].pk, 1)])
+
+    def test_corrects_counters_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            report = reconcile(chunk_size=2)
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "api_course" SET')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(self.counters(), ([2, 1, 0], [(2, 1), (0, 0), (1, 1)]))
+        self.assertEqual(report.corrected, 6)
+        self.assertIsNotNone(report.run.finished_at)
+        self.assertEqual(reconcile(chunk_size=2).corrected, 0)
+
+    def test_resumes_an_interrupted_run(self):
+        CounterReconciliation.objects.create(phase='courses', last_id=self.courses[0].pk, checked=1, corrected=1)
+        out = io.StringIO()
+        call_command('reconcile_counters', '--chunk-size', '2', stdout=out)
+        # The first course was done before the interruption, so it is not checked again.
+        self.assertIn('corrected 6', out.getvalue())
+        self.assertEqual(self.counters()[0], [5, 1, 0])
+        self.assertIsNotNone(CounterReconciliation.objects.get().finished_at)
+
+
+class EnrollmentArchiveTest(TestCase):
+    def setUp(self):
+        instructor = make_user('teacher', role='instructor')
+        self.courses = [make_course(instructor, title=f"Course {n}") for n in range(3)]
+        self.student = make_user('student')
+        long_ago = timezone.now() - datetime.timedelta(days=400)
+        self.old_completed, self.old_dropped, self.current = [
+            Enrollment.objects.create(student=self.student, course=course, status=status, progress_percentage=progress)
+            for course, status, progress in zip(self.courses, ['completed', 'dropped', 'completed'], [100, 30, 100])
+        ]
+        for n, enrollment in enumerate([self.old_completed, self.old_dropped, self.current]):
+            Enrollment.objects.filter(pk=enrollment.pk).update(
+                enrolled_at=long_ago + datetime.timedelta(days=n), last_accessed=long_ago,
+                completed_at=long_ago if enrollment.status == 'completed' else None,
+                completed_lessons=b'\x07',
+            )
+        Enrollment.objects.filter(pk=self.current.pk).update(completed_at=timezone.now())
+        reconcile()
+
+    def test_moves_old_enrollments_in_batches(self):
+        self.assertEqual(archive(dry_run=True).archived, 2)
+        report = archive(batch_size=1)
+        self.assertEqual((report.archived, report.batches), (2, 2))
+        self.assertEqual(list(Enrollment.objects.values_list('pk', flat=True)), [self.current.pk])
+        archived = ArchivedEnrollment.objects.get(pk=self.old_dropped.pk)
+        self.assertEqual((archived.status, archived.progress_percentage, bytes(archived.completed_lessons)),
+                         ('dropped', 30, b'\x07'))
+        self.assertEqual(archive().archived, 0)
+
+        # Counters keep the archived completion; a dropped course can be taken again.
+        self.assertEqual(reconcile(dry_run=True).corrected, 0)
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.post(f'/api/courses/{self.old_dropped.course_id}/enroll/').status_code, 201)
+
+    def test_an_archived_completion_cannot_be_enrolled_again(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        course = make_course(self.courses[0].instructor, title='Fresh')
+        lesson = Lesson.objects.create(course=course, title='Only', order=1)
+        with override_settings(JOBS_IMMEDIATE=True), self.captureOnCommitCallbacks(execute=True):
+            enrollment_id = client.post(f'/api/courses/{course.pk}/enroll/').data['id']
+            client.post(f'/api/enrollments/{enrollment_id}/complete_lesson/', {'lesson': lesson.pk}, format='json')
+        Enrollment.objects.filter(pk=enrollment_id).update(completed_at=timezone.now() - datetime.timedelta(days=400))
+        archive()
+        self.assertTrue(ArchivedEnrollment.objects.filter(pk=enrollment_id, status='completed').exists())
+
+        response = client.post(f'/api/courses/{course.pk}/enroll/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], "You have already completed this course.")
+        response = client.post('/api/enrollments/', {'course': course.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Enrollment.objects.filter(course=course).exists())
+        course.refresh_from_db()
+        self.assertEqual(course.enrolled_students_count, 1)
+        self.assertEqual(reconcile(dry_run=True).corrected, 0)
+
+    def test_history_pages_through_both_tables(self):
+        archive()
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.get('/api/enrollments/').data['count'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/enrollments/history/')
+        plain = len(queries)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([(row['id'], row['archived']) for row in response.data['results']], [
+            (self.current.pk, False), (self.old_dropped.pk, True), (self.old_completed.pk, True),
+        ])
+        self.assertEqual(response.data['results'][1]['course']['id'], self.old_dropped.course_id)
+
+        for n in range(5):
+            ArchivedEnrollment.objects.create(
+                id=1000 + n, student=self.student, course=self.courses[n % 3], status='dropped',
+                last_accessed=timezone.now(), enrolled_at=timezone.now(), archived_at=timezone.now(),
+            )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/enrollments/history/')
+        self.assertEqual(response.data['count'], 8)
+        self.assertEqual(len(queries), plain)
+
+
+class AccountDeletionTest(TestCase):
+    def setUp(self):
+        self.instructor = make_user('teacher', role='instructor')
+        self.courses = [make_course(self.instructor, title=f"Course {n}") for n in range(2)]
+        self.other = make_course(make_user('other', role='instructor'), title="Other course")
+        for course in self.courses:
+            for n in range(3):
+                Lesson.objects.create(course=course, title=f"Lesson {n}", order=n, content='text')
+        CourseRecommendation.objects.create(course=self.other, recommended=self.courses[0], rank=1, score=0.5)
+        self.students = [make_user(f'student{n}') for n in range(3)]
+        for student in self.students:
+            for course, status in zip([*self.courses, self.other], ['completed', 'active', 'active']):
+                Enrollment.objects.create(student=student, course=course, status=status)
+        reconcile()
+
+    def finish(self, deletion, batch_size):
+        """Runs ``deletion`` one batch at a time; returns the rows deleted by each batch."""
+        batches, deleted = [], 0
+        while not run_deletion(deletion.pk, budget=0, batch_size=batch_size):
+            deletion.refresh_from_db()
+            batches.append(deletion.deleted - deleted)
+            deleted = deletion.deleted
+        return batches
+
+    def test_delete_me_deactivates_and_defers(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.students[0])['access']}")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.delete('/api/user/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(Job.objects.get().name, 'api.tasks.delete_account')
+        self.assertFalse(User.objects.get(pk=self.students[0].pk).is_active)
+        self.assertEqual(Enrollment.objects.filter(student=self.students[0]).count(), 3)
+        self.assertEqual(client.get('/api/user/').status_code, 401)
+
+        # Asking again while it runs returns the same deletion.
+        self.assertEqual(request_deletion(self.students[0]).pk, response.data['id'])
+        self.finish(AccountDeletion.objects.get(), batch_size=2)
+        self.assertFalse(User.objects.filter(pk=self.students[0].pk).exists())
+        self.assertEqual(reconcile(dry_run=True).corrected, 0)
+
+    def test_instructor_deletion_runs_in_bounded_batches(self):
+        deletion = request_deletion(self.instructor)
+        batches = self.finish(deletion, batch_size=2)
+        self.assertTrue(batches)
+        self.assertLessEqual(max(batches), 2)
+        deletion.refresh_from_db()
+        self.assertEqual((deletion.status, deletion.step), ('done', ''))
+        # 6 enrollments, 6 lessons, 1 recommendation, 2 courses, then the user and profile
+        self.assertEqual(deletion.deleted, 6 + 6 + 1 + 2 + 2)
+        self.assertFalse(Course.objects.filter(pk__in=[course.pk for course in self.courses]).exists())
+        self.assertTrue(OutboxEvent.objects.filter(kind='user.deleted', payload__user_id=self.instructor.pk).exists())
+        # The students' counts lost the deleted courses.
+        self.assertEqual(reconcile(dry_run=True).corrected, 0)
+        self.assertEqual(Profile.objects.get(user=self.students[0]).enrolled_courses_count, 1)
+
+    @override_settings(JOBS_IMMEDIATE=True)
+    def test_admin_destroy_reports_progress(self):
+        admin = make_user('admin', role='instructor', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.delete(f'/api/users/{self.students[1].pk}/')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(User.objects.filter(pk=self.students[1].pk).exists())
+        self.assertEqual(Course.objects.get(pk=self.other.pk).enrolled_students_count, 2)
+        deletions = client.get('/api/users/deletions/').data['results']
+        self.assertEqual([(row['username'], row['status']) for row in deletions], [('student1', 'done')])
+
+
+class AccountDeletionWorkerTest(TransactionTestCase):
+    @override_settings(DELETION_BATCH_SIZE=2, DELETION_JOB_SECONDS=0)
+    def test_workers_run_the_queued_chain_to_the_end(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("SQLite needs a file-backed test database (DB_TEST_NAME)")
+        instructor = make_user('teacher', role='instructor')
+        course = make_course(instructor)
+        for n in range(3):
+            Lesson.objects.create(course=course, title=f"Lesson {n}", order=n, content='text')
+            Enrollment.objects.create(student=make_user(f'student{n}'), course=course)
+        reconcile()
+        deletion = request_deletion(instructor)
+
+        # Every job deletes one batch and queues the next, until the user is gone.
+        succeeded, failed = jobs.run_workers({'default': 1}, poll_interval=0.01, once=True)
+        self.assertGreater(succeeded, 1)
+        self.assertEqual(failed, 0)
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, 'done')
+        self.assertFalse(User.objects.filter(pk=instructor.pk).exists())
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(reconcile(dry_run=True).corrected, 0)
+
+
+@override_settings(OUTBOX_RELAY_LAG_SECONDS=0, STREAM_POLL_SECONDS=0.01, STREAM_HEARTBEAT_SECONDS=0.2)
+class CourseProgressStreamTest(TestCase):
+    def setUp(self):
+        self.instructor = make_user('teacher', role='instructor')
+        self.course = make_course(self.instructor)
+        self.other = make_course(make_user('other', role='instructor'), title="Other course")
+        self.student = make_user('student')
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+
+    def progress(self, course, *percentages):
+        for percentage in percentages:
+            outbox.record('enrollment.progress', enrollment_id=self.enrollment.pk, student_id=self.student.pk,
+                          course_id=course.pk, progress_percentage=percentage)
+
+    def test_subscription_coalesces_and_resets_when_behind(self):
+        async def scenario():
+            subscription = streams.Subscription(limit=2)
+            subscription.offer(1, {'id': 7, 'student_id': 3, 'progress_percentage': 10})
+            subscription.offer(2, {'id': 7, 'progress_percentage': 40, 'last_lesson_id': 5})
+            first = await subscription.take(1)
+            for event_id, enrollment_id in enumerate([7, 8, 9], start=3):
+                subscription.offer(event_id, {'id': enrollment_id})
+            return first, await subscription.take(1), await subscription.take(0.01)
+
+        first, behind, idle = async_to_sync(scenario)()
+        merged = {'id': 7, 'student_id': 3, 'progress_percentage': 40, 'last_lesson_id': 5}
+        self.assertEqual(first, (2, False, [merged]))
+        self.assertEqual(behind, (5, True, []))
+        self.assertIsNone(idle)
+
+    def test_stream_pushes_the_course_changes(self):
+        async def scenario():
+            stream = streams.course_progress(self.course.pk)
+            chunks = [await stream.__anext__()]
+            # Both events are read in one poll and sent as one message.
+            await sync_to_async(self.progress)(self.other, 90)
+            await sync_to_async(self.progress)(self.course, 40, 80)
+            while len(chunks) < 3:
+                chunks.append(await asyncio.wait_for(stream.__anext__(), 5))
+            hub = streams.get_hub()
+            await stream.aclose()
+            return chunks, dict(hub.subscribers)
+
+        (ready, changes, idle), subscribers = async_to_sync(scenario)()
+        self.assertEqual(ready, b'event: ready\ndata: {"course":%d}\n\n' % self.course.pk)
+        event = OutboxEvent.objects.filter(kind='enrollment.progress').latest('pk')
+        head, data = changes.decode().rsplit('data: ', 1)
+        self.assertEqual(head, f"event: enrollment\nid: {event.pk}\n")
+        self.assertEqual(json.loads(data), {
+            'id': self.enrollment.pk, 'student_id': self.student.pk, 'progress_percentage': 80,
+        })
+        self.assertEqual(idle, streams.HEARTBEAT)
+        self.assertEqual(subscribers, {})
+
+    def test_only_the_instructor_may_subscribe(self):
+        def status_code(user, pk, factory=AsyncRequestFactory()):
+            headers = {'Authorization': f"Bearer {get_tokens_for_user(user)['access']}"} if user else {}
+            request = factory.get(f'/api/courses/{pk}/progress/stream/', headers=headers)
+            response = async_to_sync(AsyncCourseProgressStreamView.as_view())(request, pk=pk)
+            return response.status_code
+
+        self.assertEqual(status_code(None, self.course.pk), 401)
+        self.assertEqual(status_code(self.student, self.course.pk), 403)
+        self.assertEqual(status_code(self.instructor, 999), 404)
+        response = async_to_sync(AsyncCourseProgressStreamView.as_view())(AsyncRequestFactory().post('/'), pk=1)
+        self.assertEqual(response.status_code, 405)
+        # A WSGI server would never send the stream.
+        self.assertEqual(status_code(self.instructor, self.course.pk, RequestFactory()), 501)
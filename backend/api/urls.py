@@ -1,10 +1,18 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from api.views.user_views import UserViewSet, ProfileViewSet
 from api.views.user_views import CurrentUserView, CurrentUserProfileView
 from api.views.auth_views import RegisterView, LoginView, LogoutView
-from api.views.course_views import CourseViewSet, LessonViewSet, EnrollmentViewSet
+from api.views.course_views import CourseViewSet, CourseLessonViewSet, LessonViewSet, EnrollmentViewSet
+from api.views.dashboard_views import DashboardView
+from api.views.diagnostics_views import SlowQueryLogView
+from api.views.async_views import (
+    AsyncCourseListView, AsyncCourseDetailView, AsyncCourseOutlineView, AsyncCurrentUserView,
+    AsyncCourseProgressStreamView,
+)
 
 router = DefaultRouter()
 
@@ -12,6 +20,7 @@ router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='users')
 router.register(r'profiles', ProfileViewSet, basename='profiles')
 router.register(r'courses', CourseViewSet, basename='courses')
+router.register(r'courses/(?P<course_pk>\d+)/lessons', CourseLessonViewSet, basename='course-lessons')
 router.register(r'lessons', LessonViewSet, basename='lessons')
 router.register(r'enrollments', EnrollmentViewSet, basename='enrollments')
 
@@ -20,10 +29,37 @@ urlpatterns = [
     path('', include(router.urls)),
     path('user/', CurrentUserView.as_view(), name='current-user'),
     path('profile/', CurrentUserProfileView.as_view(), name='current-user-profile'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
 
     # Authentication endpoints
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
+
+    # Diagnostics (admin only)
+    path('diagnostics/slow-queries/', SlowQueryLogView.as_view(), name='slow-queries'),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Native async GET handlers for the hot read paths (serve learnhub_api.asgi);
+    # other methods on these routes fall back to the DRF views.
+    urlpatterns = [
+        re_path(r'^courses/$', csrf_exempt(AsyncCourseListView.as_view(
+            fallback=CourseViewSet.as_view({'get': 'list', 'post': 'create'})
+        )), name='courses-list-async'),
+        re_path(r'^courses/(?P<pk>[^/.]+)/$', csrf_exempt(AsyncCourseDetailView.as_view(
+            fallback=CourseViewSet.as_view({
+                'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+            })
+        )), name='courses-detail-async'),
+        re_path(r'^courses/(?P<pk>[^/.]+)/outline/$', csrf_exempt(AsyncCourseOutlineView.as_view(
+            fallback=CourseViewSet.as_view({'get': 'outline'})
+        )), name='courses-outline-async'),
+        path('user/', csrf_exempt(AsyncCurrentUserView.as_view(
+            fallback=CurrentUserView.as_view()
+        )), name='current-user-async'),
+        # Live enrollment changes over Server-Sent Events; GET only.
+        path('courses/<int:pk>/progress/stream/', csrf_exempt(AsyncCourseProgressStreamView.as_view()),
+             name='course-progress-stream'),
+    ] + urlpatterns
@@ -0,0 +1,244 @@
+"""
+Native async GET handlers for the hot read-only endpoints.
+
+Enabled with ASYNC_READ_VIEWS=true when serving ``learnhub_api.asgi``. Each
+view answers GET/HEAD on the event loop with the async ORM and async cache
+calls, producing the same payloads as the DRF views, and hands every other
+method to the regular DRF view. The course progress stream has no DRF
+equivalent and answers 501 when not served through ASGI.
+"""
+import math
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from api.db_router import ais_pinned_to_primary, replica_aliases, replica_reads
+from api.facets import facet_counts
+from api.instrumentation import timed
+from api.models.course import Course, Lesson
+from api.models.user import User
+from api.serializers.course_serializers import CourseListSerializer, CourseSerializer, LessonOutlineSerializer
+from api.serializers.user_serializers import UserSerializer
+from api.streams import course_progress
+from api.views.course_views import CourseViewSet
+from api.views.user_views import USER_CACHE_KEY, CACHE_TTL
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    with timed('render'):
+        content = renderer.render(data)
+    return HttpResponse(content, status=status_code, content_type=renderer.media_type, headers=headers)
+
+
+async def authenticate(request):
+    """
+    Async equivalent of JWTAuthentication: validates the bearer token and loads
+    the user (with profile) through the async ORM.
+    """
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return AnonymousUser()
+
+    token = authenticator.get_validated_token(raw_token)
+    try:
+        user = await User.objects.select_related('profile').aget(
+            **{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]}
+        )
+    except (KeyError, User.DoesNotExist):
+        raise exceptions.AuthenticationFailed("User not found", code="user_not_found")
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed("User is inactive", code="user_inactive")
+    return user
+
+
+async def read_database(user):
+    """Replica reads for the request unless the user is pinned to the primary."""
+    if not replica_aliases():
+        return nullcontext()
+    if user.is_authenticated and await ais_pinned_to_primary(user.pk):
+        return nullcontext()
+    return replica_reads()
+
+
+def release_connection():
+    """Closes the calling thread's database connection, unless a test transaction holds it."""
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+class AsyncReadView(View):
+    """
+    Serves GET/HEAD natively on the event loop and passes other methods to
+    ``fallback``, the DRF view that owns the route.
+    """
+    fallback = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(self.fallback)(request, *args, **kwargs)
+        if not hasattr(self, 'get'):
+            return self.http_method_not_allowed(request, *args, **kwargs)
+        try:
+            user = await authenticate(request)
+            return await self.get(request, user, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    def handle_exception(self, exc):
+        headers = None
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            headers = {'WWW-Authenticate': JWTAuthentication().authenticate_header(None)}
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return render(data, exc.status_code, headers)
+
+    def catalog_view(self, request, user, action):
+        """A CourseViewSet bound to this request, for its visibility rules and filters."""
+        drf_request = Request(request)
+        drf_request.user = user
+        return CourseViewSet(request=drf_request, action=action, format_kwarg=None, args=(), kwargs={})
+
+    async def get_course(self, queryset, pk):
+        try:
+            return await queryset.aget(pk=pk)
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise exceptions.NotFound("No Course matches the given query.")
+
+
+class AsyncCourseListView(AsyncReadView):
+    """GET /api/courses/ with the same filters, search, ordering and pagination."""
+
+    async def get(self, request, user):
+        view = self.catalog_view(request, user, 'list')
+        filtered = view.filter_queryset(view.get_queryset())
+        queryset = filtered.prefetch_related(
+            Prefetch('lessons', queryset=Lesson.objects.only('id', 'course_id'))
+        )
+        page_size = api_settings.PAGE_SIZE
+        facets = None
+        with await read_database(user):
+            count = await queryset.acount()
+            page = self.page_number(request, count, page_size)
+            offset = (page - 1) * page_size
+            courses = [course async for course in queryset[offset:offset + page_size]]
+            if request.GET.get('facets', '').lower() == 'true':
+                facets = await sync_to_async(facet_counts)(filtered)
+
+        serializer = CourseListSerializer(courses, many=True, context={'request': view.request})
+        url = request.build_absolute_uri()
+        return render({
+            'count': count,
+            'next': replace_query_param(url, 'page', page + 1) if offset + page_size < count else None,
+            'previous': self.previous_link(url, page),
+            'results': serializer.data,
+            **({'facets': facets} if facets is not None else {}),
+        })
+
+    def page_number(self, request, count, page_size):
+        last_page = max(1, math.ceil(count / page_size))
+        page = request.GET.get('page', 1)
+        if page == 'last':
+            return last_page
+        try:
+            page = int(page)
+        except (TypeError, ValueError):
+            raise exceptions.NotFound("Invalid page.")
+        if not 1 <= page <= last_page:
+            raise exceptions.NotFound("Invalid page.")
+        return page
+
+    def previous_link(self, url, page):
+        if page == 1:
+            return None
+        if page == 2:
+            return remove_query_param(url, 'page')
+        return replace_query_param(url, 'page', page - 1)
+
+
+class AsyncCourseDetailView(AsyncReadView):
+    """GET /api/courses/{id}/ with instructor, profile and lessons loaded up front."""
+
+    async def get(self, request, user, pk):
+        view = self.catalog_view(request, user, 'retrieve')
+        # get_queryset() prefetches the lessons with their text.
+        queryset = view.get_queryset().select_related('instructor__profile')
+        with await read_database(user):
+            course = await self.get_course(queryset, pk)
+        return render(CourseSerializer(course, context={'request': view.request}).data)
+
+
+class AsyncCourseOutlineView(AsyncReadView):
+    """GET /api/courses/{id}/outline/"""
+
+    async def get(self, request, user, pk):
+        view = self.catalog_view(request, user, 'outline')
+        with await read_database(user):
+            course = await self.get_course(view.get_queryset().select_related(None).only('id'), pk)
+            lessons = [
+                lesson async for lesson in course.lessons.only(
+                    'id', 'course_id', 'title', 'order', 'lesson_type', 'video_duration'
+                )
+            ]
+        return render(LessonOutlineSerializer(lessons, many=True).data)
+
+
+class AsyncCurrentUserView(AsyncReadView):
+    """GET /api/user/, sharing its cache entries with CurrentUserView."""
+
+    async def get(self, request, user):
+        if not user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        cache_key = f"{USER_CACHE_KEY}_{user.id}"
+        cached_data = await cache.aget(cache_key)
+        if cached_data:
+            return render(cached_data)
+        data = UserSerializer(user).data
+        await cache.aset(cache_key, data, timeout=CACHE_TTL)
+        return render(data)
+
+
+class AsyncCourseProgressStreamView(AsyncReadView):
+    """
+    GET /api/courses/{id}/progress/stream/: the course's enrollment changes as
+    Server-Sent Events, for its instructor (see api/streams.py). Only served
+    by ``learnhub_api.asgi``: a WSGI server would buffer the endless stream in
+    a thread instead of sending it.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        if not isinstance(request, ASGIRequest):
+            return render({'detail': "Progress streams need the ASGI server (learnhub_api.asgi)."},
+                          status.HTTP_501_NOT_IMPLEMENTED)
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request, user, pk):
+        if not user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        course = await self.get_course(Course.objects.only('id', 'instructor_id'), pk)
+        if course.instructor_id != user.pk:
+            raise exceptions.PermissionDenied("You don't have permission to view students for this course.")
+        # The stream never queries again but holds its request open for hours.
+        await sync_to_async(release_connection)()
+        response = StreamingHttpResponse(course_progress(course.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keeps nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -6,6 +6,7 @@ from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.cache import cache
 from django.conf import settings
+from django.db import transaction
 from drf_spectacular.utils import extend_schema
 import logging
 
@@ -16,6 +17,7 @@ from api.serializers.user_serializers import (
     LogoutSerializer,
 )
 from api.authentication import get_tokens_for_user
+from api.outbox import record
 
 User = get_user_model()
 CACHE_TTL = getattr(settings, "CACHE_TTL", 300)
@@ -38,21 +40,11 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             try:
-                user = serializer.save()
-
-                # Profile should be created by signal, but ensure it exists
-                from api.models.user import Profile
-
-                try:
-                    profile, created = Profile.objects.get_or_create(user=user)
-                except Exception as profile_error:
-                    logger.warning(
-                        f"Profile creation issue (non-fatal): {str(profile_error)}"
-                    )
-
-                # Refresh user data
-                user.refresh_from_db()
+                with transaction.atomic():
+                    user = serializer.save()
+                    record('user.registered', user_id=user.pk, role=user.role)
 
+                # The post_save signal created the profile in the same transaction
                 tokens = get_tokens_for_user(user)
 
                 # Use UserSerializer when possible
@@ -1,41 +1,70 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from django.utils import timezone
-from django.db.models import Q
-from drf_spectacular.utils import extend_schema
-
-from api.models.course import Course, Lesson, Enrollment
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+
+from api.archive import History
+from api.dashboard import invalidate_dashboard
+from api.facets import facet_counts
+from api.outbox import record
+from api.tasks import defer_profile_counts
+from api.models.course import ArchivedEnrollment, Course, Lesson, Enrollment
 from api.serializers.course_serializers import (
     CourseSerializer, CourseCreateSerializer, CourseListSerializer,
-    LessonSerializer, LessonCreateSerializer,
-    EnrollmentSerializer, EnrollmentCreateSerializer
+    LessonSerializer, LessonCreateSerializer, LessonOutlineSerializer,
+    EnrollmentSerializer, EnrollmentCreateSerializer, EnrollmentHistorySerializer,
+    LessonCompletionSerializer, LessonProgressSerializer
 )
+from api.serializers.fast_serializers import FastListMixin, compile_serializer
 from api.permissions import IsInstructor, IsCourseOwner
+from api.progress import (
+    complete_lesson, completed_positions, course_lessons, lesson_completion_counts, mark_completed, progress_percentage,
+)
+from api.db_router import ReplicaReadMixin
+
+
+def course_visibility(user, prefix=''):
+    """
+    The courses ``user`` may read, as a Q on Course (or on a relation to it,
+    through ``prefix``): published courses, plus an instructor's own.
+    """
+    published = Q(**{f'{prefix}status': 'published'})
+    if user.is_authenticated and user.role == 'instructor':
+        return published | Q(**{f'{prefix}instructor': user})
+    return published
 
 
 @extend_schema(tags=["Courses"])
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing courses.
     - List/Retrieve: Anyone can view published courses
     - Create: Only instructors
     - Update/Delete: Only course owner
+    - Safe requests (catalog, detail, roster) read from a replica when configured
+    - The catalog list uses the values-based serializer when FAST_READ_SERIALIZERS is on
+    - Trending/Popular: published courses by time-decayed score (see api/rankings.py)
+    - ?facets=true adds counts per category, level, featured flag and price bucket
     """
     queryset = Course.objects.all()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'level', 'category', 'is_featured']
     search_fields = ['title', 'description', 'category']
-    ordering_fields = ['created_at', 'price', 'enrolled_students_count']
+    ordering_fields = ['created_at', 'price', 'enrolled_students_count', 'trending_score', 'popular_score']
     ordering = ['-created_at']
 
     def get_serializer_class(self):
         if self.action == 'create' or self.action == 'update' or self.action == 'partial_update':
             return CourseCreateSerializer
-        elif self.action == 'list':
+        elif self.action in ['list', 'trending', 'popular']:
             return CourseListSerializer
         return CourseSerializer
 
@@ -43,10 +72,13 @@ class CourseViewSet(viewsets.ModelViewSet):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'outline', 'recommendations', 'trending', 'popular']:
             permission_classes = [IsAuthenticatedOrReadOnly]
         elif self.action == 'create':
             permission_classes = [IsAuthenticated, IsInstructor]
+        elif self.action in ['enroll', 'my_students']:
+            # Declared on the @action itself
+            return super().get_permissions()
         else:  # update, delete, etc.
             permission_classes = [IsAuthenticated, IsCourseOwner]
         return [permission() for permission in permission_classes]
@@ -59,25 +91,43 @@ class CourseViewSet(viewsets.ModelViewSet):
         """
         queryset = Course.objects.select_related('instructor').all()
 
-        # For unauthenticated users, only show published courses
-        if not self.request.user.is_authenticated:
-            queryset = queryset.filter(status='published')
-        # For students, only show published courses
-        elif self.request.user.role == 'student':
-            queryset = queryset.filter(status='published')
-        # For instructors, show their own courses (draft or published) + all published courses
-        elif self.request.user.role == 'instructor':
-            queryset = queryset.filter(
-                Q(instructor=self.request.user) | Q(status='published')
-            )
+        # Anonymous users and students see published courses, instructors also their own drafts
+        if not self.request.user.is_authenticated or self.request.user.role in ['student', 'instructor']:
+            queryset = queryset.filter(course_visibility(self.request.user))
         # For other roles (admin, etc.), show all courses
         else:
             queryset = queryset.all()
 
+        # Rankings cover the public catalog only
+        if self.action in ['trending', 'popular']:
+            queryset = queryset.filter(status='published')
+        # The detail payload nests every lesson with its text
+        elif self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch('lessons', queryset=Lesson.objects.select_related('body')))
+
         return queryset
 
+    @extend_schema(parameters=[OpenApiParameter(
+        'facets', bool, description="Add facet counts for the current search and filters."
+    )])
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets', '').lower() == 'true' and isinstance(response.data, dict):
+            response.data['facets'] = facet_counts(self.filter_queryset(self.get_queryset()))
+        return response
+
     def perform_create(self, serializer):
-        serializer.save(instructor=self.request.user)
+        with transaction.atomic():
+            course = serializer.save(instructor=self.request.user)
+            record('course.created', course_id=course.pk, instructor_id=course.instructor_id, status=course.status)
+
+    def perform_update(self, serializer):
+        previous = serializer.instance.status
+        with transaction.atomic():
+            course = serializer.save()
+            if course.status != previous:
+                record('course.status_changed', course_id=course.pk, instructor_id=course.instructor_id,
+                       previous=previous, status=course.status)
 
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsInstructor])
     def my_students(self, request, pk=None):
@@ -95,6 +145,69 @@ class CourseViewSet(viewsets.ModelViewSet):
         serializer = EnrollmentSerializer(enrollments, many=True)
         return Response(serializer.data)
 
+    @extend_schema(responses=LessonOutlineSerializer(many=True))
+    @action(detail=True, methods=['get'])
+    def outline(self, request, pk=None):
+        """
+        Lesson titles and order for a course, without lesson content.
+        """
+        course = self.get_object()
+        lessons = course.lessons.only('id', 'course_id', 'title', 'order', 'lesson_type', 'video_duration')
+        serializer = LessonOutlineSerializer(lessons, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(responses=CourseListSerializer(many=True))
+    @action(detail=True, methods=['get'])
+    def recommendations(self, request, pk=None):
+        """
+        Published courses most often taken by this course's students, best
+        first; empty until `manage.py build_recommendations` has run.
+        """
+        if not str(pk).isdigit():
+            raise NotFound()
+        # One query on the (course, rank) index, without loading the course itself.
+        queryset = Course.objects.filter(
+            status='published', recommended_by__course_id=pk
+        ).select_related('instructor').order_by('recommended_by__rank')
+        if getattr(settings, 'FAST_READ_SERIALIZERS', False):
+            compiled = compile_serializer(CourseListSerializer)
+            return Response(compiled.to_representation(compiled.project(queryset)))
+        return Response(CourseListSerializer(queryset, many=True).data)
+
+    @extend_schema(responses=CourseListSerializer(many=True))
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """
+        Published courses by recent enrollments, completions and progress
+        (48-hour half-life by default); accepts the list filters.
+        """
+        return self.ranked(request, 'trending_score')
+
+    @extend_schema(responses=CourseListSerializer(many=True))
+    @action(detail=False, methods=['get'])
+    def popular(self, request):
+        """
+        Published courses by the same activity over a longer horizon (30-day
+        half-life by default); accepts the list filters.
+        """
+        return self.ranked(request, 'popular_score')
+
+    def ranked(self, request, field):
+        # Matches the (status, -score, -id) index, so the page is an index scan.
+        self.ordering = [f'-{field}', '-id']
+        return self.list(request)
+
+    @action(detail=True, methods=['get'])
+    def lesson_completion(self, request, pk=None):
+        """
+        How many enrolled students finished each lesson (course owner only).
+        """
+        course = self.get_object()
+        lessons = list(course.lessons.order_by('order', 'id').values('id', 'title', 'order'))
+        for lesson, completed in zip(lessons, lesson_completion_counts(course.pk, len(lessons))):
+            lesson['completed'] = completed
+        return Response(lessons)
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def enroll(self, request, pk=None):
         """
@@ -108,33 +221,42 @@ class CourseViewSet(viewsets.ModelViewSet):
 
         course = self.get_object()
 
-        # Check if already enrolled
-        enrollment, created = Enrollment.objects.get_or_create(
-            student=request.user,
-            course=course,
-            defaults={'status': 'active'}
-        )
-
-        if not created:
-            return Response(
-                {"detail": "You are already enrolled in this course."},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            # Check if already enrolled
+            enrollment, created = Enrollment.objects.get_or_create(
+                student=request.user,
+                course=course,
+                defaults={'status': 'active'}
             )
 
-        # Update counts
-        course.enrolled_students_count += 1
-        course.save()
+            if not created:
+                return Response(
+                    {"detail": "You are already enrolled in this course."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # A completion moved to the archive still counts; checked after the
+            # insert so an enrollment archived meanwhile is seen.
+            if ArchivedEnrollment.objects.filter(student=request.user, course=course, status='completed').exists():
+                transaction.set_rollback(True)
+                return Response(
+                    {"detail": "You have already completed this course."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        if hasattr(request.user, 'profile'):
-            request.user.profile.enrolled_courses_count += 1
-            request.user.profile.save()
+            # Update counts; the student's profile is recounted in the background
+            course.enrolled_students_count += 1
+            course.save(update_fields=['enrolled_students_count', 'updated_at'])
+            defer_profile_counts(request.user.pk)
+
+            record('enrollment.created', enrollment_id=enrollment.pk, student_id=request.user.pk, course_id=course.pk)
 
         serializer = EnrollmentSerializer(enrollment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 @extend_schema(tags=["Lessons"])
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing lessons within courses.
     - List/Retrieve: Anyone can view lessons of published courses
@@ -161,20 +283,10 @@ class LessonViewSet(viewsets.ModelViewSet):
         """
         Filter lessons by course visibility
         """
-        queryset = Lesson.objects.select_related('course', 'course__instructor').all()
-
-        # Filter out lessons from unpublished courses for non-owners
-        if not self.request.user.is_authenticated:
-            queryset = queryset.filter(course__status='published')
-        elif self.request.user.role != 'instructor':
-            queryset = queryset.filter(course__status='published')
-        elif self.request.user.role == 'instructor':
-            # Instructors can see lessons from their own courses or published courses
-            queryset = queryset.filter(
-                course__instructor=self.request.user
-            ) | Lesson.objects.filter(course__status='published')
-
-        return queryset
+        # One predicate on the joined course: published, or the instructor's own
+        return Lesson.objects.select_related('course', 'course__instructor', 'body').filter(
+            course_visibility(self.request.user, prefix='course__')
+        )
 
     def perform_create(self, serializer):
         course = serializer.validated_data['course']
@@ -184,8 +296,29 @@ class LessonViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
+@extend_schema(tags=["Lessons"], parameters=[OpenApiParameter('course_pk', int, OpenApiParameter.PATH)])
+class CourseLessonViewSet(LessonViewSet):
+    """
+    Lessons of one course, in order, at /api/courses/{course_pk}/lessons/.
+    - Visibility is checked once on the course (404 when hidden)
+    - Lessons are then read by the (course, order) index, without joining courses
+    - Read-only: lessons are created and edited through /api/lessons/
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    def get_course(self):
+        if not hasattr(self, '_course'):
+            self._course = get_object_or_404(
+                Course.objects.filter(course_visibility(self.request.user)).only('id'), pk=self.kwargs['course_pk']
+            )
+        return self._course
+
+    def get_queryset(self):
+        return Lesson.objects.filter(course_id=self.get_course().pk).select_related('body').order_by('order', 'id')
+
+
 @extend_schema(tags=["Enrollments"])
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing student enrollments.
     - List: Students see their own enrollments
@@ -215,12 +348,35 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         return EnrollmentSerializer
 
     def perform_create(self, serializer):
-        serializer.save(student=self.request.user)
+        with transaction.atomic():
+            enrollment = serializer.save(student=self.request.user)
+            record('enrollment.created', enrollment_id=enrollment.pk, student_id=enrollment.student_id,
+                   course_id=enrollment.course_id)
+
+    @extend_schema(responses=EnrollmentHistorySerializer(many=True))
+    @action(detail=False, methods=['get'], filter_backends=[])
+    def history(self, request):
+        """
+        Current and archived enrollments, newest first, with the list's visibility.
+        """
+        if request.user.role == 'student':
+            enrollments = History(student=request.user)
+        elif request.user.role == 'instructor':
+            enrollments = History(course__instructor=request.user)
+        else:
+            enrollments = []
+        page = self.paginate_queryset(enrollments)
+        if page is None:
+            return Response(EnrollmentHistorySerializer(enrollments[:], many=True).data)
+        return self.get_paginated_response(EnrollmentHistorySerializer(page, many=True).data)
 
     @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated])
     def update_progress(self, request, pk=None):
         """
-        Update enrollment progress (students only).
+        Recompute enrollment progress from the finished lessons (students only);
+        reaching 100% completes the enrollment. Progress is not taken from the
+        request: lessons are finished through complete_lesson. Enrollments from
+        before per-lesson tracking keep their stored percentage.
         """
         enrollment = self.get_object()
 
@@ -230,26 +386,52 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        progress = request.data.get('progress_percentage', 0)
-        if progress < 0 or progress > 100:
+        lesson_count = Lesson.objects.filter(course_id=enrollment.course_id).count()
+        with transaction.atomic():
+            enrollment = Enrollment.objects.select_for_update().get(pk=enrollment.pk)
+            if enrollment.completed_lessons:
+                enrollment.progress_percentage = progress_percentage(enrollment.completed_lessons, lesson_count)
+            enrollment.save(update_fields=['progress_percentage', 'last_accessed'])
+            record('enrollment.progress', enrollment_id=enrollment.pk, student_id=enrollment.student_id,
+                   course_id=enrollment.course_id, progress_percentage=enrollment.progress_percentage)
+            if enrollment.progress_percentage >= 100:
+                mark_completed(enrollment)
+        serializer = EnrollmentSerializer(enrollment)
+        return Response(serializer.data)
+
+    @extend_schema(request=LessonCompletionSerializer, responses=LessonProgressSerializer)
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def complete_lesson(self, request, pk=None):
+        """
+        Mark a lesson of the course as finished; progress is derived from the
+        finished lessons and reaching 100% completes the enrollment.
+        """
+        enrollment = self.get_object()
+        if enrollment.student != request.user:
+            return Response(
+                {"detail": "You can only update your own enrollment progress."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if enrollment.status == 'dropped':
             return Response(
-                {"detail": "Progress must be between 0 and 100."},
+                {"detail": "This enrollment was dropped."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = LessonCompletionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lesson = Lesson.objects.filter(
+            pk=serializer.validated_data['lesson'], course_id=enrollment.course_id
+        ).only('id', 'order').first()
+        if lesson is None:
+            return Response(
+                {"detail": "This lesson is not part of the enrolled course."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        enrollment.progress_percentage = progress
-
-        # Auto-update status to completed if progress is 100%
-        if progress >= 100:
-            if enrollment.status != 'completed':
-                enrollment.status = 'completed'
-                enrollment.completed_at = timezone.now()
-
-                # Update student's completed courses count
-                if hasattr(request.user, 'profile'):
-                    request.user.profile.completed_courses_count += 1
-                    request.user.profile.save()
-
-        enrollment.save()
-        serializer = EnrollmentSerializer(enrollment)
-        return Response(serializer.data)
+        complete_lesson(enrollment, lesson)
+        invalidate_dashboard(request.user.pk)
+        lessons = course_lessons(enrollment.course_id)
+        enrollment.completed_lesson_ids = [
+            lessons[position] for position in completed_positions(enrollment.completed_lessons, len(lessons))
+        ]
+        return Response(LessonProgressSerializer(enrollment).data)
@@ -0,0 +1,22 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from drf_spectacular.utils import extend_schema
+
+from api.dashboard import dashboard
+from api.serializers.course_serializers import DashboardSerializer
+
+
+@extend_schema(tags=["Dashboard"])
+class DashboardView(APIView):
+    """
+    The current user's home page in one request: account, profile and
+    enrollments with course summaries, progress and the next lesson.
+    Costs at most api.dashboard.DASHBOARD_QUERY_BUDGET queries, none when
+    cached.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses=DashboardSerializer)
+    def get(self, request):
+        return Response(dashboard(request.user))
@@ -0,0 +1,26 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework import status
+from drf_spectacular.utils import extend_schema
+
+from api.instrumentation import slow_queries
+from api.permissions import IsAdmin
+
+
+@extend_schema(tags=["Diagnostics"])
+class SlowQueryLogView(APIView):
+    """
+    Most recent slow SQL samples (admin only), newest first.
+    - GET: list the sampled queries with their view, serializer, frame and EXPLAIN plan
+    - DELETE: clear the buffer
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        entries = slow_queries.entries()
+        return Response({"count": len(entries), "results": entries})
+
+    def delete(self, request):
+        slow_queries.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,34 @@
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+from api.middleware import accepted_encoding
+from api.openapi import get_schema
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    OpenAPI schema served from the precomputed build (see api.openapi), with
+    the same YAML/JSON content negotiation as SpectacularAPIView.
+    - Precompressed variants are sent to clients that accept them
+    - Each variant has its own ETag, so unchanged schemas revalidate with a 304
+    - Localized (?lang=) and versioned (?version=) schemas are still generated per request
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('lang') or request.GET.get('version'):
+            return super().get(request, *args, **kwargs)
+
+        version, variants = get_schema()
+        renderer = request.accepted_renderer
+        encoding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        suffix = f"-{encoding}" if encoding else ""
+        response = HttpResponse(variants[(renderer.format, encoding)], content_type=renderer.media_type)
+        response['ETag'] = f'"{version}-{renderer.format}{suffix}"'
+        response['Content-Disposition'] = f'inline; filename="{self._get_filename(request, None)}"'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
@@ -1,11 +1,14 @@
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
 from api.models.user import User, Profile
-from api.serializers.user_serializers import UserSerializer, ProfileSerializer
+from api.deletion import request_deletion
+from api.models.deletion import AccountDeletion
+from api.serializers.user_serializers import AccountDeletionSerializer, UserSerializer, ProfileSerializer
 from api.permissions import IsAdmin
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.decorators import action
 from django.core.cache import cache
 from django.conf import settings
 from django_filters.rest_framework import DjangoFilterBackend
@@ -45,12 +48,13 @@ class CurrentUserView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(responses={202: AccountDeletionSerializer})
     def delete(self, request):
-        user_id = request.user.id
-        request.user.delete()
-        cache.delete(f"{USER_CACHE_KEY}_{user_id}")
-        cache.delete(f"{PROFILE_CACHE_KEY}_{user_id}")
-        return Response({"detail": "User account deleted."}, status=status.HTTP_204_NO_CONTENT)
+        # The account is deactivated now; its data is deleted in the background
+        deletion = request_deletion(request.user)
+        cache.delete(f"{USER_CACHE_KEY}_{request.user.id}")
+        cache.delete(f"{PROFILE_CACHE_KEY}_{request.user.id}")
+        return Response(AccountDeletionSerializer(deletion).data, status=status.HTTP_202_ACCEPTED)
 
 
 @extend_schema(tags=["Profiles"])
@@ -126,9 +130,24 @@ class UserViewSet(ModelViewSet):
         self.clear_cache()
         return response
 
-    def perform_destroy(self, instance):
-        instance.delete()
+    @extend_schema(responses={202: AccountDeletionSerializer})
+    def destroy(self, request, *args, **kwargs):
+        # The account is deactivated now; its data is deleted in the background
+        user = self.get_object()
+        deletion = request_deletion(user)
+        cache.delete(f"{USER_CACHE_KEY}_{user.pk}")
+        cache.delete(f"{PROFILE_CACHE_KEY}_{user.pk}")
         self.clear_cache()
+        return Response(AccountDeletionSerializer(deletion).data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(responses=AccountDeletionSerializer(many=True))
+    @action(detail=False, methods=['get'], filter_backends=[])
+    def deletions(self, request):
+        """
+        Requested account deletions and their progress, newest first.
+        """
+        page = self.paginate_queryset(AccountDeletion.objects.all())
+        return self.get_paginated_response(AccountDeletionSerializer(page, many=True).data)
 
     def clear_cache(self):
         # Clear all user-related cache entries
@@ -0,0 +1,211 @@
+"""
+Cache warming after a deploy.
+
+``warm()`` fills the caches that the first wave of traffic would otherwise
+fill all at once:
+
+- the OpenAPI schema (api/openapi.py)
+- catalog pages, replayed through the middleware stack: the course list in
+  each ordering, the rankings and the busiest categories, with facets, plus
+  the detail and outline of the most enrolled courses. This fills the facet
+  cache and the compressed bodies for every encoding. Students see the
+  anonymous catalog; each recently active instructor gets their own.
+- per-user caches of the most recently active users: /api/user/, the
+  profile and, for students, the dashboard
+
+Targets run on CACHE_WARM_CONCURRENCY threads. Targets not started within
+CACHE_WARM_BUDGET_SECONDS are skipped. In a cache with a size limit (a
+LocMemCache's MAX_ENTRIES), warming fills at most WARM_SHARE of it, with
+fewer courses and users if need be: a full cache culls what was just
+warmed and the keys the app depends on. A shared cache (Redis, Memcached)
+warmed by ``manage.py warm_caches`` serves every process. A LocMemCache
+belongs to one process, so it has to be warmed inside the serving process
+at boot (CACHE_WARM_ON_BOOT).
+"""
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.handlers.base import BaseHandler
+from django.db import connections
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.dashboard import dashboard
+from api.middleware import COMPRESSED_CACHE, ENCODERS
+from api.models.course import Course
+from api.models.user import User
+from api.openapi import get_schema
+
+logger = logging.getLogger(__name__)
+
+CATALOG_ORDERINGS = ['-created_at', 'price', '-price', '-enrolled_students_count']
+CATALOG_CATEGORIES = 10
+WARM_SHARE = 0.5
+
+Target = namedtuple('Target', 'kind label run')
+Report = namedtuple('Report', 'keys by_kind skipped failed seconds')
+
+
+class Replayer:
+    """Sends GET requests through the full middleware stack, without a server."""
+
+    def __init__(self):
+        self.handler = BaseHandler()
+        self.handler.load_middleware()
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+        self.factory = RequestFactory(HTTP_HOST=host)
+
+    def get(self, path, user=None):
+        """Requests ``path`` once per encoding; returns how many cache entries that leaves behind."""
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {AccessToken.for_user(user)}"} if user else {}
+        keys = 0
+        for encoding in ENCODERS:
+            response = self.handler.get_response(self.factory.get(path, HTTP_ACCEPT_ENCODING=encoding, **headers))
+            if response.status_code != 200:
+                return keys
+            keys += response.has_header('Content-Encoding')
+        return keys + ('facets=true' in path)
+
+
+def catalog_paths(courses):
+    paths = ['/api/courses/?facets=true', '/api/courses/trending/', '/api/courses/popular/']
+    paths += [f'/api/courses/?ordering={ordering}' for ordering in CATALOG_ORDERINGS]
+    categories = (
+        Course.objects.filter(status='published').exclude(category='').values('category')
+        .annotate(n=Count('pk')).order_by('-n').values_list('category', flat=True)[:CATALOG_CATEGORIES]
+    )
+    paths += [f'/api/courses/?category={category}&facets=true' for category in categories]
+    busiest = Course.objects.filter(status='published').order_by('-enrolled_students_count', '-id')
+    for pk in busiest.values_list('pk', flat=True)[:courses]:
+        paths += [f'/api/courses/{pk}/', f'/api/courses/{pk}/outline/']
+    return paths
+
+
+def warm_user(user):
+    from api.serializers.user_serializers import ProfileSerializer, UserSerializer
+    from api.views.user_views import PROFILE_CACHE_KEY, USER_CACHE_KEY
+
+    keys = 0
+    entries = [(f"{USER_CACHE_KEY}_{user.pk}", lambda: UserSerializer(user).data)]
+    if hasattr(user, 'profile'):
+        entries.append((f"{PROFILE_CACHE_KEY}_{user.pk}", lambda: ProfileSerializer(user.profile).data))
+    for key, build in entries:
+        if cache.get(key) is None:
+            cache.set(key, build(), timeout=settings.CACHE_TTL)
+        keys += 1
+    if user.role == 'student':
+        dashboard(user)
+        keys += 1
+    return keys
+
+
+def targets(courses, users):
+    replayer = Replayer()
+    yield Target('schema', 'openapi', lambda: len(get_schema()[1]))
+    for path in catalog_paths(courses):
+        yield Target('catalog', path, lambda path=path: replayer.get(path))
+    active = list(
+        User.objects.filter(is_active=True, last_login__isnull=False).select_related('profile')
+        .order_by('-last_login')[:users]
+    )
+    for user in active:
+        if user.role == 'instructor':
+            # Instructors also see their own drafts, so their catalog is their own.
+            yield Target('catalog', f'/api/courses/?facets=true ({user.username})',
+                         lambda user=user: replayer.get('/api/courses/?facets=true', user))
+    for user in active:
+        yield Target('users', user.username, lambda user=user: warm_user(user))
+
+
+def capacity(alias):
+    """How many entries the cache ``alias`` holds before culling, or None if it has no such limit."""
+    backend = caches[alias]
+    return backend._max_entries if isinstance(backend, LocMemCache) else None
+
+
+def fit(courses, users):
+    """(courses, users), trimmed so warming fills at most WARM_SHARE of each size-limited cache."""
+    default = capacity('default')
+    if default is not None:
+        # The user, profile and dashboard (or instructor catalog facets) keys, after the catalog facets.
+        users = min(users, max(int(default * WARM_SHARE) - CATALOG_CATEGORIES - 1, 0) // 3)
+    compressed = capacity(COMPRESSED_CACHE)
+    if compressed is not None:
+        # One body per encoding for each page: the fixed catalog pages, each
+        # instructor's catalog, then a detail and an outline per course.
+        pages = int(compressed * WARM_SHARE) // len(ENCODERS) - 3 - len(CATALOG_ORDERINGS) - CATALOG_CATEGORIES
+        courses = min(courses, max(pages - users, 0) // 2)
+    return courses, users
+
+
+def run(target):
+    try:
+        return target.run()
+    finally:
+        # Worker threads must not keep their connections open.
+        connections.close_all()
+
+
+def warm(courses=None, users=None, concurrency=None, budget=None):
+    """Warms the caches within ``budget`` seconds and returns a Report."""
+    courses = settings.CACHE_WARM_COURSES if courses is None else courses
+    users = settings.CACHE_WARM_USERS if users is None else users
+    concurrency = concurrency or settings.CACHE_WARM_CONCURRENCY
+    budget = settings.CACHE_WARM_BUDGET_SECONDS if budget is None else budget
+    fitted = fit(courses, users)
+    if fitted != (courses, users):
+        logger.info("Warming %s courses and %s users (of %s and %s) to fit the caches", *fitted, courses, users)
+        courses, users = fitted
+    started = time.monotonic()
+    deadline = started + budget
+    by_kind, skipped, failed = Counter(), 0, 0
+    running = {}
+
+    def collect(done):
+        nonlocal failed
+        for future in done:
+            target = running.pop(future)
+            if future.exception() is None:
+                by_kind[target.kind] += future.result()
+            else:
+                failed += 1
+                logger.warning("Warming %s %s failed: %s", target.kind, target.label, future.exception())
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='warm') as pool:
+        for target in targets(courses, users):
+            if time.monotonic() >= deadline:
+                skipped += 1
+                continue
+            while len(running) >= concurrency:
+                done, _ = wait(running, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                if not done and time.monotonic() >= deadline:
+                    break
+                collect(done)
+            if len(running) >= concurrency:
+                skipped += 1
+                continue
+            running[pool.submit(run, target)] = target
+        collect(wait(running).done)
+    return Report(sum(by_kind.values()), dict(by_kind), skipped, failed, time.monotonic() - started)
+
+
+def warm_in_background():
+    """Warms this process's caches on a daemon thread (for CACHE_WARM_ON_BOOT)."""
+    def work():
+        try:
+            report = warm()
+        except Exception:
+            logger.exception("Cache warming failed")
+        else:
+            logger.info("Warmed %s cache keys in %.1fs (%s skipped)", report.keys, report.seconds, report.skipped)
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=work, name='cache-warming', daemon=True).start()
@@ -0,0 +1,123 @@
+"""
+Enrollment archival: latency of the queries on the active path (a
+student's enrollment page, the enrollment uniqueness check, an instructor's
+enrollment count) with every enrollment in one table, then after
+api.archive has moved the old completed and dropped ones out, plus the
+history page that reads both tables.
+
+    python benchmarks/bench_archive.py --enrollments 1000000 --cold-share 0.8
+    DB_ENGINE=django.db.backends.postgresql python benchmarks/bench_archive.py --enrollments 50000000
+
+Data comes from api.seeding in a throwaway test database. ``--cold-share``
+of the enrollments older than ``--days`` are marked completed first, as in
+a long-running deployment where most enrollments are history. The SQLite
+test database lives in memory: run the 50M case on Postgres.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+    import django
+    django.setup()
+
+
+def age(days, share):
+    """Completes ``share`` of the active enrollments older than ``days``, at enrollment time."""
+    from datetime import timedelta
+    from django.db.models import F
+    from django.utils import timezone
+    from api.models.course import Enrollment
+
+    rng = random.Random(0)
+    cutoff = timezone.now() - timedelta(days=days)
+    old = Enrollment.objects.filter(status='active', enrolled_at__lt=cutoff).values_list('pk', flat=True)
+    chosen = [pk for pk in old.iterator(chunk_size=20_000) if rng.random() < share]
+    for start in range(0, len(chosen), 20_000):
+        Enrollment.objects.filter(pk__in=chosen[start:start + 20_000]).update(
+            status='completed', progress_percentage=100, completed_at=F('enrolled_at'),
+        )
+
+
+def p50(function, samples):
+    times = []
+    for sample in samples:
+        started = time.perf_counter()
+        function(*sample)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def active_path(samples):
+    """{query: p50 ms} of the active-path queries over (student, course, instructor) samples."""
+    from api.models.course import Enrollment
+
+    return {
+        'student page': p50(lambda student, course, instructor: list(
+            Enrollment.objects.filter(student_id=student).select_related('course')[:20]
+        ), samples),
+        'enrolled check': p50(lambda student, course, instructor: Enrollment.objects.filter(
+            student_id=student, course_id=course
+        ).exists(), samples),
+        'instructor count': p50(lambda student, course, instructor: Enrollment.objects.filter(
+            course__instructor_id=instructor
+        ).count(), samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--enrollments', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=180, help="Archive after this many days.")
+    parser.add_argument('--cold-share', type=float, default=0.8,
+                        help="Share of the old active enrollments completed before archiving.")
+    parser.add_argument('--samples', type=int, default=500, help="Students timed per query.")
+    parser.add_argument('--batch-size', type=int, default=20_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from api.archive import History, archive
+    from api.models.course import ArchivedEnrollment, Enrollment
+    from api.seeding import Preset, seed
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(Preset(students=max(1, args.enrollments // 10), instructors=max(1, args.enrollments // 5000),
+                    courses=max(1, args.enrollments // 500), lessons=1, enrollments=args.enrollments))
+        age(args.days, args.cold_share)
+        samples = list(
+            Enrollment.objects.values_list('student_id', 'course_id', 'course__instructor_id').order_by('?')
+            [:args.samples]
+        )
+        total = Enrollment.objects.count()
+
+        before = active_path(samples)
+        report = archive(days=args.days, batch_size=args.batch_size, pause=0)
+        after = active_path(samples)
+        history = p50(lambda student, course, instructor: History(student_id=student)[:20], samples)
+
+        print(f"{total:,} enrollments ({connection.vendor}); archived {report.archived:,} in "
+              f"{report.batches} batches, {report.archived / report.seconds:,.0f} rows/s")
+        print(f"hot {Enrollment.objects.count():,}, archived {ArchivedEnrollment.objects.count():,}")
+        print(f"{'p50 ms':<20}{'one table':>12}{'archived':>12}")
+        for query in before:
+            print(f"{query:<20}{before[query]:>12.3f}{after[query]:>12.3f}")
+        print(f"{'history page':<20}{'':>12}{history:>12.3f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
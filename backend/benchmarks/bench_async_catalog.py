@@ -0,0 +1,161 @@
+"""
+Throughput and tail latency of the catalog read path: sync WSGI vs async ASGI.
+
+Starts each server in turn against the database configured through the DB_*
+variables, drives it with a fixed number of concurrent keep-alive clients and
+reports requests/s with p50/p99 latency:
+
+    wsgi   gunicorn learnhub_api.wsgi (sync workers with threads, DRF views)
+    asgi   uvicorn learnhub_api.asgi with ASYNC_READ_VIEWS=true
+
+    pip install gunicorn uvicorn
+    python benchmarks/bench_async_catalog.py --seed-courses 200 --concurrency 256
+
+Run ``migrate`` first. ``--seed-courses`` adds published courses with lessons
+and a student whose token is used for /api/user/.
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PATHS = ['/api/courses/', '/api/courses/?page=2', '/api/courses/{course}/', '/api/courses/{course}/outline/',
+         '/api/user/']
+
+SERVERS = {
+    'wsgi': (['gunicorn', 'learnhub_api.wsgi:application', '--workers', '{workers}', '--threads', '8',
+              '--bind', '127.0.0.1:{port}'], {}),
+    'asgi': (['uvicorn', 'learnhub_api.asgi:application', '--workers', '{workers}', '--port', '{port}',
+              '--no-access-log'], {'ASYNC_READ_VIEWS': 'true'}),
+}
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+    import django
+    django.setup()
+
+
+def seed(courses):
+    """Create a benchmark student plus published courses; returns (token, course id)."""
+    from api.authentication import get_tokens_for_user
+    from api.models.course import Course, Lesson, LessonContent
+    from api.models.user import User
+
+    def user(username, role):
+        existing = User.objects.filter(username=username).first()
+        return existing or User.objects.create_user(
+            username=username, email=f"{username}@bench.local", password='bench-pass-123', role=role
+        )
+
+    instructor, student = user('bench_instructor', 'instructor'), user('bench_student', 'student')
+    existing = Course.objects.filter(instructor=instructor).count()
+    new_courses = Course.objects.bulk_create([
+        Course(title=f"Bench course {i}", slug=f"bench-course-{i}", description='Benchmark course ' * 20,
+               instructor=instructor, status='published', price=i % 50)
+        for i in range(existing, courses)
+    ])
+    body = LessonContent.store('Lesson body ' * 200)
+    Lesson.objects.bulk_create([
+        Lesson(course=course, title=f"Lesson {n}", order=n, body=body)
+        for course in new_courses for n in range(10)
+    ])
+    course = Course.objects.filter(instructor=instructor).order_by('id').first()
+    return get_tokens_for_user(student)['access'], course.id
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/courses/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"server on port {port} did not start")
+
+
+def client(base_url, paths, token, deadline, samples, errors):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    headers = {'Authorization': f"Bearer {token}"}
+    index = 0
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(type(exc).__name__)
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+def load(base_url, paths, token, concurrency, duration):
+    samples, errors = [], []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=client, args=(base_url, paths, token, deadline, samples, errors))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    samples.sort()
+    return {
+        'rps': len(samples) / duration,
+        'p50': statistics.median(samples) if samples else float('nan'),
+        'p99': samples[int(len(samples) * 0.99) - 1] if samples else float('nan'),
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', default='wsgi,asgi')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=128)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--seed-courses', type=int, default=100)
+    args = parser.parse_args()
+
+    setup_django()
+    token, course_id = seed(args.seed_courses)
+    paths = [path.format(course=course_id) for path in PATHS]
+
+    print(f"{'server':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}  (concurrency {args.concurrency})")
+    for name in args.servers.split(','):
+        command, extra_env = SERVERS[name]
+        command = [part.format(workers=args.workers, port=args.port) for part in command]
+        server = subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **extra_env},
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(args.port)
+            result = load(f"http://127.0.0.1:{args.port}", paths, token, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{name:<8}{result['rps']:>10.1f}{result['p50']:>10.2f}{result['p99']:>10.2f}{result['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Request latency of /api/user/ with and without database connection reuse.
+
+Point the DB_* variables at a local Postgres (SQLite connections are too cheap
+to show a difference); the benchmark creates and drops its own test database:
+
+    DB_ENGINE=django.db.backends.postgresql DB_NAME=learnhub DB_USER=postgres \\
+        DB_PASSWORD=postgres python benchmarks/bench_db_pooling.py --requests 1000
+
+Modes:
+    off         CONN_MAX_AGE=0, a new connection per request (previous default)
+    persistent  CONN_MAX_AGE with health checks
+    pool        psycopg 3 connection pool
+
+Connection settings are read once at startup, so each mode runs in a fresh
+interpreter. The test client disconnects ``close_old_connections`` from the
+request signals, so each timed request calls it before and after itself, as
+the request cycle of a real server does: that is where a connection is
+closed (off), kept (persistent) or returned to the pool.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+MODES = {
+    'off': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '600', 'DB_CONN_HEALTH_CHECKS': 'True'},
+    'pool': {'DB_POOL': 'True', 'DB_POOL_MIN_SIZE': '2', 'DB_POOL_MAX_SIZE': '4'},
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def run_mode(requests, warmup):
+    """Runs inside the child interpreter with the mode's environment applied."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+
+    import django
+    django.setup()
+
+    from django.db import close_old_connections, connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from api.authentication import get_tokens_for_user
+    from api.models.user import User
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        user = User.objects.create_user(
+            username='bench', email='bench@example.com', password='bench-pass-123', role='student'
+        )
+        token = get_tokens_for_user(user)['access']
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        samples = []
+        for i in range(warmup + requests):
+            start = time.perf_counter()
+            close_old_connections()
+            response = client.get('/api/user/')
+            close_old_connections()
+            elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200, response.status_code
+            if i >= warmup:
+                samples.append(elapsed)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    return {
+        'vendor': connection.vendor,
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.requests, args.warmup)))
+        return
+
+    print(f"{'mode':<12}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms, {args.requests} requests)")
+    for mode in args.modes.split(','):
+        env = {**os.environ, **MODES[mode]}
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode,
+             '--requests', str(args.requests), '--warmup', str(args.warmup)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if result['vendor'] != 'postgresql':
+            print(f"warning: running against {result['vendor']}, connection setup is nearly free")
+        print(f"{mode:<12}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}"
+              f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
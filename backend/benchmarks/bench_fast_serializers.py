@@ -0,0 +1,102 @@
+"""
+List serialization cost: DRF ModelSerializers over model instances vs the
+compiled values-based serializers, at 20, 100 and 1000 rows per page.
+
+Both sides include the page query, so the numbers are what a list view
+pays between filtering and rendering:
+
+    python benchmarks/bench_fast_serializers.py --rows 20,100,1000
+
+Data is seeded into a throwaway test database; each compiled result is
+checked against the DRF output before it is timed.
+"""
+import argparse
+import os
+import sys
+import timeit
+from decimal import Decimal
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+    import django
+    django.setup()
+
+
+def seed(rows):
+    """``rows`` courses (5 lessons each), lessons and enrollments for one student."""
+    from api.models.course import Course, Enrollment, Lesson, LessonContent
+    from api.models.user import User
+
+    instructor = User.objects.create_user(username='bench_instructor', email='instructor@bench.local',
+                                          password='bench-pass-123', role='instructor')
+    student = User.objects.create_user(username='bench_student', email='student@bench.local',
+                                       password='bench-pass-123', role='student')
+    courses = Course.objects.bulk_create([
+        Course(title=f"Course {i}", slug=f"course-{i}", description='Course description. ' * 20,
+               instructor=instructor, category='data', status='published', price=Decimal(i % 50) + Decimal('0.99'))
+        for i in range(rows)
+    ])
+    body = LessonContent.store('Lesson body. ' * 50)
+    Lesson.objects.bulk_create([
+        Lesson(course=course, title=f"Lesson {n}", order=n, body=body, resources=[{'n': n}])
+        for course in courses for n in range(5)
+    ])
+    Enrollment.objects.bulk_create([Enrollment(student=student, course=course) for course in courses])
+
+
+def cases(rows):
+    from api.models.course import Course, Enrollment, Lesson
+    from api.serializers import CourseListSerializer, EnrollmentSerializer, LessonSerializer
+
+    return [
+        ('courses', CourseListSerializer, Course.objects.select_related('instructor').order_by('id')[:rows]),
+        ('enrollments', EnrollmentSerializer, Enrollment.objects.order_by('id')[:rows]),
+        ('lessons', LessonSerializer, Lesson.objects.order_by('id')[:rows]),
+    ]
+
+
+def best_of(function, number, repeat=5):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='20,100,1000')
+    parser.add_argument('--number', type=int, default=10)
+    args = parser.parse_args()
+    page_sizes = [int(n) for n in args.rows.split(',')]
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from api.serializers.fast_serializers import compile_serializer
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(max(page_sizes))
+        print(f"{'serializer':<14}{'rows':>6}{'drf ms':>10}{'fast ms':>10}{'speedup':>9}")
+        for rows in page_sizes:
+            for name, serializer_class, queryset in cases(rows):
+                compiled = compile_serializer(serializer_class)
+
+                def drf():
+                    return serializer_class(queryset.all(), many=True).data
+
+                def fast():
+                    return compiled.to_representation(compiled.project(queryset.all()))
+
+                assert fast() == drf(), f"{name}: output differs"
+                drf_ms, fast_ms = best_of(drf, args.number), best_of(fast, args.number)
+                print(f"{name:<14}{rows:>6}{drf_ms:>10.2f}{fast_ms:>10.2f}{drf_ms / fast_ms:>8.1f}x")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Serialization cost of realistic course payloads: DRF's JSONRenderer vs
+FastJSONRenderer, and JSONParser vs FastJSONParser.
+
+Payloads come from the real serializers over courses seeded into a throwaway
+test database:
+
+    python benchmarks/bench_json_rendering.py --courses 20,100,1000 --lessons 12
+
+Every payload is checked to render to identical bytes before it is timed.
+"""
+import argparse
+import io
+import os
+import sys
+import timeit
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+    import django
+    django.setup()
+
+
+def payloads(courses, lessons):
+    """Paginated course list, detail pages with nested lessons and an enrollment list."""
+    from decimal import Decimal
+    from api.models.course import Course, Enrollment, Lesson, LessonContent
+    from api.models.user import User
+    from api.serializers import CourseListSerializer, CourseSerializer, EnrollmentSerializer
+
+    Course.objects.all().delete()
+    instructor = User.objects.get_or_create(username='bench_instructor', defaults={
+        'email': 'instructor@bench.local', 'first_name': 'Zoë', 'role': 'instructor'})[0]
+    student = User.objects.get_or_create(username='bench_student', defaults={
+        'email': 'student@bench.local', 'role': 'student'})[0]
+    new_courses = Course.objects.bulk_create([
+        Course(title=f"Course {i}: Données & \"analysis\"", slug=f"course-{i}",
+               description='Learn data analysis step by step. ' * 20, instructor=instructor, category='data',
+               status='published', price=Decimal(i % 50) + Decimal('0.99'), enrolled_students_count=i * 3)
+        for i in range(courses)
+    ])
+    body = LessonContent.store('Lesson body text. ' * 100)
+    Lesson.objects.bulk_create([
+        Lesson(course=course, title=f"Lesson {n}", order=n, body=body)
+        for course in new_courses for n in range(lessons)
+    ])
+    Enrollment.objects.bulk_create([Enrollment(student=student, course=course) for course in new_courses])
+
+    queryset = Course.objects.select_related('instructor__profile').prefetch_related('lessons')
+    return {
+        'course list': {'count': courses, 'next': None, 'previous': None,
+                        'results': CourseListSerializer(queryset, many=True).data},
+        'course details': CourseSerializer(queryset, many=True).data,
+        'enrollments': EnrollmentSerializer(
+            Enrollment.objects.select_related('student__profile', 'course__instructor')
+            .prefetch_related('course__lessons'), many=True
+        ).data,
+    }
+
+
+def best_of(function, number, repeat=5):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', default='20,100,1000')
+    parser.add_argument('--lessons', type=int, default=12)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from api.parsers import FastJSONParser
+    from api.renderers import FastJSONRenderer, orjson
+
+    if orjson is None:
+        print("warning: orjson is not installed, FastJSONRenderer falls back to the stdlib encoder")
+    stock_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+    stock_parser, fast_parser = JSONParser(), FastJSONParser()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        print(f"{'payload':<16}{'courses':>8}{'KiB':>9}{'render':>10}{'fast':>10}{'parse':>10}{'fast':>10}  (ms)")
+        for courses in (int(n) for n in args.courses.split(',')):
+            for name, data in payloads(courses, args.lessons).items():
+                body = stock_renderer.render(data)
+                assert fast_renderer.render(data) == body, f"{name}: output differs"
+                timings = [
+                    best_of(lambda: stock_renderer.render(data), args.number),
+                    best_of(lambda: fast_renderer.render(data), args.number),
+                    best_of(lambda: stock_parser.parse(io.BytesIO(body)), args.number),
+                    best_of(lambda: fast_parser.parse(io.BytesIO(body)), args.number),
+                ]
+                print(f"{name:<16}{courses:>8}{len(body) / 1024:>9.1f}" + ''.join(f"{t:>10.2f}" for t in timings))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
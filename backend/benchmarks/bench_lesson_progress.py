@@ -0,0 +1,200 @@
+"""
+Per-lesson completion: enrollment bitmaps (api.progress) against the
+row-per-lesson design, a (enrollment_id, lesson_id, completed_at) table
+keyed on both ids. Compares storage, single-completion throughput and the
+per-lesson completion counts of the busiest course.
+
+    python benchmarks/bench_lesson_progress.py --enrollments 200000 --lessons 20
+
+Data comes from api.seeding in a throwaway test database; both designs
+hold the same completions. Storage is measured with dbstat on SQLite and
+pg_total_relation_size on Postgres; for the bitmaps it is the growth of the
+enrollment table once they are filled in.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+ROWS_TABLE = 'bench_lesson_progress'
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+    import django
+    django.setup()
+
+
+def table_bytes(table):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+        else:
+            cursor.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)", [table, table]
+            )
+        return cursor.fetchone()[0] or 0
+
+
+def timed(function, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def completions(rng, share):
+    """{enrollment id: [lesson positions done]} with a front-loaded share of each course finished."""
+    from api.models.course import Enrollment, Lesson
+    from django.db.models import Count
+
+    lesson_counts = dict(Lesson.objects.values('course').annotate(n=Count('pk')).values_list('course', 'n'))
+    done = {}
+    for enrollment_id, course_id in Enrollment.objects.values_list('pk', 'course_id').iterator(chunk_size=20_000):
+        total = lesson_counts.get(course_id, 0)
+        finished = min(total, round(rng.expovariate(1 / (share * total)))) if total else 0
+        done[enrollment_id] = sorted(rng.sample(range(total), finished)) if finished else []
+    return done
+
+
+def fill_bitmaps(done):
+    from django.db import connection, transaction
+    from api.models.course import Enrollment
+    from api.progress import set_bit
+
+    table = connection.ops.quote_name(Enrollment._meta.db_table)
+    rows = []
+    for enrollment_id, positions in done.items():
+        bitmap = b''
+        for position in positions:
+            bitmap = set_bit(bitmap, position)
+        rows.append((bitmap, enrollment_id))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f"UPDATE {table} SET completed_lessons = %s WHERE id = %s", rows)
+
+
+def fill_rows(done):
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from api.models.course import Enrollment, Lesson
+
+    lessons = {}
+    for lesson_id, course_id in Lesson.objects.order_by('course_id', 'order', 'id').values_list('pk', 'course_id'):
+        lessons.setdefault(course_id, []).append(lesson_id)
+    courses = dict(Enrollment.objects.values_list('pk', 'course_id'))
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {ROWS_TABLE} (enrollment_id bigint NOT NULL, lesson_id bigint NOT NULL, "
+            f"completed_at timestamp NOT NULL, PRIMARY KEY (enrollment_id, lesson_id))"
+        )
+        cursor.execute(f"CREATE INDEX {ROWS_TABLE}_lesson ON {ROWS_TABLE} (lesson_id)")
+        cursor.executemany(
+            f"INSERT INTO {ROWS_TABLE} VALUES (%s, %s, %s)",
+            [(enrollment_id, lessons[courses[enrollment_id]][position], now)
+             for enrollment_id, positions in done.items() for position in positions],
+        )
+
+
+def complete_row(enrollment, lesson):
+    """The row design's equivalent of api.progress.complete_lesson."""
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from api.models.course import Enrollment, Lesson
+
+    table = connection.ops.quote_name(Enrollment._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {connection.ops.quote_name(Lesson._meta.db_table)} WHERE course_id = %s",
+            [enrollment.course_id],
+        )
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"INSERT INTO {ROWS_TABLE} VALUES (%s, %s, %s) ON CONFLICT DO NOTHING",
+            [enrollment.pk, lesson.pk, connection.ops.adapt_datetimefield_value(timezone.now())],
+        )
+        cursor.execute(
+            f"UPDATE {table} SET progress_percentage = "
+            f"(SELECT COUNT(*) FROM {ROWS_TABLE} WHERE enrollment_id = %s) * 100 / %s WHERE id = %s",
+            [enrollment.pk, total, enrollment.pk],
+        )
+
+
+def row_counts(course_id):
+    from django.db import connection
+    from api.models.course import Enrollment
+
+    table = connection.ops.quote_name(Enrollment._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT p.lesson_id, COUNT(*) FROM {ROWS_TABLE} p JOIN {table} e ON e.id = p.enrollment_id "
+            f"WHERE e.course_id = %s GROUP BY p.lesson_id", [course_id]
+        )
+        return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--enrollments', type=int, default=200_000)
+    parser.add_argument('--lessons', type=int, default=20, help="Mean lessons per course.")
+    parser.add_argument('--share', type=float, default=0.4, help="Mean share of a course's lessons finished.")
+    parser.add_argument('--updates', type=int, default=2_000, help="Single completions timed per design.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.db.models import Count
+    from django.test.utils import setup_test_environment
+    from api.models.course import Enrollment, Lesson
+    from api.progress import complete_lesson, course_lessons, lesson_completion_counts
+    from api.seeding import Preset, seed
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(Preset(students=max(1, args.enrollments // 5), instructors=max(1, args.enrollments // 2000),
+                    courses=max(1, args.enrollments // 200), lessons=args.lessons, enrollments=args.enrollments))
+        rng = random.Random(0)
+        done = completions(rng, args.share)
+        finished = sum(len(positions) for positions in done.values())
+        print(f"{len(done):,} enrollments, {finished:,} lesson completions ({connection.vendor})")
+
+        before = table_bytes(Enrollment._meta.db_table)
+        fill_seconds = timed(lambda: fill_bitmaps(done))
+        bitmap_bytes = table_bytes(Enrollment._meta.db_table) - before
+        rows_seconds = timed(lambda: fill_rows(done))
+        rows_bytes = table_bytes(ROWS_TABLE)
+
+        enrollments = list(Enrollment.objects.order_by('?')[:args.updates])
+        lessons = {course_id: course_lessons(course_id) for course_id in {e.course_id for e in enrollments}}
+        picks = [(e, Lesson(pk=rng.choice(lessons[e.course_id]))) for e in enrollments if lessons[e.course_id]]
+        orders = dict(Lesson.objects.filter(pk__in=[lesson.pk for _, lesson in picks]).values_list('pk', 'order'))
+        for _, lesson in picks:
+            lesson.order = orders[lesson.pk]
+        bitmap_update = timed(lambda: [complete_lesson(e, lesson) for e, lesson in picks]) / len(picks)
+        rows_update = timed(lambda: [complete_row(e, lesson) for e, lesson in picks]) / len(picks)
+
+        busiest = Enrollment.objects.values('course').annotate(n=Count('pk')).order_by('-n').first()
+        course_id, size = busiest['course'], busiest['n']
+        lesson_count = len(course_lessons(course_id))
+        bitmap_agg = timed(lambda: lesson_completion_counts(course_id, lesson_count), repeat=5)
+        rows_agg = timed(lambda: row_counts(course_id), repeat=5)
+
+        print(f"{'':<26}{'bitmaps':>14}{'rows':>14}")
+        print(f"{'storage MiB':<26}{bitmap_bytes / 2 ** 20:>14.2f}{rows_bytes / 2 ** 20:>14.2f}")
+        print(f"{'bulk fill s':<26}{fill_seconds:>14.2f}{rows_seconds:>14.2f}")
+        print(f"{'completion ms':<26}{bitmap_update * 1000:>14.3f}{rows_update * 1000:>14.3f}")
+        print(f"{f'course counts ms ({size:,})':<26}{bitmap_agg * 1000:>14.2f}{rows_agg * 1000:>14.2f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Outbox throughput: events recorded per second (one per transaction, as the
+views do) and events relayed per second to the ndjson and queue sinks at a
+few batch sizes, with the relay's peak traced memory.
+
+    python benchmarks/bench_outbox.py --events 200000 --batch-sizes 100,1000,5000
+
+Runs in a throwaway test database; the NDJSON files go to a temporary
+directory. The queue sink is drained by a consumer thread, as an in-process
+consumer would.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+    import django
+    django.setup()
+
+
+def fill(count):
+    """``count`` enrollment-like events, bulk inserted."""
+    from django.utils import timezone
+    from api.models.outbox import OutboxEvent
+
+    created_at = timezone.now()
+    for start in range(0, count, 10_000):
+        OutboxEvent.objects.bulk_create([
+            OutboxEvent(kind='enrollment.created', created_at=created_at,
+                        payload={'enrollment_id': n, 'student_id': n % 5000, 'course_id': n % 300})
+            for n in range(start, min(count, start + 10_000))
+        ])
+
+
+def drain(sink, stop):
+    import queue
+
+    while not stop.is_set() or not sink.queue.empty():
+        try:
+            sink.queue.get(timeout=0.05)
+        except queue.Empty:
+            pass
+
+
+def relay_rate(sink, batch_size):
+    """(events per second, peak traced MiB) of relaying every event to a fresh sink cursor."""
+    from api.models.outbox import OutboxCursor
+    from api.outbox import relay
+
+    OutboxCursor.objects.filter(sink=sink.name).delete()
+    started = time.perf_counter()
+    delivered = relay([sink], batch_size=batch_size, once=True)
+    elapsed = time.perf_counter() - started
+
+    OutboxCursor.objects.filter(sink=sink.name).delete()
+    tracemalloc.start()
+    try:
+        relay([sink], batch_size=batch_size, once=True)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return delivered / elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200_000)
+    parser.add_argument('--record', type=int, default=5_000, help="Events timed through record().")
+    parser.add_argument('--batch-sizes', default='100,1000,5000')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection, transaction
+    from django.test.utils import override_settings, setup_test_environment
+    from api.models.outbox import OutboxEvent
+    from api.outbox import NDJSONSink, QueueSink, record
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        started = time.perf_counter()
+        for n in range(args.record):
+            with transaction.atomic():
+                record('enrollment.created', enrollment_id=n, student_id=n % 5000, course_id=n % 300)
+        record_rate = args.record / (time.perf_counter() - started)
+        OutboxEvent.objects.all().delete()
+        fill(args.events)
+        print(f"record(): {record_rate:,.0f} events/s, one transaction each ({connection.vendor})")
+        print(f"{args.events:,} events relayed")
+        print(f"{'sink':<10}{'batch':>8}{'events/s':>14}{'peak MiB':>10}")
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(OUTBOX_RELAY_LAG_SECONDS=0):
+            for batch_size in [int(size) for size in args.batch_sizes.split(',')]:
+                rate, peak = relay_rate(NDJSONSink(directory), batch_size)
+                print(f"{'ndjson':<10}{batch_size:>8,}{rate:>14,.0f}{peak:>10.1f}")
+
+                sink, stop = QueueSink(maxsize=16), threading.Event()
+                consumer = threading.Thread(target=drain, args=(sink, stop))
+                consumer.start()
+                try:
+                    rate, peak = relay_rate(sink, batch_size)
+                finally:
+                    stop.set()
+                    consumer.join()
+                print(f"{'queue':<10}{batch_size:>8,}{rate:>14,.0f}{peak:>10.1f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Recommendation build cost: time and peak traced memory of a full build,
+and of an incremental build after a batch of new enrollments.
+
+    python benchmarks/bench_recommendations.py --enrollments 1000000
+
+Data comes from api.seeding (power-law course popularity) in a throwaway
+test database. Memory is measured in a separate run, since tracing slows
+the build down.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+    import django
+    django.setup()
+
+
+def measure(function):
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def add_enrollments(count, seed):
+    from api.models.course import Course, Enrollment
+    from api.models.user import User
+
+    rng = random.Random(seed)
+    students = list(User.objects.filter(role='student').values_list('pk', flat=True))
+    courses = list(Course.objects.filter(status='published').values_list('pk', flat=True))
+    pairs = {(rng.choice(students), rng.choice(courses)) for _ in range(count)}
+    Enrollment.objects.bulk_create(
+        [Enrollment(student_id=student, course_id=course) for student, course in pairs], ignore_conflicts=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--enrollments', type=int, default=1_000_000)
+    parser.add_argument('--students', type=int, default=100_000)
+    parser.add_argument('--courses', type=int, default=10_000)
+    parser.add_argument('--new', default='10,1000', help="Enrollments added before each incremental build.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from api.models.course import Enrollment
+    from api.recommendations import build
+    from api.seeding import Preset, seed
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(Preset(students=args.students, instructors=max(1, args.courses // 10), courses=args.courses,
+                    lessons=1, enrollments=args.enrollments))
+        print(f"{Enrollment.objects.count():,} enrollments, {args.courses:,} courses, {args.students:,} students")
+        print(f"{'build':<14}{'courses':>10}{'seconds':>10}{'peak MiB':>10}")
+
+        run, seconds, peak = measure(lambda: build(full=True))
+        print(f"{'full':<14}{run.courses:>10,}{seconds:>10.2f}{peak:>10.1f}")
+
+        for batch in [int(n) for n in args.new.split(',')]:
+            add_enrollments(batch, seed=batch)
+            # Both passes cover the same new enrollments: the second starts from the first's predecessor.
+            previous = run
+            run, seconds, peak = measure(lambda: build_from(build, previous))
+            print(f"{f'+{batch} new':<14}{run.courses:>10,}{seconds:>10.2f}{peak:>10.1f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def build_from(build, previous):
+    from api.models.recommendation import RecommendationBuild
+
+    RecommendationBuild.objects.filter(pk__gt=previous.pk).delete()
+    return build()
+
+
+if __name__ == '__main__':
+    main()
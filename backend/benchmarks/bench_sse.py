@@ -0,0 +1,198 @@
+"""
+Concurrent subscribers of the course progress stream on one ASGI worker.
+
+Starts ``uvicorn learnhub_api.asgi`` with a single worker against the
+database configured through the DB_* variables, opens ``--subscribers``
+streams to /api/courses/{id}/progress/stream/ (spread over ``--courses``
+courses), then records progress events in the outbox at ``--rate`` per
+second, as progress updates from any process would, and reports:
+
+    connect   time until every stream got its ``ready`` event
+    delivery  p50/p99 from recording an event to a subscriber reading it
+    rss       the worker's resident memory with every stream open
+
+    pip install uvicorn
+    python manage.py migrate
+    python benchmarks/bench_sse.py --subscribers 5000 --courses 50
+
+Each subscriber needs a file descriptor on both sides: raise ``ulimit -n``
+past the subscriber count. Events are recorded one at a time, leaving no
+id gaps to wait at, so delivery measures the poll interval
+(STREAM_POLL_SECONDS) plus the fan-out.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'learnhub_api.settings')
+    import django
+    django.setup()
+
+
+def seed(courses, students):
+    """Create a benchmark instructor, courses and enrollments; returns (token, course ids, enrollments)."""
+    from api.authentication import get_tokens_for_user
+    from api.models.course import Course, Enrollment
+    from api.models.user import User
+
+    def user(username, role):
+        existing = User.objects.filter(username=username).first()
+        return existing or User.objects.create_user(
+            username=username, email=f"{username}@bench.local", password='bench-pass-123', role=role
+        )
+
+    instructor = user('bench_stream_instructor', 'instructor')
+    existing = Course.objects.filter(instructor=instructor).count()
+    Course.objects.bulk_create([
+        Course(title=f"Stream course {i}", slug=f"bench-stream-course-{i}", description='Benchmark course',
+               instructor=instructor, status='published')
+        for i in range(existing, courses)
+    ])
+    course_ids = list(Course.objects.filter(instructor=instructor).order_by('id').values_list('id', flat=True))
+    course_ids = course_ids[:courses]
+    learners = [user(f'bench_stream_student_{n}', 'student') for n in range(students)]
+    Enrollment.objects.bulk_create([
+        Enrollment(student=student, course_id=course_id) for student in learners for course_id in course_ids
+    ], ignore_conflicts=True)
+    enrollments = list(Enrollment.objects.filter(course_id__in=course_ids).values_list('id', 'student_id', 'course_id'))
+    return get_tokens_for_user(instructor)['access'], course_ids, enrollments
+
+
+def rss_mb(pid):
+    for line in Path(f'/proc/{pid}/status').read_text().splitlines():
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+async def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"server on port {port} did not start")
+
+
+class Subscriber:
+    def __init__(self, port, course_id, token, recorded, latencies):
+        self.port, self.course_id, self.token = port, course_id, token
+        self.recorded, self.latencies = recorded, latencies
+        self.ready = asyncio.Event()
+        self.writer = None
+
+    async def run(self):
+        reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        self.writer.write(
+            f"GET /api/courses/{self.course_id}/progress/stream/ HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Authorization: Bearer {self.token}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        )
+        status = await reader.readline()
+        if b' 200 ' not in status:
+            raise RuntimeError(f"stream failed: {status!r}")
+        async for line in reader:
+            if line.startswith(b'event: ready'):
+                self.ready.set()
+            elif line.startswith(b'id: '):
+                sent = self.recorded.get(int(line[4:]))
+                if sent is not None:
+                    self.latencies.append((time.perf_counter() - sent) * 1000)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def publish(enrollments, rate, duration, recorded):
+    """Records ``rate`` progress events per second for ``duration`` seconds."""
+    from asgiref.sync import sync_to_async
+    from api.outbox import record
+
+    def progress(enrollment_id, student_id, course_id):
+        event = record('enrollment.progress', enrollment_id=enrollment_id, student_id=student_id,
+                       course_id=course_id, progress_percentage=random.randint(1, 99))
+        recorded[event.pk] = time.perf_counter()
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        await sync_to_async(progress)(*random.choice(enrollments))
+        await asyncio.sleep(1 / rate)
+
+
+async def bench(args, token, course_ids, enrollments, server):
+    await wait_for(args.port)
+    recorded, latencies = {}, []
+    subscribers = [
+        Subscriber(args.port, course_ids[n % len(course_ids)], token, recorded, latencies)
+        for n in range(args.subscribers)
+    ]
+    started = time.perf_counter()
+    tasks = []
+    for start in range(0, len(subscribers), args.connect_batch):
+        batch = subscribers[start:start + args.connect_batch]
+        tasks += [asyncio.create_task(subscriber.run()) for subscriber in batch]
+        await asyncio.wait_for(asyncio.gather(*(subscriber.ready.wait() for subscriber in batch)), 60)
+    connect = time.perf_counter() - started
+    memory = rss_mb(server.pid)
+
+    await publish(enrollments, args.rate, args.duration, recorded)
+    await asyncio.sleep(1)
+    for subscriber in subscribers:
+        subscriber.close()
+    failed = [task for task in tasks if task.done() and task.exception()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return connect, memory, len(recorded), sorted(latencies), len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=20)
+    parser.add_argument('--students', type=int, default=20, help="Students enrolled in every course.")
+    parser.add_argument('--rate', type=float, default=50, help="Progress events recorded per second.")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--connect-batch', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    setup_django()
+    token, course_ids, enrollments = seed(args.courses, args.students)
+    command = ['uvicorn', 'learnhub_api.asgi:application', '--workers', '1', '--port', str(args.port),
+               '--no-access-log', '--backlog', str(max(2048, args.connect_batch * 2))]
+    env = {**os.environ, 'ASYNC_READ_VIEWS': 'true'}
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        connect, memory, events, latencies, failed = asyncio.run(
+            bench(args, token, course_ids, enrollments, server)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{args.subscribers:,} subscribers over {len(course_ids)} courses on one worker")
+    print(f"connect   {connect:.2f} s ({args.subscribers / connect:,.0f} streams/s), {failed} failed")
+    print(f"rss       {memory:.1f} MB ({memory * 1024 / args.subscribers:.1f} KB per stream)")
+    if latencies:
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"delivery  {events} events, {len(latencies):,} messages, "
+              f"p50 {statistics.median(latencies):.1f} ms, p99 {p99:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Endpoint benchmark suite: seeded datasets, measurements and the baseline check.
+Datasets are generated with api.seeding, as ``manage.py seed_learnhub`` does.
+
+Runs against whatever database the DB_* variables select (SQLite by default):
+
+    pytest benchmarks/                                   # compare with baseline.json
+    pytest benchmarks/ --bench-datasets small,medium,large
+    pytest benchmarks/ --bench-update-baseline           # record the current numbers
+    DB_ENGINE=django.db.backends.postgresql DB_NAME=learnhub pytest benchmarks/
+
+Every endpoint reports p50/p95/p99 latency, queries per request and peak
+allocated memory per request. A test fails when it issues more queries than
+its baseline, or its p50 latency or peak memory exceeds the baseline by more
+than --bench-threshold. Baselines are kept per database vendor; record them
+on the machine that runs the comparison.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.authentication import get_tokens_for_user
+from api.models.course import Course
+from api.models.user import User
+from api.seeding import Preset, seed
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+
+DATASETS = {
+    'small': Preset(students=50, instructors=2, courses=50, lessons=5, enrollments=250),
+    'medium': Preset(students=500, instructors=20, courses=500, lessons=10, enrollments=10_000),
+    'large': Preset(students=5_000, instructors=200, courses=5_000, lessons=12, enrollments=100_000),
+}
+
+# Latency noise floor: smaller p50 increases never count as regressions.
+LATENCY_SLACK_MS = 0.5
+
+_results = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--bench-datasets', default='small,medium', help="Comma-separated datasets to seed and run.")
+    group.addoption('--bench-iterations', type=int, default=30, help="Timed requests per endpoint.")
+    group.addoption('--bench-threshold', type=float, default=0.25,
+                    help="Allowed relative p50 latency and memory increase over the baseline.")
+    group.addoption('--bench-update-baseline', action='store_true', help="Write the results to baseline.json.")
+
+
+def pytest_generate_tests(metafunc):
+    if 'dataset' in metafunc.fixturenames:
+        names = metafunc.config.getoption('--bench-datasets').split(',')
+        metafunc.parametrize('dataset', names, indirect=True, scope='session')
+
+
+class Dataset:
+    """A seeded catalog plus the users and ids the benchmarks request with."""
+
+    def __init__(self, name, preset):
+        self.name = name
+        seed(preset)
+        self.courses = list(Course.objects.filter(status='published').order_by('id'))
+        # The busiest student, so enrollment lists are at their longest.
+        self.student = User.objects.filter(role='student').order_by('-profile__enrolled_courses_count', 'id').first()
+
+    def client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+        return client
+
+
+@pytest.fixture(scope='session')
+def dataset(request, django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        seeded = Dataset(request.param, DATASETS[request.param])
+    yield seeded
+    with django_db_blocker.unblock():
+        User.objects.all().delete()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def load_baseline():
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+def regressions(result, baseline, threshold):
+    if baseline is None:
+        return []
+    problems = []
+    if result['queries'] > baseline['queries']:
+        problems.append(f"queries {baseline['queries']} -> {result['queries']}")
+    if result['p50_ms'] > baseline['p50_ms'] * (1 + threshold) + LATENCY_SLACK_MS:
+        problems.append(f"p50 {baseline['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms")
+    if result['peak_kib'] > baseline['peak_kib'] * (1 + threshold):
+        problems.append(f"peak memory {baseline['peak_kib']:.0f} -> {result['peak_kib']:.0f} KiB")
+    return problems
+
+
+@pytest.fixture
+def bench(dataset, pytestconfig):
+    """
+    ``bench(name, send, reset=None, iterations=None, warmup=3)`` times
+    ``send(i)`` and checks it against the baseline. ``reset(i)`` runs untimed
+    after each request, for endpoints that change state.
+    """
+    config = pytestconfig
+
+    def run(name, send, reset=None, iterations=None, warmup=3):
+        iterations = iterations or config.getoption('--bench-iterations')
+        samples = []
+        for i in range(warmup + iterations):
+            start = time.perf_counter()
+            response = send(i)
+            elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code < 400, f"{name}: {response.status_code} {response.content[:200]}"
+            if i >= warmup:
+                samples.append(elapsed)
+            if reset is not None:
+                reset(i)
+
+        # Queries and allocations from one extra request, kept out of the timings.
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                send(warmup + iterations)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        if reset is not None:
+            reset(warmup + iterations)
+
+        result = {
+            'p50_ms': round(statistics.median(samples), 3),
+            'p95_ms': round(percentile(samples, 95), 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            'queries': len(captured),
+            'peak_kib': round(peak / 1024, 1),
+        }
+        key = f"{dataset.name}:{name}"
+        _results[key] = result
+        if not config.getoption('--bench-update-baseline'):
+            baseline = load_baseline().get(connection.vendor, {}).get(key)
+            problems = regressions(result, baseline, config.getoption('--bench-threshold'))
+            assert not problems, f"{key} regressed: {'; '.join(problems)}"
+        return result
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not _results:
+        return
+    baseline = load_baseline()
+    vendor_baseline = baseline.get(connection.vendor, {})
+    terminalreporter.section(f"endpoint benchmarks ({connection.vendor})")
+    terminalreporter.write_line(
+        f"{'endpoint':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'peak KiB':>10}{'base p50':>10}"
+    )
+    for key, result in sorted(_results.items()):
+        base = vendor_baseline.get(key)
+        base_p50 = f"{base['p50_ms']:>10.2f}" if base else f"{'-':>10}"
+        terminalreporter.write_line(
+            f"{key:<28}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+            f"{result['queries']:>9}{result['peak_kib']:>10.1f}{base_p50}"
+        )
+    if config.getoption('--bench-update-baseline'):
+        baseline[connection.vendor] = {**vendor_baseline, **_results}
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        terminalreporter.write_line(f"baseline written to {BASELINE_PATH}")
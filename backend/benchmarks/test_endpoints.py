@@ -0,0 +1,65 @@
+"""
+Latency, query count and memory of the hot endpoints; see conftest.py.
+"""
+import pytest
+
+from api.dashboard import invalidate_dashboard
+from api.models.course import Enrollment
+from api.models.user import User
+from api.seeding import SEED_PASSWORD
+
+pytestmark = pytest.mark.django_db
+
+
+def test_course_list(dataset, bench):
+    client = dataset.client(dataset.student)
+    bench('courses_list', lambda i: client.get('/api/courses/'))
+
+
+def test_course_list_filtered(dataset, bench):
+    client = dataset.client(dataset.student)
+    bench('courses_search', lambda i: client.get('/api/courses/?search=Python&ordering=-price'))
+
+
+def test_course_detail(dataset, bench):
+    client = dataset.client(dataset.student)
+    course_id = dataset.courses[0].id
+    bench('course_detail', lambda i: client.get(f'/api/courses/{course_id}/'))
+
+
+def test_enrollment_list(dataset, bench):
+    client = dataset.client(dataset.student)
+    bench('enrollments_list', lambda i: client.get('/api/enrollments/'))
+
+
+def test_dashboard(dataset, bench):
+    client = dataset.client(dataset.student)
+    # Uncached: the cost of the query budget itself.
+    bench('dashboard', lambda i: client.get('/api/dashboard/'),
+          reset=lambda i: invalidate_dashboard(dataset.student.pk))
+
+
+def test_enroll(dataset, bench):
+    student = User.objects.create_user(username='newcomer', email='newcomer@bench.local',
+                                       password=SEED_PASSWORD, role='student')
+    client = dataset.client(student)
+    course_id = dataset.courses[-1].id
+    bench(
+        'enroll',
+        lambda i: client.post(f'/api/courses/{course_id}/enroll/'),
+        reset=lambda i: Enrollment.objects.filter(student=student).delete(),
+    )
+
+
+def test_update_progress(dataset, bench):
+    client = dataset.client(dataset.student)
+    enrollment = Enrollment.objects.filter(student=dataset.student).first()
+    url = f'/api/enrollments/{enrollment.id}/update_progress/'
+    bench('update_progress', lambda i: client.patch(url, {'progress_percentage': i % 100}, format='json'))
+
+
+def test_login(dataset, bench):
+    client = dataset.client()
+    credentials = {'email': dataset.student.email, 'password': SEED_PASSWORD}
+    # Dominated by password hashing, so fewer rounds are enough.
+    bench('login', lambda i: client.post('/api/auth/login/', credentials, format='json'), iterations=5, warmup=1)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from datetime import timedelta
+import copy
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -53,12 +54,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.PrimaryStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,11 +93,47 @@ WSGI_APPLICATION = 'learnhub_api.wsgi.application'
 
 DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.sqlite3')
 
+# Connection reuse (PostgreSQL)
+# DB_POOL=true hands connections to psycopg 3's pool (needs psycopg[pool]); Django
+# then requires CONN_MAX_AGE=0. Otherwise connections persist between requests for
+# DB_CONN_MAX_AGE seconds and are health-checked before reuse.
+# Pool sizes are per worker process: without DB_POOL_MAX_SIZE, the DB_MAX_CONNECTIONS
+# budget is split evenly across WEB_CONCURRENCY workers.
+DB_POOL = os.getenv('DB_POOL', 'False').lower() == 'true'
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true'
+WEB_CONCURRENCY = max(int(os.getenv('WEB_CONCURRENCY', 1)), 1)
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE') or max(
+    DB_POOL_MIN_SIZE, int(os.getenv('DB_MAX_CONNECTIONS', 20)) // WEB_CONCURRENCY
+))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+
+if DB_POOL:
+    DB_POOL_OPTIONS = {
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': DB_POOL_TIMEOUT,
+    }
+    if DB_CONN_HEALTH_CHECKS:
+        from psycopg_pool import ConnectionPool
+        DB_POOL_OPTIONS['check'] = ConnectionPool.check_connection
+    DB_CONNECTION_SETTINGS = {'CONN_MAX_AGE': 0, 'OPTIONS': {'pool': DB_POOL_OPTIONS}}
+else:
+    DB_CONNECTION_SETTINGS = {
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+    }
+
+# SQLite tests run in memory unless DB_TEST_NAME names a file; a file lets
+# the threaded tests write concurrently (shared-cache memory databases fail
+# with "table is locked" instead of waiting). CI sets it.
 if DB_ENGINE == 'django.db.backends.sqlite3':
     DATABASES = {
         'default': {
             'ENGINE': DB_ENGINE,
             'NAME': os.getenv('DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+            'TEST': {'NAME': os.getenv('DB_TEST_NAME')},
         }
     }
 else:
@@ -104,9 +145,43 @@ else:
             'PASSWORD': os.getenv('DB_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', 'localhost'),
             'PORT': os.getenv('DB_PORT', '5432'),
+            **DB_CONNECTION_SETTINGS,
         }
     }
 
+# Read replicas (optional)
+# DB_REPLICA_HOST takes a comma-separated list of Postgres hosts; each becomes a
+# `replica`, `replica_2`, ... alias that reuses the primary's settings unless
+# DB_REPLICA_NAME/USER/PASSWORD/PORT override them. With SQLite, DB_REPLICA_NAME
+# points at a second database file. Catalog, lesson and roster reads use the
+# replicas; after a write a user reads from the primary for
+# DB_REPLICA_STICKY_SECONDS (tracked in the cache, so use a shared cache backend
+# when running several workers).
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    DB_REPLICA_HOSTS = [os.getenv('DB_REPLICA_NAME')] if os.getenv('DB_REPLICA_NAME') else []
+else:
+    DB_REPLICA_HOSTS = [host.strip() for host in os.getenv('DB_REPLICA_HOST', '').split(',') if host.strip()]
+
+for index, replica_host in enumerate(DB_REPLICA_HOSTS, start=1):
+    replica = copy.deepcopy(DATABASES['default'])
+    if DB_ENGINE == 'django.db.backends.sqlite3':
+        replica['NAME'] = replica_host
+    else:
+        replica.update({
+            'HOST': replica_host,
+            'NAME': os.getenv('DB_REPLICA_NAME', replica['NAME']),
+            'USER': os.getenv('DB_REPLICA_USER', replica['USER']),
+            'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', replica['PASSWORD']),
+            'PORT': os.getenv('DB_REPLICA_PORT', replica['PORT']),
+        })
+    # Tests run against the primary only.
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES['replica' if index == 1 else f'replica_{index}'] = replica
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.db_router.PrimaryReplicaRouter'] if DATABASE_REPLICAS else []
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -149,6 +224,16 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # orjson-backed JSON, identical output to DRF's; falls back to stdlib json
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 # JWT Settings
@@ -175,6 +260,12 @@ SPECTACULAR_SETTINGS = {
     'SERVE_INCLUDE_SCHEMA': False,
 }
 
+# /api/schema/ is generated once per code version and stored in SCHEMA_CACHE_DIR
+# (`python manage.py build_schema` does it at image build time). The version is
+# APP_VERSION when set, otherwise a fingerprint of the source tree.
+APP_VERSION = os.getenv('APP_VERSION', '')
+SCHEMA_CACHE_DIR = Path(os.getenv('SCHEMA_CACHE_DIR', BASE_DIR / '.schema_cache'))
+
 # Cache Configuration
 # Default to local memory cache for development
 # For production, configure Redis or another cache backend
@@ -182,13 +273,144 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    # Compressed response bodies (CompressionMiddleware), kept apart so their
+    # churn never culls the keys the app relies on from 'default'.
+    'compressed': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'compressed-responses',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('COMPRESSION_CACHE_ENTRIES', 1000))},
+    },
 }
 
 # Cache TTL in seconds (5 minutes default)
 CACHE_TTL = int(os.getenv('CACHE_TTL', 300))
 
 
+# Performance instrumentation
+# Server-Timing header on every response; slow queries are kept in a bounded
+# in-memory buffer served at /api/diagnostics/slow-queries/ (admin only).
+# A negative threshold disables slow-query sampling.
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'True').lower() == 'true'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv('SLOW_QUERY_BUFFER_SIZE', 100))
+
+# Serve course list/detail/outline and /api/user/ GETs from native async views,
+# and route the course progress stream (api/streams.py). Only for the ASGI entry
+# point (uvicorn learnhub_api.asgi:application, as the Dockerfile runs it).
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False').lower() == 'true'
+
+# Build course, lesson and enrollment list responses from values() projections
+# instead of model instances; the payload is identical.
+FAST_READ_SERIALIZERS = os.getenv('FAST_READ_SERIALIZERS', 'True').lower() == 'true'
+
+# Response compression
+# GET responses of at least COMPRESSION_MIN_SIZE bytes are sent with brotli (when
+# the brotli package is installed) or gzip, as negotiated with Accept-Encoding.
+# Compressed bodies are cached by ETag in the 'compressed' cache (at most
+# COMPRESSION_CACHE_ENTRIES of them), so each body is compressed only once.
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_CACHE_TTL = int(os.getenv('COMPRESSION_CACHE_TTL', CACHE_TTL))
+
+# Catalog facet counts (/api/courses/?facets=true), cached per catalog
+# generation: any change to a course's faceted fields starts a new one.
+FACETS_CACHE_TTL = int(os.getenv('FACETS_CACHE_TTL', CACHE_TTL))
+
+# Course recommendations ("students who took this also took")
+# Rebuilt by `manage.py build_recommendations` (incremental unless --full): the
+# top RECOMMENDATIONS_TOP_K courses per course by cosine or jaccard similarity,
+# among courses sharing at least RECOMMENDATIONS_MIN_SUPPORT students.
+RECOMMENDATIONS_TOP_K = int(os.getenv('RECOMMENDATIONS_TOP_K', 10))
+RECOMMENDATIONS_SIMILARITY = os.getenv('RECOMMENDATIONS_SIMILARITY', 'cosine')
+RECOMMENDATIONS_MIN_SUPPORT = int(os.getenv('RECOMMENDATIONS_MIN_SUPPORT', 2))
+
+# Trending and popular course rankings
+# Updated by `manage.py update_course_rankings` (schedule it, e.g. every few
+# minutes): enrollments, completions and progress activity, weighted and
+# decayed with a short (trending) and a long (popular) half-life.
+RANKING_TRENDING_HALF_LIFE_HOURS = float(os.getenv('RANKING_TRENDING_HALF_LIFE_HOURS', 48))
+RANKING_POPULAR_HALF_LIFE_DAYS = float(os.getenv('RANKING_POPULAR_HALF_LIFE_DAYS', 30))
+RANKING_ENROLLMENT_WEIGHT = float(os.getenv('RANKING_ENROLLMENT_WEIGHT', 1.0))
+RANKING_COMPLETION_WEIGHT = float(os.getenv('RANKING_COMPLETION_WEIGHT', 3.0))
+RANKING_ACTIVITY_WEIGHT = float(os.getenv('RANKING_ACTIVITY_WEIGHT', 0.25))
+
+# Domain event outbox
+# Events are written with the changes they describe and shipped by
+# `manage.py relay_outbox` to OUTBOX_SINKS (ndjson or dotted paths to
+# api.outbox.Sink subclasses), OUTBOX_BATCH_SIZE at a time, at least once.
+# The relay waits at a missing event id for its transaction to commit; ids still
+# missing after OUTBOX_RELAY_LAG_SECONDS (rolled back) are logged and skipped.
+# A sink that fails is retried after OUTBOX_RETRY_BACKOFF_SECONDS, doubled per
+# consecutive failure up to OUTBOX_RETRY_MAX_SECONDS; the others keep going.
+OUTBOX_SINKS = [name.strip() for name in os.getenv('OUTBOX_SINKS', 'ndjson').split(',') if name.strip()]
+OUTBOX_NDJSON_DIR = Path(os.getenv('OUTBOX_NDJSON_DIR', BASE_DIR / 'outbox'))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 1000))
+OUTBOX_RELAY_LAG_SECONDS = float(os.getenv('OUTBOX_RELAY_LAG_SECONDS', 60))
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', 1))
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', 7))
+OUTBOX_RETRY_BACKOFF_SECONDS = float(os.getenv('OUTBOX_RETRY_BACKOFF_SECONDS', 5))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv('OUTBOX_RETRY_MAX_SECONDS', 300))
+
+# Background jobs
+# Side effects deferred by views (see api/jobs.py) are queued in the database
+# and run by `manage.py run_workers`. JOBS_QUEUES sets each queue's
+# concurrency per worker process ("name:threads,..."); failed jobs are retried
+# with exponential backoff from JOBS_RETRY_BACKOFF_SECONDS. JOBS_IMMEDIATE
+# runs deferred jobs in-process at commit instead (no workers needed).
+JOBS_QUEUES = {
+    name.strip(): int(concurrency or 1)
+    for name, _, concurrency in (
+        entry.partition(':') for entry in os.getenv('JOBS_QUEUES', 'default:4,analytics:1').split(',') if entry.strip()
+    )
+}
+JOBS_IMMEDIATE = os.getenv('JOBS_IMMEDIATE', 'False').lower() == 'true'
+JOBS_POLL_SECONDS = float(os.getenv('JOBS_POLL_SECONDS', 1))
+JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', 300))
+JOBS_RETRY_BACKOFF_SECONDS = float(os.getenv('JOBS_RETRY_BACKOFF_SECONDS', 10))
+
+# Cache warming (`manage.py warm_caches`, see api/warming.py)
+# The schema, catalog pages, the CACHE_WARM_COURSES most enrolled courses and
+# the caches of the CACHE_WARM_USERS most recently active users, on
+# CACHE_WARM_CONCURRENCY threads within CACHE_WARM_BUDGET_SECONDS. A LocMemCache
+# is per process: set CACHE_WARM_ON_BOOT to warm each serving process instead.
+# Warming fills at most half of a LocMemCache (MAX_ENTRIES, 300 by default) and
+# trims the courses and users to fit; use a larger or shared cache to warm more.
+CACHE_WARM_COURSES = int(os.getenv('CACHE_WARM_COURSES', 50))
+CACHE_WARM_USERS = int(os.getenv('CACHE_WARM_USERS', 100))
+CACHE_WARM_CONCURRENCY = int(os.getenv('CACHE_WARM_CONCURRENCY', 4))
+CACHE_WARM_BUDGET_SECONDS = float(os.getenv('CACHE_WARM_BUDGET_SECONDS', 30))
+CACHE_WARM_ON_BOOT = os.getenv('CACHE_WARM_ON_BOOT', 'False').lower() == 'true'
+
+# Counter reconciliation (`manage.py reconcile_counters`, see api/reconcile.py)
+# Rows per chunk; each chunk is one short transaction, followed by a pause of
+# RECONCILE_PAUSE_SECONDS to leave room for other writes.
+RECONCILE_CHUNK_SIZE = int(os.getenv('RECONCILE_CHUNK_SIZE', 5000))
+RECONCILE_PAUSE_SECONDS = float(os.getenv('RECONCILE_PAUSE_SECONDS', 0))
+
+# Enrollment archival (`manage.py archive_enrollments`, see api/archive.py)
+# Enrollments completed, or dropped and untouched, for ARCHIVE_AFTER_DAYS move
+# to the archive table, ARCHIVE_BATCH_SIZE per transaction.
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 180))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 5000))
+ARCHIVE_PAUSE_SECONDS = float(os.getenv('ARCHIVE_PAUSE_SECONDS', 0))
+
+# Account deletion (see api/deletion.py)
+# A deleted account is deactivated at once; its data is removed by background
+# jobs, DELETION_BATCH_SIZE rows per transaction, each job working for at most
+# DELETION_JOB_SECONDS before queueing the next.
+DELETION_BATCH_SIZE = int(os.getenv('DELETION_BATCH_SIZE', 1000))
+DELETION_JOB_SECONDS = float(os.getenv('DELETION_JOB_SECONDS', 60))
+
+# Live course progress streams (Server-Sent Events, see api/streams.py)
+# Each ASGI worker polls the outbox every STREAM_POLL_SECONDS while anyone is
+# subscribed. A client more than STREAM_BUFFER_SIZE enrollments behind is told
+# to reload; idle streams get a heartbeat every STREAM_HEARTBEAT_SECONDS.
+STREAM_POLL_SECONDS = float(os.getenv('STREAM_POLL_SECONDS', 0.5))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15))
+STREAM_BUFFER_SIZE = int(os.getenv('STREAM_BUFFER_SIZE', 500))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
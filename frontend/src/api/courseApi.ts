@@ -21,5 +21,5 @@ export const enrollCourse = (courseId) =>
   axiosClient.post("enrollments/", { course: courseId });
 export const fetchEnrollments = () => axiosClient.get("enrollments/");
 export const fetchEnrollment = (id) => axiosClient.get(`enrollments/${id}/`);
-export const updateEnrollmentProgress = (id, progress) =>
-  axiosClient.patch(`enrollments/${id}/`, { progress_percentage: progress });
+export const completeLesson = (id, lessonId) =>
+  axiosClient.post(`enrollments/${id}/complete_lesson/`, { lesson: lessonId });